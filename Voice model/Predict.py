@@ -8,6 +8,9 @@ from pydub import AudioSegment
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 
+from src.features.extractor import FeatureExtractor
+from src.models.ernn import RNNClassifier, RNNConfig
+
 # -----------------------------
 # 1. Model Definition (BiLSTM + Attention)
 # -----------------------------
@@ -33,11 +36,24 @@ class BiLSTM_Attention(nn.Module):
 # 2. Load Model
 # -----------------------------
 def load_model(model_path):
-    model = BiLSTM_Attention()
+    """Return (model, feature extractor); same rules as the backend's predictor."""
     state = torch.load(model_path, map_location="cpu")
-    model.load_state_dict(state, strict=False)
+    if isinstance(state, dict) and "model_config" in state:
+        model = RNNClassifier(RNNConfig(**state["model_config"]))
+        model.load_state_dict(state["model_state_dict"], strict=True)
+        extractor_state = state.get("feature_extractor")
+    else:
+        if isinstance(state, dict) and "model_state_dict" in state:
+            state = state["model_state_dict"]
+        model = BiLSTM_Attention()
+        model.load_state_dict(state, strict=False)
+        extractor_state = None
     model.eval()
-    return model
+    if extractor_state:
+        extractor = FeatureExtractor.from_dict(extractor_state)
+    else:
+        extractor = FeatureExtractor.legacy_backend()
+    return model, extractor
 
 # -----------------------------
 # 3. Handle Any File Type → WAV
@@ -62,20 +78,19 @@ def convert_to_wav(input_path):
     raise ValueError(f"Unsupported file format: {ext}")
 
 # -----------------------------
-# 4. Audio → MFCC Extraction
+# 4. Audio → Features (the extractor stored with the model)
 # -----------------------------
-def extract_mfcc(file_path, n_mfcc=39):
-    y, sr = librosa.load(file_path, sr=16000)
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)
-    return mfcc.T
+def extract_mfcc(file_path, extractor):
+    y, _ = librosa.load(file_path, sr=extractor.sample_rate)
+    return extractor.transform(y)
 
 # -----------------------------
 # 5. Prediction Function
 # -----------------------------
 def predict(file_path, model_path, threshold=0.5):
     wav_path = convert_to_wav(file_path)
-    model = load_model(model_path)
-    mfcc = extract_mfcc(wav_path)
+    model, extractor = load_model(model_path)
+    mfcc = extract_mfcc(wav_path, extractor)
     x = torch.tensor(mfcc, dtype=torch.float32).unsqueeze(0)
 
     with torch.no_grad():
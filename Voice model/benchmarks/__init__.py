@@ -0,0 +1,2 @@
+"""Benchmarks for the voice pipeline. Run from the `Voice model` directory, e.g.
+`python -m benchmarks.bench_ddp_scaling`."""
@@ -0,0 +1,124 @@
+import json
+import os
+import platform
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def environment_info() -> Dict[str, object]:
+    """Host description stored with every report so runs can be compared fairly."""
+    info: Dict[str, object] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def time_call(fn: Callable[[], object], repeats: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """Run `fn` `warmup + repeats` times and summarize the timed runs in seconds."""
+    import numpy as np
+
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    arr = np.asarray(samples)
+    return {
+        "mean_s": float(arr.mean()),
+        "median_s": float(np.median(arr)),
+        "min_s": float(arr.min()),
+        "std_s": float(arr.std()),
+        "repeats": repeats,
+    }
+
+
+def write_report(path: Optional[str], name: str, results: object, **extra: object) -> Dict[str, object]:
+    """Wrap results with environment info, print them and optionally write JSON."""
+    report = {"benchmark": name, "environment": environment_info(), "results": results}
+    report.update(extra)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return report
+
+
+def make_synthetic_h5(path: str, num_segments: int = 512, frames: int = 32, n_mfcc: int = 39,
+                      seed: int = 0) -> str:
+    """Write a fixed-layout HDF5 with random normalized MFCC-like features and lie/truth labels."""
+    import h5py
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    labels = np.array(["truth", "lie"])[rng.integers(0, 2, size=num_segments)]
+    features = rng.standard_normal((num_segments, frames, n_mfcc)).astype(np.float32)
+    # make the classes weakly separable so training curves are meaningful
+    features[labels == "lie", :, 0] += 0.5
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with h5py.File(path, "w") as h5:
+        h5.create_dataset("features", data=features, dtype="float32")
+        h5.create_dataset("labels", data=labels.tolist(), dtype=h5py.string_dtype(encoding="utf-8"))
+        h5.attrs["layout"] = "fixed"
+        h5.attrs["feature_mean"] = np.zeros(n_mfcc, dtype=np.float32)
+        h5.attrs["feature_std"] = np.ones(n_mfcc, dtype=np.float32)
+    return path
+
+
+def synthetic_speech(seconds: float, sr: int = 16000, seed: int = 0):
+    """Speech-like test signal: voiced syllables with a drifting, vibrato-modulated f0, a few
+    formant-weighted harmonics, breath noise and short pauses. Deterministic for a given seed."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    n = int(round(seconds * sr))
+    t = np.arange(n) / sr
+    base_f0 = rng.uniform(100.0, 200.0)
+    f0 = base_f0 * (1.0 + 0.1 * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, 2 * np.pi))) \
+        * (1.0 + 0.01 * np.sin(2 * np.pi * 5.5 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    formants = rng.uniform([500.0, 1200.0, 2400.0], [800.0, 1800.0, 3000.0])
+    voiced = np.zeros(n)
+    for k in range(1, 16):
+        # harmonics near a formant get more energy; anything above Nyquist is skipped
+        gain = sum(np.exp(-((k * base_f0 - fc) / 250.0) ** 2) for fc in formants) + 0.05 / k
+        if k * base_f0 < sr / 2:
+            voiced += gain * np.sin(k * phase)
+    # ~4 syllables per second, with a silent gap roughly every 1.5 s
+    envelope = np.clip(np.sin(2 * np.pi * rng.uniform(3.5, 4.5) * t) ** 2, 0.0, 1.0)
+    envelope *= (np.sin(2 * np.pi * t / 1.5 + rng.uniform(0, 2 * np.pi)) > -0.8)
+    signal = 0.3 * envelope * voiced / (np.abs(voiced).max() + 1e-9)
+    signal += 0.01 * rng.standard_normal(n)
+    return signal.astype(np.float32)
+
+
+def write_synthetic_corpus(folder: str, count: int, seconds: float, sr: int = 16000,
+                           seed: int = 0) -> Tuple[List[str], str]:
+    """Write `count` synthetic wav files plus a `filepath,label` metadata CSV (alternating
+    truth/lie). Returns (wav paths, metadata path)."""
+    import soundfile as sf
+
+    os.makedirs(folder, exist_ok=True)
+    paths: List[str] = []
+    rows = ["filepath,label"]
+    for i in range(count):
+        path = os.path.join(folder, f"synthetic_{i:04d}.wav")
+        sf.write(path, synthetic_speech(seconds, sr, seed=seed + i), sr, subtype="PCM_16")
+        paths.append(path)
+        rows.append(f"{os.path.basename(path)},{'lie' if i % 2 else 'truth'}")
+    metadata = os.path.join(folder, "metadata.csv")
+    with open(metadata, "w", encoding="utf-8") as f:
+        f.write("\n".join(rows) + "\n")
+    return paths, metadata
@@ -0,0 +1,99 @@
+"""Accuracy parity and throughput of bf16 autocast against float32 on the same HDF5 splits.
+
+    python -m benchmarks.bench_bf16_parity --h5 data/processed/mfcc.h5 --model experiments/ernn.pt
+
+Evaluates one checkpoint on the seeded train/val/test split used by `train_validate_test`,
+once in fp32 and once in bf16, and reports accuracy and macro F1 per split, prediction agreement,
+max |p_bf16 - p_fp32| and inference throughput. With `--train_epochs N` it also trains a
+model from the same seed in both precisions and compares the resulting test metrics.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from benchmarks._common import make_synthetic_h5, write_report
+from src.eval.evaluate import _load_model
+from src.eval.metrics import classification_metrics, confusion_matrix_from_labels
+from src.models import autocast, bf16_supported
+from src.training.dataset import unpack_batch
+from src.training.train_eval import _build_loaders, load_h5_data, train_validate_test
+
+
+def _predict(model, loader, precision):
+    probs, labels = [], []
+    t0 = time.perf_counter()
+    with torch.no_grad():
+        for batch in loader:
+            xb, lengths, yb = unpack_batch(batch)
+            with autocast(precision):
+                logits = model(xb, lengths)
+            probs.append(torch.softmax(logits.float(), dim=1).numpy())
+            labels.append(yb.numpy())
+    seconds = time.perf_counter() - t0
+    return np.concatenate(probs), np.concatenate(labels), seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--h5", help="HDF5 features; a synthetic file is generated if omitted")
+    parser.add_argument("--model", help="checkpoint; trained on the fly (fp32) if omitted")
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--train_epochs", type=int, default=0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    h5_path = args.h5 or make_synthetic_h5(os.path.join(workdir, "synthetic.h5"), num_segments=2048)
+    if args.model:
+        model = _load_model(args.model)
+    else:
+        _, model = train_validate_test(h5_path, model_type="bilstm", epochs=3, return_model=True)
+    model.eval()
+
+    X, y = load_h5_data(h5_path)
+    splits = dict(zip(("train", "val", "test"), _build_loaders(X, y, args.batch, seed=42)))
+    results = {}
+    for name, loader in splits.items():
+        if name == "train":
+            # unshuffled so both precisions see identical batches
+            loader = torch.utils.data.DataLoader(loader.dataset, batch_size=args.batch,
+                                                 collate_fn=loader.collate_fn)
+        p32, labels, t32 = _predict(model, loader, "fp32")
+        p16, _, t16 = _predict(model, loader, "bf16")
+        n_classes = p32.shape[1]
+        m32 = classification_metrics(confusion_matrix_from_labels(labels, p32.argmax(1), n_classes))
+        m16 = classification_metrics(confusion_matrix_from_labels(labels, p16.argmax(1), n_classes))
+        results[name] = {
+            "n": int(len(labels)),
+            "acc_fp32": m32["accuracy"],
+            "acc_bf16": m16["accuracy"],
+            "acc_delta": m16["accuracy"] - m32["accuracy"],
+            "f1_fp32": m32["f1"],
+            "f1_bf16": m16["f1"],
+            "f1_delta": m16["f1"] - m32["f1"],
+            "prediction_agreement": float((p32.argmax(1) == p16.argmax(1)).mean()),
+            "max_abs_prob_diff": float(np.abs(p32 - p16).max()),
+            "samples_per_sec_fp32": len(labels) / t32,
+            "samples_per_sec_bf16": len(labels) / t16,
+            "speedup": t32 / t16,
+        }
+
+    training = None
+    if args.train_epochs:
+        training = {}
+        for precision in ("fp32", "bf16"):
+            t0 = time.perf_counter()
+            metrics = train_validate_test(h5_path, model_type="bilstm", epochs=args.train_epochs,
+                                          patience=None, precision=precision)
+            training[precision] = {**metrics, "seconds": time.perf_counter() - t0}
+
+    write_report(args.out, "bf16_parity", results, h5=h5_path, bf16_native=bf16_supported(),
+                 training=training)
+
+
+if __name__ == "__main__":
+    main()
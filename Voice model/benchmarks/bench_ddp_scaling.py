@@ -0,0 +1,54 @@
+"""Scaling of CPU DistributedDataParallel training across local process counts.
+
+    python -m benchmarks.bench_ddp_scaling --procs 1 2 4 8 --out experiments/bench/ddp_scaling.json
+
+Every run trains for `--epochs` on the same HDF5 split with patience disabled, so the
+reported throughput (train samples/sec, mean over epochs) is directly comparable.
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks._common import make_synthetic_h5, write_report
+from src.training.distributed import default_threads_per_process, train_distributed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--h5", help="HDF5 features; a synthetic file is generated if omitted")
+    parser.add_argument("--procs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--batch", type=int, default=64, help="per-process batch size")
+    parser.add_argument("--segments", type=int, default=4096)
+    parser.add_argument("--frames", type=int, default=62)
+    parser.add_argument("--model_type", default="lstm")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    h5_path = args.h5 or make_synthetic_h5(
+        os.path.join(tempfile.mkdtemp(), "synthetic.h5"), num_segments=args.segments, frames=args.frames)
+
+    results = []
+    for i, world_size in enumerate(args.procs):
+        metrics = train_distributed(
+            h5_path, world_size=world_size, model_type=args.model_type, epochs=args.epochs,
+            batch_size=args.batch, patience=None, master_port=29512 + i,
+        )
+        throughput = [h["train_samples_per_sec"] for h in metrics["history"]]
+        results.append({
+            "world_size": world_size,
+            "threads_per_process": default_threads_per_process(world_size),
+            "train_samples_per_sec": sum(throughput) / len(throughput),
+            "epoch_seconds": [h["epoch_seconds"] for h in metrics["history"]],
+            "val_acc": metrics["val_acc"],
+        })
+
+    base = results[0]["train_samples_per_sec"]
+    for r in results:
+        r["speedup"] = r["train_samples_per_sec"] / base
+        r["efficiency"] = r["speedup"] / (r["world_size"] / results[0]["world_size"])
+    write_report(args.out, "ddp_scaling", results, h5=h5_path, epochs=args.epochs, batch_per_process=args.batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Per-call CPU latency of the eager `RNNClassifier` forward vs the fused inference export.
+
+    python -m benchmarks.bench_fused_forward --lengths 50 500 5000 --threads 1
+
+Batch size 1, as in the backend. Reports median latency per call in milliseconds and the
+max |logit difference| against the eager model for every variant.
+"""
+import argparse
+
+import torch
+
+from benchmarks._common import time_call, write_report
+from src.eval.evaluate import _load_model
+from src.models import RNNClassifier, RNNConfig, fuse_for_inference
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="checkpoint; a randomly initialised BiLSTM is used if omitted")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--compile", action="store_true", help="also time the torch.compile variant")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+    if args.model:
+        model = _load_model(args.model)
+    else:
+        model = RNNClassifier(RNNConfig(input_size=39, hidden_size=256, model_type="bilstm")).eval()
+    variants = {"eager": model, "fused": fuse_for_inference(model)}
+    if args.compile:
+        variants["fused_compiled"] = fuse_for_inference(model, compile=True)
+
+    results = []
+    with torch.inference_mode():
+        for steps in args.lengths:
+            x = torch.randn(1, steps, model.config.input_size)
+            reference = model(x)
+            for name, variant in variants.items():
+                timing = time_call(lambda: variant(x), repeats=args.repeats, warmup=3)
+                results.append({
+                    "T": steps,
+                    "variant": name,
+                    "median_ms": timing["median_s"] * 1e3,
+                    "min_ms": timing["min_s"] * 1e3,
+                    "max_abs_diff": float((variant(x) - reference).abs().max()),
+                })
+    write_report(args.out, "fused_forward", results, threads=torch.get_num_threads())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Import-time budget for package entry points, measured with `python -X importtime`.
+
+    python -m benchmarks.bench_import_time            # exits 1 if any budget is exceeded
+
+Every target is imported in a fresh interpreter. A target fails when its cumulative import
+time exceeds its budget or when it pulls in any of the heavy modules it must load lazily
+(torch, librosa, moviepy, ...). Suitable as a CI gate for cold-start regressions.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+from benchmarks._common import write_report
+
+VOICE_MODEL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_ROOT = os.path.join(os.path.dirname(VOICE_MODEL_ROOT), "backend")
+
+HEAVY = ("torch", "librosa", "moviepy", "pydub", "captum", "shap", "lime", "matplotlib", "sklearn")
+
+# (module, working directory, budget in ms, heavy modules that must not be imported)
+TARGETS: List[Tuple[str, str, float, Tuple[str, ...]]] = [
+    ("src", VOICE_MODEL_ROOT, 50.0, HEAVY),
+    ("src.models", VOICE_MODEL_ROOT, 50.0, HEAVY),
+    ("src.training", VOICE_MODEL_ROOT, 50.0, HEAVY),
+    ("src.eval", VOICE_MODEL_ROOT, 50.0, HEAVY),
+    ("src.xai", VOICE_MODEL_ROOT, 50.0, HEAVY),
+    ("src.preprocess", VOICE_MODEL_ROOT, 50.0, HEAVY),
+    ("src.features", VOICE_MODEL_ROOT, 50.0, HEAVY),
+    ("predictor", BACKEND_ROOT, 300.0, HEAVY),
+    ("app", BACKEND_ROOT, 1500.0, HEAVY),
+]
+
+
+def measure_import(module: str, cwd: str) -> Tuple[float, Set[str]]:
+    """Return (cumulative import time in ms, names of all modules imported) for `module`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    # the target and its parent packages; interpreter startup (site, encodings) is excluded
+    parts = module.split(".")
+    own = {".".join(parts[:i]) for i in range(1, len(parts) + 1)}
+    total_us = 0
+    imported: Set[str] = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported.add(name.strip())
+        if not name.startswith("  ") and name.strip() in own:  # top-level entry
+            total_us += int(cumulative)
+    return total_us / 1000.0, imported
+
+
+def check(targets=TARGETS) -> Tuple[List[Dict[str, object]], bool]:
+    results: List[Dict[str, object]] = []
+    ok = True
+    for module, cwd, budget_ms, forbidden in targets:
+        elapsed_ms, imported = measure_import(module, cwd)
+        heavy = sorted(m for m in imported if m.split(".")[0] in forbidden)
+        heavy_roots = sorted({m.split(".")[0] for m in heavy})
+        passed = elapsed_ms <= budget_ms and not heavy
+        ok &= passed
+        results.append({
+            "module": module,
+            "import_ms": round(elapsed_ms, 2),
+            "budget_ms": budget_ms,
+            "heavy_imports": heavy_roots,
+            "passed": passed,
+        })
+    return results, ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget (slow CI hosts)")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    targets = [(m, cwd, budget * args.scale, forbidden) for m, cwd, budget, forbidden in TARGETS]
+    results, ok = check(targets)
+    write_report(args.out, "import_time", results, passed=ok)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Speed of each resampling tier and how far its MFCCs drift from the 'hq' reference.
+
+    python -m benchmarks.bench_resample --rates 44100 48000 22050 --seconds 30
+
+For every source rate a synthetic speech clip is generated at that rate and resampled to
+`--target` with each tier in `src.preprocess.resample.QUALITIES`. Reported per tier: timing
+and realtime factor, the signal SNR against 'hq', and the drift of the training MFCCs
+(pre-emphasis + `PreprocessConfig` defaults) against 'hq' -- max and mean absolute
+difference in dB and the relative RMS error. The first call per rate pair includes filter
+design for 'polyphase' and is excluded as warm-up.
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks._common import synthetic_speech, time_call, write_report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", type=int, nargs="+", default=[44100, 48000, 22050])
+    parser.add_argument("--target", type=int, default=16000)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    from src.features.extractor import FeatureExtractor
+    from src.preprocess.pipeline import PreprocessConfig, apply_pre_emphasis
+    from src.preprocess.resample import QUALITIES, resample
+
+    config = PreprocessConfig(input_folder="", output_file="", sample_rate=args.target)
+    extractor = FeatureExtractor.from_config(config)
+
+    def mfcc(signal):
+        return extractor.mfcc(apply_pre_emphasis(signal, config.pre_emphasis))
+
+    results = []
+    for rate in args.rates:
+        source = synthetic_speech(args.seconds, rate, seed=args.seed)
+        reference = resample(source, rate, args.target, "hq")
+        ref_mfcc = mfcc(reference)
+        for quality in QUALITIES:
+            timing = time_call(lambda: resample(source, rate, args.target, quality), args.repeats)
+            if quality == "hq":
+                hq_median = timing["median_s"]
+            out = resample(source, rate, args.target, quality)
+            n = min(len(out), len(reference))
+            noise = out[:n] - reference[:n]
+            snr_db = 10.0 * np.log10(np.sum(reference[:n] ** 2) / max(float(np.sum(noise ** 2)), 1e-20))
+            coeffs = mfcc(out)
+            frames = min(len(coeffs), len(ref_mfcc))
+            diff = np.abs(coeffs[:frames] - ref_mfcc[:frames])
+            row = {"case": f"{rate}->{args.target}", "quality": quality}
+            row.update(timing)
+            row.update({
+                "realtime_x": args.seconds / timing["median_s"],
+                "speedup_vs_hq": hq_median / timing["median_s"],
+                "length_delta": int(len(out) - len(reference)),
+                "snr_vs_hq_db": float(snr_db) if quality != "hq" else None,
+                "mfcc_max_abs_db": float(diff.max()),
+                "mfcc_mean_abs_db": float(diff.mean()),
+                "mfcc_rel_rms": float(np.sqrt(np.mean(diff ** 2)) / (np.sqrt(np.mean(ref_mfcc ** 2)) + 1e-12)),
+            })
+            results.append(row)
+
+    write_report(args.out, "resample", results, config=vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Block-streamed vs whole-file loading of one long recording: equality, peak memory and
+time to the first segment.
+
+    python -m benchmarks.bench_stream --rate 44100 --minutes 20 --block-seconds 30
+
+A synthetic speech file of `--minutes` is written at `--rate` and at `--target` (stereo
+with `--stereo`). For each resampling tier, the whole-file path (`load_audio_file`,
+`apply_pre_emphasis`, `segment_signal`) and `stream_segments` are compared segment by
+segment. Reported: whether every segment is bit-identical and the max absolute difference,
+the peak traced allocation of each path (`tracemalloc`, which sees NumPy buffers) and the
+seconds until the first segment is available. The command exits 1 if the "polyphase" tier
+or a file already at `--target` is not bit-identical; the soxr tiers are reported only.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks._common import synthetic_speech, write_report
+
+
+def _whole(path, config):
+    from src.preprocess.pipeline import apply_pre_emphasis, load_audio_file, segment_signal
+
+    t0 = time.perf_counter()
+    signal, sr = load_audio_file(path, config.sample_rate, quality=config.resample_quality)
+    signal = apply_pre_emphasis(signal, config.pre_emphasis)
+    spans = segment_signal(signal, sr, config.segment_seconds, config.hop_seconds, config.drop_last)
+    first = time.perf_counter() - t0
+    return [(s, e, signal[s:e]) for s, e in spans], first
+
+
+def _streamed(path, config, block_seconds, keep=True):
+    from src.preprocess.pipeline import _samples_for_seconds
+    from src.preprocess.stream import stream_segments
+
+    sr = config.sample_rate
+    t0 = time.perf_counter()
+    first = None
+    segments = []
+    for start, end, samples in stream_segments(path, sr, _samples_for_seconds(config.segment_seconds, sr),
+                                               _samples_for_seconds(config.hop_seconds, sr), config.drop_last,
+                                               config.pre_emphasis, config.resample_quality, block_seconds):
+        if first is None:
+            first = time.perf_counter() - t0
+        if keep:  # kept segments pin their blocks, so the memory pass keeps none
+            segments.append((start, end, samples))
+    return segments, first
+
+
+def _traced(fn):
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=int, default=44100)
+    parser.add_argument("--target", type=int, default=16000)
+    parser.add_argument("--minutes", type=float, default=20.0)
+    parser.add_argument("--block-seconds", type=float, default=30.0)
+    parser.add_argument("--segment-seconds", type=float, default=1.0)
+    parser.add_argument("--hop-seconds", type=float, default=0.5)
+    parser.add_argument("--keep-last", action="store_true", help="drop_last=False")
+    parser.add_argument("--stereo", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    import soundfile as sf
+
+    from src.preprocess.pipeline import PreprocessConfig
+    from src.preprocess.resample import QUALITIES
+
+    results = []
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = []
+        for rate in sorted({args.rate, args.target}):
+            signal = synthetic_speech(args.minutes * 60.0, rate, seed=args.seed)
+            if args.stereo:
+                signal = np.stack([signal, 0.5 * signal[::-1]], axis=1)
+            path = os.path.join(tmp, f"long_{rate}.wav")
+            sf.write(path, signal, rate, subtype="PCM_16")
+            sources.append((rate, path))
+            del signal
+
+        for rate, path in sources:
+            for quality in (QUALITIES if rate != args.target else ("polyphase",)):
+                config = PreprocessConfig(input_folder="", output_file="", sample_rate=args.target,
+                                          resample_quality=quality, segment_seconds=args.segment_seconds,
+                                          hop_seconds=args.hop_seconds, drop_last=not args.keep_last)
+                (whole, whole_first), whole_peak = _traced(lambda: _whole(path, config))
+                (_, stream_first), stream_peak = _traced(lambda: _streamed(path, config, args.block_seconds, keep=False))
+                streamed, _ = _streamed(path, config, args.block_seconds)
+                spans_match = [(s, e) for s, e, _ in whole] == [(s, e) for s, e, _ in streamed]
+                identical = spans_match and all(np.array_equal(a, b) for (_, _, a), (_, _, b) in zip(whole, streamed))
+                max_diff = max((float(np.max(np.abs(a - b))) for (_, _, a), (_, _, b) in zip(whole, streamed)
+                                if len(a) and len(a) == len(b)), default=0.0)
+                case = f"{rate}->{args.target}"
+                results.append({
+                    "case": case,
+                    "quality": quality if rate != args.target else "none",
+                    "segments": len(whole),
+                    "spans_match": spans_match,
+                    "bit_identical": identical,
+                    "max_abs_diff": max_diff,
+                    "whole_peak_mb": whole_peak / 2 ** 20,
+                    "stream_peak_mb": stream_peak / 2 ** 20,
+                    "whole_first_segment_s": whole_first,
+                    "stream_first_segment_s": stream_first,
+                })
+                if not identical and (quality == "polyphase" or rate == args.target):
+                    failed.append(case)
+                del whole, streamed
+
+    write_report(args.out, "stream", results, config=vars(args))
+    if failed:
+        print(f"streamed segments differ from the whole-file path: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Validate the torch MFCC frontend against the NumPy/librosa features and time both.
+
+    python -m benchmarks.bench_torch_frontend --durations 1 3 7 --count 16 --tolerance 1e-2
+
+Two checks, each on a padded batch of synthetic clips with different lengths:
+
+* `training`: per-segment MFCCs of the `PreprocessConfig` defaults. `extract_mfcc_from_segment`
+  runs on every pre-emphasised segment in a loop; `MFCCFrontend` (pre-emphasis off, since the
+  segments already have it) runs on all segments in one call.
+* `backend`: `FeatureExtractor.legacy_backend()` (13 MFCC + delta + delta-delta) on whole
+  clips of different lengths, against one padded `MFCCFrontend` batch.
+
+Reports the max/mean absolute difference over valid frames and both timings. The command
+exits 1 if a max difference exceeds `--tolerance` (dB units for MFCCs).
+"""
+import argparse
+import sys
+
+import numpy as np
+import torch
+
+from benchmarks._common import synthetic_speech, time_call, write_report
+
+
+def _pad(signals):
+    lengths = torch.tensor([len(s) for s in signals], dtype=torch.long)
+    batch = torch.zeros(len(signals), int(lengths.max()))
+    for i, s in enumerate(signals):
+        batch[i, :len(s)] = torch.from_numpy(np.asarray(s, dtype=np.float32))
+    return batch, lengths
+
+
+def _compare(name, reference, frontend, signals, repeats):
+    batch, lengths = _pad(signals)
+    with torch.no_grad():
+        features, frames = frontend(batch, lengths)
+    diffs = [np.abs(features[i, :int(frames[i])].numpy() - ref) for i, ref in enumerate(reference["outputs"])]
+    shapes_match = all(int(frames[i]) == ref.shape[0] for i, ref in enumerate(reference["outputs"]))
+
+    def run_torch():
+        with torch.no_grad():
+            frontend(batch, lengths)
+
+    torch_timing = time_call(run_torch, repeats)
+    return {
+        "check": name,
+        "items": len(signals),
+        "shapes_match": shapes_match,
+        "max_abs_diff": float(max(d.max() for d in diffs)),
+        "mean_abs_diff": float(np.mean([d.mean() for d in diffs])),
+        "numpy_median_s": reference["timing"]["median_s"],
+        "torch_median_s": torch_timing["median_s"],
+        "speedup": reference["timing"]["median_s"] / torch_timing["median_s"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=float, nargs="+", default=[1.0, 3.0, 7.0],
+                        help="clip lengths cycled over the batch")
+    parser.add_argument("--count", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--tolerance", type=float, default=1e-2)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    from src.features.extractor import FeatureExtractor
+    from src.features.torch_frontend import MFCCFrontend
+    from src.preprocess.pipeline import PreprocessConfig, apply_pre_emphasis, extract_mfcc_from_segment, segment_signal
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    config = PreprocessConfig(input_folder="", output_file="")
+    sr = config.sample_rate
+    clips = [synthetic_speech(args.durations[i % len(args.durations)], sr, seed=args.seed + i)
+             for i in range(args.count)]
+    results = []
+
+    # training features: per-segment loop vs one batched call
+    segments = []
+    for clip in clips:
+        emphasized = apply_pre_emphasis(clip, config.pre_emphasis)
+        segments += [emphasized[s:e] for s, e in segment_signal(emphasized, sr, config.segment_seconds,
+                                                                 config.hop_seconds, config.drop_last)]
+
+    def mfcc_loop():
+        return [extract_mfcc_from_segment(seg, sr, n_fft=config.n_fft, hop_length=config.hop_length,
+                                          window=config.window, n_mels=config.n_mels, n_mfcc=config.n_mfcc,
+                                          fmin=config.fmin, fmax=config.fmax) for seg in segments]
+
+    training = FeatureExtractor.from_config(config)
+    training.pre_emphasis = 0.0  # segments are already pre-emphasised
+    results.append(_compare("training", {"outputs": mfcc_loop(), "timing": time_call(mfcc_loop, args.repeats)},
+                            MFCCFrontend(training), segments, args.repeats))
+
+    # backend features: whole clips of different lengths, with deltas
+    legacy = FeatureExtractor.legacy_backend()
+
+    def transform_loop():
+        return [legacy.transform(clip) for clip in clips]
+
+    results.append(_compare("backend", {"outputs": transform_loop(), "timing": time_call(transform_loop, args.repeats)},
+                            MFCCFrontend(legacy), clips, args.repeats))
+
+    write_report(args.out, "torch_frontend", results, config=vars(args), threads=torch.get_num_threads())
+    failed = [r["check"] for r in results if not r["shapes_match"] or r["max_abs_diff"] > args.tolerance]
+    if failed:
+        print(f"frontend mismatch beyond tolerance {args.tolerance}: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
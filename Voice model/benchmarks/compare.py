@@ -0,0 +1,68 @@
+"""Compare two `run_suite` reports and flag regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.10
+
+Rows are matched on (stage, case). Latency (`median_s`) regresses when it grows by more than
+`--threshold`; throughput columns regress when they shrink by more than it. Exits 1 if any
+row regressed, so it can gate CI. Differences in host or torch version are reported, since
+numbers from different machines are not comparable.
+"""
+import argparse
+import json
+import sys
+
+LOWER_IS_BETTER = ("median_s",)
+HIGHER_IS_BETTER = ("requests_per_s", "segments_per_s", "realtime_x")
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return report, {(row["stage"], row["case"]): row for row in report["results"]}
+
+
+def compare(baseline, candidate, threshold=0.10):
+    """Return one entry per (stage, case, metric) present in both runs, with the relative change
+    (positive = slower / lower throughput) and whether it exceeds `threshold`."""
+    rows = []
+    for key in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[key], candidate[key]
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            if metric not in old or metric not in new or not old[metric]:
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            rows.append({"stage": key[0], "case": key[1], "metric": metric, "baseline": old[metric],
+                         "candidate": new[metric], "change": change, "regressed": change > threshold})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    base_report, baseline = _load(args.baseline)
+    cand_report, candidate = _load(args.candidate)
+    for field in ("platform", "processor", "cpu_count", "torch", "torch_threads"):
+        a, b = base_report["environment"].get(field), cand_report["environment"].get(field)
+        if a != b:
+            print(f"warning: {field} differs ({a} vs {b}); results may not be comparable")
+    for key in sorted(set(baseline) ^ set(candidate)):
+        print(f"note: {key[0]}/{key[1]} only in {'baseline' if key in baseline else 'candidate'}")
+
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        flag = "REGRESSION" if row["regressed"] else ("improved" if row["change"] < -args.threshold else "")
+        print(f"{row['stage']:<16} {row['case']:<8} {row['metric']:<15} {row['baseline']:>12.5g} -> "
+              f"{row['candidate']:<12.5g} {row['change']:+7.1%}  {flag}")
+    regressions = [r for r in rows if r["regressed"]]
+    print(f"{len(regressions)} regression(s) over {args.threshold:.0%} in {len(rows)} comparisons")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
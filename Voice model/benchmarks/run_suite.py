@@ -0,0 +1,205 @@
+"""End-to-end benchmark suite for the voice pipeline on synthetic speech-like audio.
+
+    python -m benchmarks.run_suite --durations 5 30 --count 8 --out experiments/bench/base.json
+    python -m benchmarks.run_suite --stages extract_mfcc train_epoch --out experiments/bench/new.json
+    python -m benchmarks.compare experiments/bench/base.json experiments/bench/new.json
+
+Audio is generated deterministically from `--seed`, so two runs on the same host time the
+same work. Per-clip stages (load, pre-emphasis, segmentation, MFCC, pitch) run for each
+`--durations` value; the corpus stages (save_hdf5, dataloader) use `--count` clips of the
+first duration; `train_epoch` trains one epoch on `--train-segments` synthetic segments; and
+`backend_predict` calls the backend's `predict()` in-process at each `--concurrency` level,
+with a randomly initialised model unless `--backend-model` is given.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks._common import make_synthetic_h5, time_call, write_report, write_synthetic_corpus
+
+STAGES = ("load_audio", "vad", "pre_emphasis", "segment", "extract_mfcc", "pitch_yin", "save_hdf5",
+          "dataloader", "train_epoch", "backend_predict")
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                           "backend")
+
+
+def _row(stage, case, timing, **extra):
+    row = {"stage": stage, "case": case}
+    row.update(timing)
+    row.update(extra)
+    return row
+
+
+def _clip_stages(stages, config, clip_path, seconds, repeats):
+    from src.features.pitch import PitchConfig, compute_pitch_yin, segment_frames, _frame_and_hop_samples
+    from src.preprocess.pipeline import (
+        apply_pre_emphasis, extract_mfcc_from_segment, load_audio_file, segment_signal,
+    )
+
+    case = f"{seconds:g}s"
+    rows = []
+    signal, sr = load_audio_file(clip_path, config.sample_rate)
+    if "load_audio" in stages:
+        timing = time_call(lambda: load_audio_file(clip_path, config.sample_rate), repeats)
+        rows.append(_row("load_audio", case, timing, realtime_x=seconds / timing["median_s"]))
+    if "vad" in stages:
+        from src.features.vad import VADConfig, apply_vad
+
+        vad_cfg = VADConfig(aggressiveness=config.vad_aggressiveness or 1, mode=config.vad_mode)
+        timing = time_call(lambda: apply_vad(signal, sr, vad_cfg), repeats)
+        # kept_fraction is the share of audio (and so of MFCC/forward work) left after VAD
+        rows.append(_row("vad", case, timing, kept_fraction=apply_vad(signal, sr, vad_cfg)[1].kept_fraction,
+                         realtime_x=seconds / timing["median_s"]))
+    emphasized = apply_pre_emphasis(signal, config.pre_emphasis)
+    if "pre_emphasis" in stages:
+        rows.append(_row("pre_emphasis", case, time_call(lambda: apply_pre_emphasis(signal, config.pre_emphasis), repeats)))
+
+    def segment():
+        return segment_signal(emphasized, sr, config.segment_seconds, config.hop_seconds, config.drop_last)
+
+    if "segment" in stages:
+        rows.append(_row("segment", case, time_call(segment, repeats)))
+    if "extract_mfcc" in stages:
+        bounds = segment()
+
+        def mfcc_all():
+            for start, end in bounds:
+                extract_mfcc_from_segment(emphasized[start:end], sr, n_fft=config.n_fft,
+                                          hop_length=config.hop_length, window=config.window,
+                                          n_mels=config.n_mels, n_mfcc=config.n_mfcc,
+                                          fmin=config.fmin, fmax=config.fmax)
+
+        timing = time_call(mfcc_all, repeats)
+        rows.append(_row("extract_mfcc", case, timing, segments=len(bounds),
+                         realtime_x=seconds / timing["median_s"]))
+    if "pitch_yin" in stages:
+        pitch_cfg = PitchConfig(input_folder="", output_file="", sample_rate=sr)
+        frame, hop = _frame_and_hop_samples(pitch_cfg)
+        frames = segment_frames(signal, sr, frame, hop)
+        timing = time_call(lambda: compute_pitch_yin(frames, sr, pitch_cfg), repeats)
+        rows.append(_row("pitch_yin", case, timing, frames=int(frames.shape[0]),
+                         realtime_x=seconds / timing["median_s"]))
+    return rows
+
+
+def _corpus_stages(stages, config, paths, metadata, workdir, repeats, batch_size):
+    from src.preprocess.pipeline import compute_dataset_mfcc, compute_feature_stats, normalize_feature_list, save_hdf5
+    from src.training.dataset import create_dataloaders_from_h5
+
+    rows = []
+    config.metadata_csv = metadata
+    features, metas = compute_dataset_mfcc(paths, config)
+    mean, std = compute_feature_stats(features)
+    normed = normalize_feature_list(features, mean, std)
+    h5_path = os.path.join(workdir, "suite.h5")
+    case = f"{len(normed)}seg"
+    if "save_hdf5" in stages or "dataloader" in stages:
+        timing = time_call(lambda: save_hdf5(h5_path, normed, metas, mean, std, config), repeats, warmup=0)
+        if "save_hdf5" in stages:
+            rows.append(_row("save_hdf5", case, timing, segments_per_s=len(normed) / timing["median_s"]))
+    if "dataloader" in stages:
+        train_loader = create_dataloaders_from_h5(h5_path, batch_size=batch_size)[0]
+
+        def drain():
+            for _ in train_loader:
+                pass
+
+        timing = time_call(drain, repeats)
+        n = len(train_loader.dataset)
+        rows.append(_row("dataloader", case, timing, segments_per_s=n / timing["median_s"]))
+    return rows
+
+
+def _train_epoch(workdir, segments, batch_size):
+    from src.training.train_eval import train_validate_test
+
+    h5_path = make_synthetic_h5(os.path.join(workdir, "train.h5"), num_segments=segments)
+    timing = time_call(lambda: train_validate_test(h5_path, epochs=1, batch_size=batch_size), repeats=1, warmup=0)
+    return [_row("train_epoch", f"{segments}seg", timing, segments_per_s=segments / timing["median_s"])]
+
+
+def _backend_predict(paths, model_path, workdir, levels, requests):
+    sys.path.insert(0, BACKEND_DIR)
+    import torch
+    import predictor
+
+    if model_path is None:
+        torch.manual_seed(0)
+        model_path = os.path.join(workdir, "backend_random.pth")
+        torch.save(predictor.BiLSTM_Attention().state_dict(), model_path)
+    predictor.predict(paths[0], model_path)  # load the model and warm up
+
+    rows = []
+    for level in levels:
+        jobs = [paths[i % len(paths)] for i in range(requests)]
+
+        def one(path):
+            t0 = time.perf_counter()
+            predictor.predict(path, model_path)
+            return time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            latencies = np.sort(np.fromiter(pool.map(one, jobs), dtype=np.float64))
+        wall = time.perf_counter() - t0
+        rows.append({
+            "stage": "backend_predict",
+            "case": f"c{level}",
+            "median_s": float(np.median(latencies)),
+            "p95_s": float(np.percentile(latencies, 95)),
+            "min_s": float(latencies[0]),
+            "repeats": requests,
+            "requests_per_s": requests / wall,
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--durations", type=float, nargs="+", default=[5.0, 30.0], help="clip lengths in seconds")
+    parser.add_argument("--count", type=int, default=8, help="clips in the corpus for save_hdf5/dataloader/predict")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--train-segments", type=int, default=1024)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=16, help="predict calls per concurrency level")
+    parser.add_argument("--backend-model", default=None, help="backend .pth; random weights if omitted")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    import torch
+    from src.preprocess.pipeline import PreprocessConfig
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    stages = set(args.stages)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        config = PreprocessConfig(input_folder=workdir, output_file=os.path.join(workdir, "unused.h5"))
+        for i, seconds in enumerate(args.durations):
+            paths, metadata = write_synthetic_corpus(os.path.join(workdir, f"clips_{i}"), args.count, seconds,
+                                                     config.sample_rate, seed=args.seed)
+            results += _clip_stages(stages, config, paths[0], seconds, args.repeats)
+            if i == 0:
+                corpus, corpus_metadata = paths, metadata
+        if stages & {"save_hdf5", "dataloader"}:
+            results += _corpus_stages(stages, config, corpus, corpus_metadata, workdir, args.repeats, args.batch_size)
+        if "train_epoch" in stages:
+            results += _train_epoch(workdir, args.train_segments, args.batch_size)
+        if "backend_predict" in stages:
+            results += _backend_predict(corpus, args.backend_model, workdir, args.concurrency, args.requests)
+
+    write_report(args.out, "suite", results, config={k: v for k, v in vars(args).items() if k != "out"},
+                 threads=torch.get_num_threads())
+
+
+if __name__ == "__main__":
+    main()
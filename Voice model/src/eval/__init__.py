@@ -1,5 +1,23 @@
-from .evaluate import evaluate_model_on_h5
+import importlib
 
-__all__ = ["evaluate_model_on_h5"]
+_EXPORTS = {
+	"evaluate_model_on_h5": ".evaluate",
+	"binary_curves": ".metrics",
+	"classification_metrics": ".metrics",
+	"confusion_matrix_from_labels": ".metrics",
+}
 
+__all__ = list(_EXPORTS)
 
+
+def __getattr__(name):
+	module = _EXPORTS.get(name)
+	if module is None:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	value = getattr(importlib.import_module(module, __name__), name)
+	globals()[name] = value
+	return value
+
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
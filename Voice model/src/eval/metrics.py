@@ -0,0 +1,74 @@
+from typing import Dict
+
+import numpy as np
+
+
+def confusion_matrix_from_labels(y_true: np.ndarray, y_pred: np.ndarray, n_classes: int) -> np.ndarray:
+    """(n_classes, n_classes) counts, rows = true class, columns = predicted class."""
+    flat = np.asarray(y_true, dtype=np.int64) * n_classes + np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(flat, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+
+def classification_metrics(cm: np.ndarray) -> Dict[str, float]:
+    """Accuracy and macro precision/recall/F1 from a confusion matrix (0 where undefined)."""
+    cm = cm.astype(np.float64)
+    tp = np.diag(cm)
+    predicted = cm.sum(axis=0)
+    actual = cm.sum(axis=1)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, actual, out=np.zeros_like(tp), where=actual > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+    return {
+        "accuracy": float(tp.sum() / max(cm.sum(), 1.0)),
+        "precision": float(precision.mean()),
+        "recall": float(recall.mean()),
+        "f1": float(f1.mean()),
+    }
+
+
+def binary_curves(y_true: np.ndarray, scores: np.ndarray) -> Dict[str, np.ndarray]:
+    """ROC and precision-recall points, ROC AUC and average precision from one sort.
+
+    Scores are sorted once (descending); cumulative true/false positive counts at every
+    distinct threshold give all curve points. ROC starts at (0, 0); PR points are ordered by
+    decreasing threshold and start at (recall 0, precision 1). AUC/AP are NaN when only one
+    class is present.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind="mergesort")
+    sorted_scores = scores[order]
+    sorted_true = y_true[order]
+
+    # last index of every run of equal scores = one threshold
+    distinct = np.flatnonzero(np.diff(sorted_scores)) if len(scores) else np.array([], dtype=np.int64)
+    threshold_idx = np.r_[distinct, len(scores) - 1] if len(scores) else distinct
+    tps = np.cumsum(sorted_true)[threshold_idx].astype(np.float64)
+    fps = (threshold_idx + 1) - tps
+    positives = float(tps[-1]) if len(tps) else 0.0
+    negatives = float(fps[-1]) if len(fps) else 0.0
+
+    tpr = np.r_[0.0, tps / positives] if positives > 0 else np.r_[0.0, np.zeros_like(tps)]
+    fpr = np.r_[0.0, fps / negatives] if negatives > 0 else np.r_[0.0, np.zeros_like(fps)]
+    precision = np.r_[1.0, tps / np.maximum(tps + fps, 1.0)]
+    recall = tpr.copy()
+
+    defined = positives > 0 and negatives > 0
+    roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2.0)) if defined else float("nan")
+    average_precision = float(np.sum(np.diff(recall) * precision[1:])) if positives > 0 else float("nan")
+    return {
+        "fpr": fpr,
+        "tpr": tpr,
+        "precision": precision,
+        "recall": recall,
+        "thresholds": sorted_scores[threshold_idx],
+        "roc_auc": roc_auc,
+        "average_precision": average_precision,
+    }
+
+
+def save_curves(path: str, curves: Dict[str, np.ndarray], cm: np.ndarray) -> None:
+    """Store curve points and the confusion matrix compactly for later rendering."""
+    arrays = {k: np.asarray(v, dtype=np.float32) for k, v in curves.items() if np.ndim(v) == 1}
+    np.savez_compressed(path, confusion_matrix=cm.astype(np.int64), **arrays)
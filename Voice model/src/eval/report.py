@@ -0,0 +1,54 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+
+def render_report(out_dir: str, curves_path: Optional[str] = None) -> None:
+    """Render confusion matrix, ROC and PR plots from `curves.npz` (+ `metrics.json`) in `out_dir`.
+
+    Kept separate from metric computation so evaluation never imports matplotlib; it can
+    also be run later, or elsewhere, on saved results.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    data = np.load(curves_path or os.path.join(out_dir, "curves.npz"))
+    metrics_path = os.path.join(out_dir, "metrics.json")
+    metrics = {}
+    if os.path.exists(metrics_path):
+        with open(metrics_path, encoding="utf-8") as f:
+            metrics = json.load(f)
+
+    plt.figure(figsize=(5, 4))
+    plt.imshow(data["confusion_matrix"], cmap='Blues')
+    plt.title('Confusion Matrix')
+    plt.xlabel('Predicted')
+    plt.ylabel('True')
+    plt.colorbar()
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, 'confusion_matrix.png'))
+    plt.close()
+
+    if "fpr" not in data:
+        return
+
+    plt.figure()
+    plt.plot(data["fpr"], data["tpr"])
+    plt.xlabel('FPR')
+    plt.ylabel('TPR')
+    plt.title(f"ROC AUC={metrics.get('roc_auc', float('nan')):.3f}")
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, 'roc_curve.png'))
+    plt.close()
+
+    plt.figure()
+    plt.plot(data["recall"], data["precision"])
+    plt.xlabel('Recall')
+    plt.ylabel('Precision')
+    plt.title('Precision-Recall')
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, 'pr_curve.png'))
+    plt.close()
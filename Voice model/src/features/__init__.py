@@ -1,21 +1,33 @@
-from .pitch import (
-	PitchConfig,
-	segment_frames,
-	compute_pitch_yin,
-	estimate_f0_from_pitch,
-	extract_tonal_features,
-	extract_stress_features,
-	run_feature_extraction,
-)
+import importlib
 
-__all__ = [
-	"PitchConfig",
-	"segment_frames",
-	"compute_pitch_yin",
-	"estimate_f0_from_pitch",
-	"extract_tonal_features",
-	"extract_stress_features",
-	"run_feature_extraction",
-]
+_EXPORTS = {
+	"PitchConfig": ".pitch",
+	"segment_frames": ".pitch",
+	"compute_pitch_yin": ".pitch",
+	"estimate_f0_from_pitch": ".pitch",
+	"extract_tonal_features": ".pitch",
+	"extract_stress_features": ".pitch",
+	"run_feature_extraction": ".pitch",
+	"FeatureExtractor": ".extractor",
+	"MFCCFrontend": ".torch_frontend",
+	"WithFrontend": ".torch_frontend",
+	"VADConfig": ".vad",
+	"TimeMap": ".vad",
+	"detect_speech": ".vad",
+	"apply_vad": ".vad",
+}
 
+__all__ = list(_EXPORTS)
 
+
+def __getattr__(name):
+	module = _EXPORTS.get(name)
+	if module is None:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	value = getattr(importlib.import_module(module, __name__), name)
+	globals()[name] = value
+	return value
+
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,232 @@
+import math
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+_AMIN = 1e-10
+
+
+def _dct_matrix(n_out: int, n_in: int) -> np.ndarray:
+    """Orthonormal DCT-II basis (n_out, n_in), as used by `librosa.feature.mfcc(norm='ortho')`."""
+    n = np.arange(n_in)
+    k = np.arange(n_out)[:, None]
+    basis = np.cos(math.pi / n_in * (n + 0.5) * k) * math.sqrt(2.0 / n_in)
+    basis[0] *= math.sqrt(0.5)
+    return basis.astype(np.float32)
+
+
+class FeatureExtractor:
+    """MFCC front end shared by preprocessing, training checkpoints, `Predict.py` and the backend.
+
+    The analysis window, mel filterbank and DCT basis are built once in the constructor and
+    reused for every call. `transform` runs the whole chain (pre-emphasis -> framed power STFT
+    -> mel -> dB -> DCT -> optional deltas -> optional z-normalisation); `mfcc` is the
+    per-segment step used by preprocessing and matches `librosa.feature.mfcc` on the same
+    parameters (center=True with zero padding, orthonormal DCT) up to float rounding.
+
+    `ref="max"` scales dB against the loudest mel bin, as the training pipeline does; `ref="one"`
+    uses an absolute reference, as librosa's defaults in the backend did. Preprocessing takes the
+    reference (and the `top_db` floor) once per segment, so with `segment_samples` set, `transform`
+    takes them per training segment: window k starts at frame `round(k * hop_samples / hop_length)`
+    (`hop_samples` is the preprocessing hop) and spans one segment's frames. Its reference applies
+    from its start to the next window's, and frames after the last full segment share that
+    segment's reference. Window starts are rounded to whole frames, so a recording is scaled
+    like its training segments to within half a frame of alignment, and a single segment exactly
+    as `mfcc` scales it. Extractors built from a `PreprocessConfig` or HDF5 set both; without
+    `segment_samples` (older checkpoints) the reference covers the whole call.
+    """
+
+    def __init__(self, sample_rate: int = 16000, n_fft: int = 1024, hop_length: Optional[int] = None,
+                 window: str = "hann", n_mels: int = 64, n_mfcc: int = 39, fmin: float = 20.0,
+                 fmax: Optional[float] = None, pre_emphasis: float = 0.97, ref: str = "max",
+                 top_db: Optional[float] = 80.0, deltas: int = 0, segment_samples: Optional[int] = None,
+                 hop_samples: Optional[int] = None, mean: Optional[np.ndarray] = None, std: Optional[np.ndarray] = None):
+        import librosa
+
+        if ref not in ("max", "one"):
+            raise ValueError(f"ref must be 'max' or 'one', got {ref!r}")
+        if deltas not in (0, 1, 2):
+            raise ValueError("deltas must be 0, 1 or 2")
+        self.sample_rate = int(sample_rate)
+        self.n_fft = int(n_fft)
+        self.hop_length = int(hop_length or n_fft // 4)
+        self.window = window
+        self.n_mels = int(n_mels)
+        self.n_mfcc = int(n_mfcc)
+        self.fmin = float(fmin)
+        self.fmax = None if fmax is None else float(fmax)
+        self.pre_emphasis = float(pre_emphasis)
+        self.ref = ref
+        self.top_db = top_db
+        self.deltas = int(deltas)
+        self.segment_samples = None if segment_samples is None else int(segment_samples)
+        self.hop_samples = None if hop_samples is None else int(hop_samples)
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float32)
+        self.std = None if std is None else np.asarray(std, dtype=np.float32)
+        if self.mean is not None and self.mean.shape != (self.feature_dim,):
+            raise ValueError(f"mean has shape {self.mean.shape}, expected ({self.feature_dim},)")
+
+        self._window = librosa.filters.get_window(window, self.n_fft, fftbins=True).astype(np.float32)
+        self._mel_basis = librosa.filters.mel(sr=self.sample_rate, n_fft=self.n_fft, n_mels=self.n_mels,
+                                              fmin=self.fmin, fmax=self.fmax).astype(np.float32)
+        self._dct = _dct_matrix(self.n_mfcc, self.n_mels)
+
+    # ----------------------------- construction -----------------------------
+
+    @classmethod
+    def from_config(cls, config, mean=None, std=None) -> "FeatureExtractor":
+        """Extractor for a `PreprocessConfig` (training features, before normalisation unless
+        `mean`/`std` are given)."""
+        return cls(sample_rate=config.sample_rate, n_fft=config.n_fft, hop_length=config.hop_length,
+                   window=config.window, n_mels=config.n_mels, n_mfcc=config.n_mfcc, fmin=config.fmin,
+                   fmax=config.fmax, pre_emphasis=config.pre_emphasis,
+                   segment_samples=int(round(config.segment_seconds * config.sample_rate)),
+                   hop_samples=int(round(config.hop_seconds * config.sample_rate)), mean=mean, std=std)
+
+    @classmethod
+    def from_h5(cls, h5_path: str) -> "FeatureExtractor":
+        """Rebuild the extractor that produced an HDF5 from its `config.*` and
+        `feature_mean`/`feature_std` attributes, so features come out normalised like the file."""
+        import h5py
+
+        with h5py.File(h5_path, "r") as h5:
+            attrs = dict(h5.attrs)
+        if "config.n_mfcc" not in attrs:
+            raise KeyError(f"{h5_path} has no preprocessing config attributes")
+
+        def opt(key):
+            value = attrs.get(f"config.{key}", "")
+            return None if isinstance(value, str) and value == "" else value
+
+        sample_rate = int(attrs["config.sample_rate"])
+        hop_seconds = opt("hop_seconds")
+        return cls(sample_rate=sample_rate, n_fft=int(attrs["config.n_fft"]),
+                   hop_length=opt("hop_length"), window=str(attrs["config.window"]),
+                   n_mels=int(attrs["config.n_mels"]), n_mfcc=int(attrs["config.n_mfcc"]),
+                   fmin=float(attrs["config.fmin"]), fmax=opt("fmax"),
+                   pre_emphasis=float(attrs["config.pre_emphasis"]),
+                   segment_samples=int(round(float(attrs["config.segment_seconds"]) * sample_rate)),
+                   hop_samples=None if hop_seconds is None else int(round(float(hop_seconds) * sample_rate)),
+                   mean=attrs.get("feature_mean"), std=attrs.get("feature_std"))
+
+    @classmethod
+    def legacy_backend(cls) -> "FeatureExtractor":
+        """The features the backend has always served: librosa defaults at 16 kHz, 13 MFCC + Δ + ΔΔ,
+        no pre-emphasis and no normalisation. Used for checkpoints without a stored extractor."""
+        return cls(sample_rate=16000, n_fft=2048, hop_length=512, n_mels=128, n_mfcc=13, fmin=0.0,
+                   fmax=None, pre_emphasis=0.0, ref="one", deltas=2)
+
+    def to_dict(self) -> Dict[str, object]:
+        """Plain-Python description, stored in checkpoints under `feature_extractor`."""
+        return {
+            "sample_rate": self.sample_rate, "n_fft": self.n_fft, "hop_length": self.hop_length,
+            "window": self.window, "n_mels": self.n_mels, "n_mfcc": self.n_mfcc, "fmin": self.fmin,
+            "fmax": self.fmax, "pre_emphasis": self.pre_emphasis, "ref": self.ref, "top_db": self.top_db,
+            "deltas": self.deltas, "segment_samples": self.segment_samples, "hop_samples": self.hop_samples,
+            "mean": None if self.mean is None else [float(v) for v in self.mean],
+            "std": None if self.std is None else [float(v) for v in self.std],
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, object]) -> "FeatureExtractor":
+        return cls(**state)
+
+    # ----------------------------- computation -----------------------------
+
+    @property
+    def feature_dim(self) -> int:
+        return self.n_mfcc * (1 + self.deltas)
+
+    @property
+    def frame_rate(self) -> float:
+        """Feature frames per second of audio."""
+        return self.sample_rate / self.hop_length
+
+    def num_frames(self, num_samples: int) -> int:
+        return 1 + num_samples // self.hop_length
+
+    def mel_power(self, signal: np.ndarray, block_frames: int = 2048,
+                  progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+        """Mel power spectrogram (n_mels, frames), computed `block_frames` STFT frames at a time
+        so long recordings never hold the full complex STFT. `progress(done, total)` is called
+        after every block."""
+        signal = np.asarray(signal, dtype=np.float32)
+        pad = self.n_fft // 2
+        padded = np.pad(signal, (pad, pad))
+        if len(padded) < self.n_fft:
+            padded = np.pad(padded, (0, self.n_fft - len(padded)))
+        frames = np.lib.stride_tricks.sliding_window_view(padded, self.n_fft)[::self.hop_length]
+        total = frames.shape[0]
+        mel = np.empty((self.n_mels, total), dtype=np.float32)
+        for start in range(0, total, block_frames):
+            stop = min(start + block_frames, total)
+            spec = np.fft.rfft(frames[start:stop] * self._window, axis=1)
+            power = (spec.real ** 2 + spec.imag ** 2).astype(np.float32)
+            np.matmul(self._mel_basis, power.T, out=mel[:, start:stop])
+            if progress is not None:
+                progress(stop, total)
+        return mel
+
+    def _reference_windows(self, frames: int):
+        """(start, stop, span_stop) per training segment: frames [start, stop) are scaled by the
+        reference taken over [start, span_stop), the segment's own frames."""
+        if not self.segment_samples:
+            return [(0, frames, frames)]
+        span = self.num_frames(self.segment_samples)
+        hop = self.hop_samples or self.segment_samples  # checkpoints without a hop: back-to-back segments
+        starts = [0]
+        k = 1
+        while True:
+            start = int(round(k * hop / self.hop_length))
+            if start + span > frames:
+                break
+            if start > starts[-1]:
+                starts.append(start)
+            k += 1
+        stops = starts[1:] + [frames]
+        return [(start, stop, min(start + span, frames)) for start, stop in zip(starts, stops)]
+
+    def log_mel(self, mel: np.ndarray) -> np.ndarray:
+        """`librosa.power_to_db` with this extractor's reference, applied per reference window."""
+        log_spec = 10.0 * np.log10(np.maximum(mel, _AMIN))
+        if not log_spec.size:
+            return log_spec
+        for start, stop, span_stop in self._reference_windows(mel.shape[1]):
+            block = log_spec[:, start:stop]
+            peak = 10.0 * np.log10(max(float(mel[:, start:span_stop].max()), _AMIN))
+            ref_db = peak if self.ref == "max" else 0.0
+            if ref_db:
+                block -= ref_db
+            if self.top_db is not None:
+                np.maximum(block, peak - ref_db - self.top_db, out=block)
+        return log_spec
+
+    def mfcc(self, segment: np.ndarray, progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+        """MFCCs (frames, n_mfcc) of an already pre-emphasised segment; no deltas or normalisation."""
+        log_mel = self.log_mel(self.mel_power(segment, progress=progress))
+        return (self._dct @ log_mel).T.astype(np.float32)
+
+    def normalize(self, features: np.ndarray) -> np.ndarray:
+        if self.mean is None or self.std is None:
+            return features
+        return ((features - self.mean) / self.std).astype(np.float32)
+
+    def transform(self, signal: np.ndarray, progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+        """Model input (frames, feature_dim) for a mono signal at `sample_rate`."""
+        signal = np.asarray(signal, dtype=np.float32)
+        if self.pre_emphasis and len(signal):
+            signal = np.concatenate([signal[:1], signal[1:] - self.pre_emphasis * signal[:-1]])
+        coeffs = self.mfcc(signal, progress=progress)
+        if self.deltas:
+            import librosa
+
+            stacked = [coeffs.T] + [librosa.feature.delta(coeffs.T, order=o) for o in range(1, self.deltas + 1)]
+            coeffs = np.vstack(stacked).T
+        return self.normalize(coeffs.astype(np.float32))
+
+    __call__ = transform
+
+    def __repr__(self) -> str:
+        return (f"FeatureExtractor(sr={self.sample_rate}, n_fft={self.n_fft}, hop={self.hop_length}, "
+                f"n_mels={self.n_mels}, n_mfcc={self.n_mfcc}, deltas={self.deltas}, ref={self.ref!r}, "
+                f"normalized={self.mean is not None})")
@@ -1,13 +1,14 @@
 import os
 from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 import numpy as np
-import pandas as pd
 import librosa
-import soundfile as sf
 from tqdm import tqdm
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 @dataclass
 class PitchConfig:
@@ -17,6 +18,7 @@ class PitchConfig:
 
     # Audio
     sample_rate: int = 16000
+    resample_quality: str = "hq"  # 'hq', 'polyphase' or 'fast' (see src.preprocess.resample)
 
     # Short frames for pitch/stress
     frame_ms: float = 25.0
@@ -37,16 +39,10 @@ class PitchConfig:
     format: str = "csv"  # 'csv' or 'json'
 
 
-def _load_mono(path: str, target_sr: int) -> np.ndarray:
-    try:
-        signal, sr = sf.read(path, always_2d=False)
-        if signal.ndim > 1:
-            signal = np.mean(signal, axis=1)
-    except Exception:
-        signal, sr = librosa.load(path, sr=None, mono=True)
-    if sr != target_sr:
-        signal = librosa.resample(signal, orig_sr=sr, target_sr=target_sr)
-    return signal.astype(np.float32)
+def _load_mono(path: str, target_sr: int, quality: str = "hq") -> np.ndarray:
+    from src.preprocess.resample import load_resampled
+
+    return load_resampled(path, target_sr, quality)
 
 
 def _frame_and_hop_samples(cfg: PitchConfig) -> Tuple[int, int]:
@@ -122,6 +118,14 @@ def _rms_energy(frames: np.ndarray, eps: float) -> np.ndarray:
     return np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1) + eps)
 
 
+def _zero_crossing_rate(frames: np.ndarray) -> np.ndarray:
+    """Fraction of adjacent sample pairs with a sign change, per frame (num_frames,)."""
+    if frames.size == 0:
+        return np.zeros((0,), dtype=np.float32)
+    signs = np.signbit(frames)
+    return np.mean(signs[:, 1:] != signs[:, :-1], axis=1).astype(np.float32)
+
+
 def extract_stress_features(frames: np.ndarray, cfg: PitchConfig) -> Dict[str, float]:
     """Heuristic stress features from short-time energy and zero-crossing rate."""
     if frames.size == 0:
@@ -142,12 +146,14 @@ def _find_audio_files(folder: str) -> List[str]:
     return sorted(paths)
 
 
-def run_feature_extraction(cfg: PitchConfig) -> pd.DataFrame:
+def run_feature_extraction(cfg: PitchConfig) -> "pd.DataFrame":
     """Run steps (i)-(ix) and return a DataFrame with features per file."""
+    import pandas as pd  # only needed for the tabular output; VAD/serving use the frame helpers
+
     rows: List[Dict[str, object]] = []
 
     for path in tqdm(_find_audio_files(cfg.input_folder), desc="Feature extraction"):
-        signal = _load_mono(path, target_sr=cfg.sample_rate)
+        signal = _load_mono(path, target_sr=cfg.sample_rate, quality=cfg.resample_quality)
         frame, hop = _frame_and_hop_samples(cfg)
         frames = segment_frames(signal, cfg.sample_rate, frame, hop)
 
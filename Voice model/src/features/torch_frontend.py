@@ -0,0 +1,142 @@
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from src.features.extractor import _AMIN, FeatureExtractor
+
+_DELTA_WIDTH = 9  # librosa.feature.delta default
+
+
+def _savgol_matrix(width: int, order: int) -> np.ndarray:
+    """(width, width) matrix whose row j gives the `order`-th derivative at position j of the
+    least-squares polynomial of degree `order` through a window of `width` samples.
+
+    Row `width // 2` is the Savitzky-Golay kernel; the first and last `width // 2` rows are
+    scipy's mode='interp' edge fits. Together they reproduce `librosa.feature.delta`.
+    """
+    x = np.arange(width, dtype=np.float64)
+    fit = np.linalg.pinv(np.vander(x, order + 1, increasing=True))  # window -> polynomial coefficients
+    # the order-th derivative of a degree-order polynomial is order! times its leading coefficient
+    return np.repeat(math.factorial(order) * fit[order:order + 1], width, axis=0)
+
+
+class MFCCFrontend(nn.Module):
+    """Batched torch implementation of `FeatureExtractor.transform`.
+
+    Takes zero-padded waveforms (batch, samples) plus their true lengths and returns
+    (batch, frames, feature_dim) features and per-item frame counts. Every step matches the
+    NumPy extractor: pre-emphasis, centred zero-padded STFT, mel, dB (per-item `ref`/`top_db`
+    over valid frames only), DCT, Savitzky-Golay deltas with librosa's edge handling at each
+    item's own end, and z-normalisation. The window, filterbank, DCT and normalisation stats
+    are buffers, so the module moves between devices and is saved with the model.
+
+    With deltas, every item needs at least 9 frames, as `librosa.feature.delta` requires. The
+    dB reference is taken over each whole item, so for an extractor with `segment_samples` pass
+    one segment per item (as preprocessing does); longer items are rejected.
+    """
+
+    def __init__(self, extractor: FeatureExtractor):
+        super().__init__()
+        self.sample_rate = extractor.sample_rate
+        self.n_fft = extractor.n_fft
+        self.hop_length = extractor.hop_length
+        self.pre_emphasis = extractor.pre_emphasis
+        self.ref = extractor.ref
+        self.top_db = extractor.top_db
+        self.deltas = extractor.deltas
+        self.segment_frames = extractor.num_frames(extractor.segment_samples) if extractor.segment_samples else None
+        self.feature_dim = extractor.feature_dim
+        self.register_buffer("window", torch.from_numpy(extractor._window.copy()))
+        self.register_buffer("mel_basis", torch.from_numpy(extractor._mel_basis.copy()))
+        self.register_buffer("dct", torch.from_numpy(extractor._dct.copy()))
+        savgol = [_savgol_matrix(_DELTA_WIDTH, order) for order in range(1, self.deltas + 1)]
+        self.register_buffer("savgol", torch.tensor(np.stack(savgol) if savgol else np.zeros((0, _DELTA_WIDTH, _DELTA_WIDTH)),
+                                                    dtype=torch.float32))
+        self.register_buffer("mean", None if extractor.mean is None else torch.from_numpy(extractor.mean.copy()))
+        self.register_buffer("std", None if extractor.std is None else torch.from_numpy(extractor.std.copy()))
+
+    @classmethod
+    def from_config(cls, config, mean=None, std=None) -> "MFCCFrontend":
+        return cls(FeatureExtractor.from_config(config, mean=mean, std=std))
+
+    def frame_lengths(self, lengths: torch.Tensor) -> torch.Tensor:
+        return 1 + torch.div(lengths, self.hop_length, rounding_mode="floor")
+
+    def _delta(self, coeffs: torch.Tensor, frames: torch.Tensor, order: int) -> torch.Tensor:
+        """`librosa.feature.delta(order=order)` along the last axis of (B, C, T), per item."""
+        matrix = self.savgol[order - 1]
+        half = _DELTA_WIDTH // 2
+        batch, channels, total = coeffs.shape
+        if int(frames.min()) < _DELTA_WIDTH:
+            raise ValueError(f"deltas need at least {_DELTA_WIDTH} frames per item, got {int(frames.min())}")
+        # interior: Savitzky-Golay kernel (conv1d is a correlation, as the row is laid out)
+        out = nn.functional.conv1d(coeffs.reshape(-1, 1, total), matrix[half].view(1, 1, -1), padding=half)
+        out = out.view(batch, channels, total)
+        # left edge: polynomial fit over the first window
+        out[:, :, :half] = coeffs[:, :, :_DELTA_WIDTH] @ matrix[:half].T
+        # right edge: fit over each item's last window, written at its own end
+        window_idx = (frames - _DELTA_WIDTH).view(-1, 1) + torch.arange(_DELTA_WIDTH, device=coeffs.device)
+        tail = torch.gather(coeffs, 2, window_idx.view(batch, 1, -1).expand(-1, channels, -1))
+        out_idx = (frames - half).view(-1, 1) + torch.arange(half, device=coeffs.device)
+        out.scatter_(2, out_idx.view(batch, 1, -1).expand(-1, channels, -1), tail @ matrix[-half:].T)
+        return out
+
+    def forward(self, waveforms: torch.Tensor, lengths: Optional[torch.Tensor] = None
+                ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """(batch, samples) float waveforms at `sample_rate` -> ((batch, frames, feature_dim), frame counts)."""
+        if waveforms.dim() == 1:
+            waveforms = waveforms.unsqueeze(0)
+        waveforms = waveforms.float()
+        batch, samples = waveforms.shape
+        if lengths is None:
+            lengths = torch.full((batch,), samples, dtype=torch.long, device=waveforms.device)
+        lengths = lengths.to(waveforms.device)
+        valid = torch.arange(samples, device=waveforms.device) < lengths.view(-1, 1)
+        x = waveforms * valid  # padding must be zeros, as the NumPy extractor pads
+        if self.pre_emphasis:
+            x = torch.cat([x[:, :1], x[:, 1:] - self.pre_emphasis * x[:, :-1]], dim=1) * valid
+
+        spec = torch.stft(x, self.n_fft, hop_length=self.hop_length, window=self.window, center=True,
+                          pad_mode="constant", return_complex=True)
+        power = spec.real ** 2 + spec.imag ** 2  # (B, n_fft // 2 + 1, T)
+        mel = torch.matmul(self.mel_basis, power)  # (B, n_mels, T)
+        frames = self.frame_lengths(lengths).clamp(max=mel.shape[-1])
+        if self.segment_frames is not None and int(frames.max()) > self.segment_frames:
+            raise ValueError(f"items longer than one segment ({self.segment_frames} frames) need per-segment "
+                             "dB references; split them into segments first")
+        frame_mask = (torch.arange(mel.shape[-1], device=mel.device) < frames.view(-1, 1)).unsqueeze(1)
+
+        log_mel = 10.0 * torch.log10(torch.clamp(mel, min=_AMIN))
+        if self.ref == "max":
+            peak = mel.masked_fill(~frame_mask, 0.0).amax(dim=(1, 2), keepdim=True)
+            log_mel = log_mel - 10.0 * torch.log10(torch.clamp(peak, min=_AMIN))
+        if self.top_db is not None:
+            top = log_mel.masked_fill(~frame_mask, float("-inf")).amax(dim=(1, 2), keepdim=True)
+            log_mel = torch.maximum(log_mel, top - self.top_db)
+
+        coeffs = torch.matmul(self.dct, log_mel)  # (B, n_mfcc, T)
+        if self.deltas:
+            coeffs = coeffs.masked_fill(~frame_mask, 0.0)
+            coeffs = torch.cat([coeffs] + [self._delta(coeffs, frames, o) for o in range(1, self.deltas + 1)], dim=1)
+        features = coeffs.transpose(1, 2)  # (B, T, feature_dim)
+        if self.mean is not None and self.std is not None:
+            features = (features - self.mean) / self.std
+        features = features.masked_fill(~frame_mask.transpose(1, 2), 0.0)
+        return features, frames
+
+
+class WithFrontend(nn.Module):
+    """`MFCCFrontend` followed by a classifier taking (features, lengths), e.g. `RNNClassifier`:
+    waveforms in, logits out, in one batched graph."""
+
+    def __init__(self, frontend: MFCCFrontend, classifier: nn.Module):
+        super().__init__()
+        self.frontend = frontend
+        self.classifier = classifier
+
+    def forward(self, waveforms: torch.Tensor, lengths: Optional[torch.Tensor] = None, **kwargs):
+        features, frames = self.frontend(waveforms, lengths)
+        return self.classifier(features, frames, **kwargs)
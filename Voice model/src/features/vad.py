@@ -0,0 +1,179 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from src.features.pitch import _rms_energy, _zero_crossing_rate
+
+_BLOCK_FRAMES = 4096  # frames analysed per block: bounds the memory of the framed view
+
+# (energy margin above the noise floor in dB, max zero-crossing rate) per aggressiveness level
+_LEVELS = ((4.0, 0.50), (6.0, 0.45), (9.0, 0.40), (12.0, 0.35))
+
+
+@dataclass
+class VADConfig:
+    """Energy/ZCR voice-activity detection settings.
+
+    `aggressiveness` 0-3 raises the energy margin over the estimated noise floor and lowers the
+    zero-crossing-rate ceiling (broadband noise crosses zero far more often than voiced speech).
+    `mode="drop"` keeps only speech; `mode="compress"` also keeps the first `compress_ms` of
+    every pause between speech, so pause positions survive at a bounded cost.
+    """
+    aggressiveness: int = 1
+    mode: str = "drop"  # 'drop' or 'compress'
+    frame_ms: float = 30.0
+    hop_ms: float = 10.0
+    min_speech_ms: float = 120.0  # shorter bursts are treated as noise
+    max_gap_ms: float = 300.0  # shorter pauses inside speech are kept
+    hangover_ms: float = 150.0  # kept on both sides of speech (onsets, fricatives, decays)
+    compress_ms: float = 100.0
+    silence_dbfs: float = -60.0  # a recording whose loud frames stay below this has no speech
+    energy_eps: float = 1e-8
+
+    def __post_init__(self):
+        if not 0 <= self.aggressiveness < len(_LEVELS):
+            raise ValueError(f"aggressiveness must be 0-{len(_LEVELS) - 1}, got {self.aggressiveness}")
+        if self.mode not in ("drop", "compress"):
+            raise ValueError(f"mode must be 'drop' or 'compress', got {self.mode!r}")
+
+
+class TimeMap:
+    """Maps positions in a VAD-compressed signal back to the original recording.
+
+    The output is the concatenation of kept original spans; span i starts at
+    `original_starts[i]` in the recording and at `output_starts[i]` in the output.
+    """
+
+    def __init__(self, original_starts, output_starts, lengths, sample_rate: int, original_length: int):
+        self.original_starts = np.asarray(original_starts, dtype=np.int64)
+        self.output_starts = np.asarray(output_starts, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.sample_rate = int(sample_rate)
+        self.original_length = int(original_length)
+
+    @classmethod
+    def identity(cls, length: int, sample_rate: int) -> "TimeMap":
+        return cls([0], [0], [length], sample_rate, length)
+
+    @property
+    def output_length(self) -> int:
+        return int(self.lengths.sum())
+
+    @property
+    def kept_fraction(self) -> float:
+        return self.output_length / max(self.original_length, 1)
+
+    @property
+    def original_seconds(self) -> float:
+        return self.original_length / self.sample_rate
+
+    def to_original_samples(self, index: Union[int, np.ndarray]) -> Union[int, np.ndarray]:
+        """Original sample index of output sample(s) `index` (clipped to the kept spans)."""
+        idx = np.asarray(index, dtype=np.int64)
+        span = np.clip(np.searchsorted(self.output_starts, idx, side="right") - 1, 0, len(self.output_starts) - 1)
+        offset = np.clip(idx - self.output_starts[span], 0, np.maximum(self.lengths[span] - 1, 0))
+        out = self.original_starts[span] + offset
+        return int(out) if out.ndim == 0 else out
+
+    def to_original_seconds(self, seconds: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+        samples = np.round(np.asarray(seconds, dtype=np.float64) * self.sample_rate).astype(np.int64)
+        out = np.asarray(self.to_original_samples(samples), dtype=np.float64) / self.sample_rate
+        return float(out) if out.ndim == 0 else out
+
+    def to_dict(self) -> Dict[str, object]:
+        """JSON-friendly description: kept spans as [original_start_s, output_start_s, duration_s]."""
+        sr = float(self.sample_rate)
+        return {
+            "original_seconds": round(self.original_seconds, 3),
+            "kept_fraction": round(self.kept_fraction, 4),
+            "spans": [[round(o / sr, 3), round(p / sr, 3), round(n / sr, 3)]
+                      for o, p, n in zip(self.original_starts, self.output_starts, self.lengths)],
+        }
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and (exclusive) end indices of the True runs in a boolean vector."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_frames(signal: np.ndarray, sr: int, cfg: VADConfig) -> Tuple[np.ndarray, int, int]:
+    """Per-frame speech decision (num_frames,) plus the frame and hop sizes in samples."""
+    frame = max(1, int(round(sr * cfg.frame_ms / 1000.0)))
+    hop = max(1, int(round(sr * cfg.hop_ms / 1000.0)))
+    if len(signal) < frame:
+        return np.zeros((0,), dtype=bool), frame, hop
+    frames = np.lib.stride_tricks.sliding_window_view(np.asarray(signal, dtype=np.float32), frame)[::hop]
+    energy_db = np.empty(len(frames), dtype=np.float32)
+    zcr = np.empty(len(frames), dtype=np.float32)
+    for start in range(0, len(frames), _BLOCK_FRAMES):
+        block = frames[start:start + _BLOCK_FRAMES]
+        energy_db[start:start + len(block)] = 20.0 * np.log10(_rms_energy(block, cfg.energy_eps))
+        zcr[start:start + len(block)] = _zero_crossing_rate(block)
+
+    floor_db, peak_db = np.percentile(energy_db, [10, 99])
+    if peak_db < cfg.silence_dbfs:
+        return np.zeros(len(frames), dtype=bool), frame, hop
+    margin_db, max_zcr = _LEVELS[cfg.aggressiveness]
+    # a recording without pauses has no floor to find: fall back to a margin below its peak
+    threshold = min(floor_db + margin_db, peak_db - margin_db)
+    speech = (energy_db > threshold) & (zcr < max_zcr)
+
+    hop_ms = 1000.0 * hop / sr
+    starts, ends = _runs(~speech)
+    for s, e in zip(starts, ends):  # close short pauses inside speech
+        if s > 0 and e < len(speech) and (e - s) * hop_ms < cfg.max_gap_ms:
+            speech[s:e] = True
+    starts, ends = _runs(speech)
+    for s, e in zip(starts, ends):  # drop isolated clicks and bursts
+        if (e - s) * hop_ms < cfg.min_speech_ms:
+            speech[s:e] = False
+    pad = int(round(cfg.hangover_ms / hop_ms))
+    if pad:
+        starts, ends = _runs(speech)
+        for s, e in zip(starts, ends):
+            speech[max(0, s - pad):e + pad] = True
+    return speech, frame, hop
+
+
+def detect_speech(signal: np.ndarray, sr: int, cfg: Optional[VADConfig] = None) -> List[Tuple[int, int]]:
+    """Speech regions as (start_sample, end_sample) pairs, sorted and non-overlapping."""
+    cfg = cfg or VADConfig()
+    speech, frame, hop = speech_frames(signal, sr, cfg)
+    starts, ends = _runs(speech)
+    return [(int(s * hop), int(min(len(signal), (e - 1) * hop + frame))) for s, e in zip(starts, ends)]
+
+
+def apply_vad(signal: np.ndarray, sr: int, cfg: Optional[VADConfig] = None) -> Tuple[np.ndarray, TimeMap]:
+    """Remove (or shorten) non-speech before feature extraction.
+
+    Returns the shortened signal and the `TimeMap` back to the original timeline. A recording
+    in which no speech is found is returned unchanged, so downstream stages always get input.
+    """
+    cfg = cfg or VADConfig()
+    regions = detect_speech(signal, sr, cfg)
+    if not regions:
+        return signal, TimeMap.identity(len(signal), sr)
+
+    kept: List[Tuple[int, int]] = []
+    compress = int(round(sr * cfg.compress_ms / 1000.0)) if cfg.mode == "compress" else 0
+    for i, (start, end) in enumerate(regions):
+        kept.append((start, end))
+        if compress and i + 1 < len(regions):
+            gap_end = regions[i + 1][0]
+            kept.append((end, min(end + compress, gap_end)))
+    # merge touching spans so the map stays small
+    merged: List[List[int]] = []
+    for start, end in kept:
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    lengths = np.asarray([e - s for s, e in merged], dtype=np.int64)
+    output_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    out = np.concatenate([signal[s:e] for s, e in merged]).astype(np.float32, copy=False)
+    return out, TimeMap([s for s, _ in merged], output_starts, lengths, sr, len(signal))
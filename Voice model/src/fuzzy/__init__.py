@@ -1,15 +1,23 @@
-from .optimizer import (
-	FuzzyConfig,
-	HyperparameterSpace,
-	build_fuzzy_system,
-	run_fuzzy_optimization,
-)
+import importlib
 
-__all__ = [
-	"FuzzyConfig",
-	"HyperparameterSpace",
-	"build_fuzzy_system",
-	"run_fuzzy_optimization",
-]
+_EXPORTS = {
+	"FuzzyConfig": ".optimizer",
+	"HyperparameterSpace": ".optimizer",
+	"build_fuzzy_system": ".optimizer",
+	"run_fuzzy_optimization": ".optimizer",
+}
 
+__all__ = list(_EXPORTS)
 
+
+def __getattr__(name):
+	module = _EXPORTS.get(name)
+	if module is None:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	value = getattr(importlib.import_module(module, __name__), name)
+	globals()[name] = value
+	return value
+
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
@@ -1,2 +1,26 @@
-from .ernn import RNNClassifier, RNNConfig
-__all__ = ["RNNClassifier", "RNNConfig"]
+import importlib
+
+_EXPORTS = {
+	"RNNClassifier": ".ernn",
+	"RNNConfig": ".ernn",
+	"FusedRNNClassifier": ".fused",
+	"fuse_for_inference": ".fused",
+	"SUPPORTED_PRECISIONS": ".precision",
+	"autocast": ".precision",
+	"bf16_supported": ".precision",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+	module = _EXPORTS.get(name)
+	if module is None:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	value = getattr(importlib.import_module(module, __name__), name)
+	globals()[name] = value
+	return value
+
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
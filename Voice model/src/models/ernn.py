@@ -1,6 +1,7 @@
 # src/models/ernn.py
 import torch
 import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
 from dataclasses import dataclass
 
 
@@ -83,27 +84,51 @@ class RNNClassifier(nn.Module):
             nn.Linear(max(64, rnn_out_dim // 2), config.num_classes)
         )
 
-    def forward(self, x):
+    def forward(self, x, lengths=None, return_attention=False):
         """
         x: (B, T, F) or (B, F) (we convert 2D -> (B,1,F))
-        returns logits (B, num_classes)
+        lengths: optional (B,) valid frame counts for zero-padded batches; padded
+                 frames are skipped by the RNN and masked out of the attention
+        return_attention: also return the per-timestep attention weights (B, T) already
+                 computed for pooling (None when with_attention is False)
+        returns logits (B, num_classes), or (logits, attention) if return_attention
         """
         if x.ndim == 2:
             x = x.unsqueeze(1)
 
-        # RNN outputs: out (B, T, hidden*dir), _ (hidden states)
-        out, _ = self.rnn(x)  # out: (B, T, rnn_out_dim)
+        total_len = x.shape[1]
+        if lengths is not None:
+            # pack_padded_sequence wants lengths on CPU
+            lengths = lengths.to("cpu", torch.int64).clamp(min=1, max=total_len)
+            packed = pack_padded_sequence(x, lengths, batch_first=True, enforce_sorted=False)
+            packed_out, _ = self.rnn(packed)
+            out, _ = pad_packed_sequence(packed_out, batch_first=True, total_length=total_len)
+            lengths = lengths.to(x.device)
+            mask = torch.arange(total_len, device=x.device).unsqueeze(0) < lengths.unsqueeze(1)  # (B,T)
+        else:
+            # RNN outputs: out (B, T, hidden*dir), _ (hidden states)
+            out, _ = self.rnn(x)  # out: (B, T, rnn_out_dim)
+            mask = None
 
         if self.with_attention:
             # compute unnormalized scores (B, T, 1) -> squeeze -> (B, T)
             scores = self.attn_net(out).squeeze(-1)       # (B,T)
-            alpha = torch.softmax(scores, dim=1)         # (B,T)
-            alpha = alpha.unsqueeze(-1)                  # (B,T,1)
+            if mask is not None:
+                scores = scores.masked_fill(~mask, float("-inf"))
+            weights = torch.softmax(scores, dim=1)       # (B,T)
+            alpha = weights.unsqueeze(-1)                # (B,T,1)
             context = (alpha * out).sum(dim=1)           # (B, rnn_out_dim)
             rep = context
+        elif lengths is not None:
+            # last valid timestep of every sequence
+            weights = None
+            rep = out[torch.arange(out.shape[0], device=out.device), lengths - 1]
         else:
             # use final timestep representation
+            weights = None
             rep = out[:, -1, :]                           # (B, rnn_out_dim)
 
         logits = self.classifier(rep)                    # (B, num_classes)
+        if return_attention:
+            return logits, weights
         return logits
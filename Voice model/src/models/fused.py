@@ -0,0 +1,129 @@
+import copy
+import threading
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+from .ernn import RNNClassifier
+
+
+class FusedRNNClassifier(nn.Module):
+    """Inference-only export of a trained `RNNClassifier`.
+
+    The attention MLP, softmax pooling and classifier head are rewritten as a handful of
+    fused BLAS calls (addmm -> tanh -> mv -> softmax -> bmm -> addmm -> relu -> addmm) on
+    pre-transposed weights. Dropout layers are dropped, the constant bias of the last
+    attention layer is folded away (it cancels in the softmax), and intermediate results are
+    written into per-thread scratch buffers that are reused across calls of the same or
+    smaller size. Outputs match `RNNClassifier.eval()` up to float rounding.
+
+    The RNN is deep-copied, so the export never changes the source model's mode or weights.
+    The scratch buffers are not part of the module state and are left out of pickles and
+    deep copies.
+    """
+
+    def __init__(self, model: RNNClassifier, use_scratch: bool = True):
+        super().__init__()
+        self.config = model.config
+        self.rnn = copy.deepcopy(model.rnn)
+        self.with_attention = model.with_attention
+        self.use_scratch = use_scratch
+
+        if self.with_attention:
+            score_in, score_out = model.attn_net[0], model.attn_net[2]
+            self.register_buffer("attn_w1t", score_in.weight.detach().t().contiguous())  # (D, A)
+            self.register_buffer("attn_b1", score_in.bias.detach().clone())              # (A,)
+            self.register_buffer("attn_w2", score_out.weight.detach().reshape(-1).clone())  # (A,)
+
+        # classifier = [Dropout, Linear, ReLU, Dropout, Linear]; the dropouts are identity at inference
+        hidden, final = model.classifier[1], model.classifier[4]
+        self.register_buffer("head_w1t", hidden.weight.detach().t().contiguous())
+        self.register_buffer("head_b1", hidden.bias.detach().clone())
+        self.register_buffer("head_w2t", final.weight.detach().t().contiguous())
+        self.register_buffer("head_b2", final.bias.detach().clone())
+
+        self._scratch = threading.local()
+        self.eval()
+        for p in self.parameters():
+            p.requires_grad_(False)
+
+    def __getstate__(self):
+        state = dict(super().__getstate__())
+        state.pop("_scratch", None)  # thread-local buffers cannot be pickled
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._scratch = threading.local()
+
+    def _buffer(self, name: str, shape, like: torch.Tensor) -> torch.Tensor:
+        """Return a scratch tensor of `shape`, growing the per-thread backing storage if needed."""
+        numel = 1
+        for dim in shape:
+            numel *= dim
+        store = self._scratch.__dict__
+        buf = store.get(name)
+        if buf is None or buf.numel() < numel or buf.dtype != like.dtype or buf.device != like.device:
+            buf = torch.empty(numel, dtype=like.dtype, device=like.device)
+            store[name] = buf
+        return buf[:numel].view(shape)
+
+    def _run_rnn(self, x, lengths):
+        total_len = x.shape[1]
+        if lengths is None:
+            out, _ = self.rnn(x)
+            return out, None
+        lengths = lengths.to("cpu", torch.int64).clamp(min=1, max=total_len)
+        packed = pack_padded_sequence(x, lengths, batch_first=True, enforce_sorted=False)
+        out, _ = pad_packed_sequence(self.rnn(packed)[0], batch_first=True, total_length=total_len)
+        lengths = lengths.to(x.device)
+        mask = torch.arange(total_len, device=x.device).unsqueeze(0) < lengths.unsqueeze(1)
+        return out, (mask, lengths)
+
+    def forward(self, x, lengths=None, return_attention=False):
+        if x.ndim == 2:
+            x = x.unsqueeze(1)
+        out, masking = self._run_rnn(x, lengths)  # (B, T, D)
+        batch, steps, dim = out.shape
+        scratch = self.use_scratch and not torch.is_grad_enabled()
+
+        if self.with_attention:
+            flat = out.reshape(batch * steps, dim)
+            if scratch:
+                hid = self._buffer("hid", (batch * steps, self.attn_b1.shape[0]), out)
+                torch.addmm(self.attn_b1, flat, self.attn_w1t, out=hid)
+                hid.tanh_()
+                scores = self._buffer("scores", (batch * steps,), out)
+                torch.mv(hid, self.attn_w2, out=scores)
+            else:
+                hid = torch.tanh(torch.addmm(self.attn_b1, flat, self.attn_w1t))
+                scores = torch.mv(hid, self.attn_w2)
+            scores = scores.view(batch, steps)
+            if masking is not None:
+                scores = scores.masked_fill(~masking[0], float("-inf"))
+            alpha = torch.softmax(scores, dim=1)
+            rep = torch.bmm(alpha.unsqueeze(1), out).squeeze(1)  # (B, D) weighted sum in one call
+        elif masking is not None:
+            alpha = None
+            rep = out[torch.arange(batch, device=out.device), masking[1] - 1]
+        else:
+            alpha = None
+            rep = out[:, -1, :]
+
+        hidden = torch.addmm(self.head_b1, rep, self.head_w1t).relu_()
+        logits = torch.addmm(self.head_b2, hidden, self.head_w2t)
+        if return_attention:
+            return logits, alpha
+        return logits
+
+
+def fuse_for_inference(model: RNNClassifier, compile: bool = False) -> nn.Module:
+    """Export `model` for serving; `compile=True` additionally wraps it in `torch.compile`.
+
+    Compiled graphs manage their own memory, so the scratch buffers are disabled in that mode.
+    """
+    fused = FusedRNNClassifier(model, use_scratch=not compile)
+    if compile:
+        return torch.compile(fused, dynamic=True)
+    return fused
@@ -0,0 +1,29 @@
+import torch
+
+SUPPORTED_PRECISIONS = ("fp32", "bf16")
+
+
+def check_precision(precision: str) -> str:
+    precision = precision.lower()
+    if precision not in SUPPORTED_PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}. Expected one of {SUPPORTED_PRECISIONS}")
+    return precision
+
+
+def autocast(precision: str = "fp32", device: str = "cpu"):
+    """Autocast context for `precision`: bfloat16 for 'bf16', a disabled no-op for 'fp32'.
+
+    Only matmul-heavy ops (LSTM/GRU layers, Linear) run in bf16; parameters, softmax and the
+    loss stay float32. bf16 keeps the float32 exponent range, so no loss scaling is needed.
+    """
+    precision = check_precision(precision)
+    return torch.autocast(device_type=torch.device(device).type, dtype=torch.bfloat16,
+                          enabled=precision == "bf16")
+
+
+def bf16_supported() -> bool:
+    """Whether the CPU has native bf16 kernels (AVX512-BF16/AMX); otherwise bf16 is emulated and slow."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
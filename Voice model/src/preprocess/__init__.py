@@ -1,25 +1,43 @@
-from .pipeline import (
-	find_audio_files,
-	load_audio_file,
-	apply_pre_emphasis,
-	segment_signal,
-	extract_mfcc_from_segment,
-	compute_dataset_mfcc,
-	compute_feature_stats,
-	normalize_feature_list,
-	save_hdf5
-)
+import importlib
 
-__all__ = [
-	"find_audio_files",
-	"load_audio_file",
-	"apply_pre_emphasis",
-	"segment_signal",
-	"extract_mfcc_from_segment",
-	"compute_dataset_mfcc",
-	"compute_feature_stats",
-	"normalize_feature_list",
-	"save_hdf5",
-]
+_EXPORTS = {
+	"find_audio_files": ".pipeline",
+	"load_audio_file": ".pipeline",
+	"apply_pre_emphasis": ".pipeline",
+	"segment_signal": ".pipeline",
+	"extract_mfcc_from_segment": ".pipeline",
+	"compute_dataset_mfcc": ".pipeline",
+	"compute_feature_stats": ".pipeline",
+	"FeatureStats": ".pipeline",
+	"accumulate_feature_stats": ".pipeline",
+	"normalize_feature_list": ".pipeline",
+	"save_hdf5": ".pipeline",
+	"QUALITIES": ".resample",
+	"resample": ".resample",
+	"polyphase_filter": ".resample",
+	"load_resampled": ".resample",
+	"read_blocks": ".stream",
+	"stream_segments": ".stream",
+	"resample_stream": ".stream",
+	"PreEmphasis": ".stream",
+	"SegmentStream": ".stream",
+	"shard_files": ".sharded",
+	"run_shard": ".sharded",
+	"merge_shards": ".sharded",
+	"run_sharded_preprocessing": ".sharded",
+}
 
+__all__ = list(_EXPORTS)
 
+
+def __getattr__(name):
+	module = _EXPORTS.get(name)
+	if module is None:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	value = getattr(importlib.import_module(module, __name__), name)
+	globals()[name] = value
+	return value
+
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
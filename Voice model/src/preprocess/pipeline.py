@@ -1,14 +1,18 @@
 import math
 import os
 from dataclasses import dataclass, asdict
+from functools import lru_cache
 from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
-import librosa
-import soundfile as sf
 from tqdm import tqdm
 
+from src.features.extractor import FeatureExtractor
+from src.features.vad import VADConfig, apply_vad
+from src.preprocess.resample import load_resampled
+from src.preprocess.stream import stream_segments
+
 
 # ----------------------------- Data Classes -----------------------------
 
@@ -30,13 +34,23 @@ class PreprocessConfig:
 
 	# Audio
 	sample_rate: int = 16000
+	resample_quality: str = "hq"  # 'hq', 'polyphase' or 'fast' (see src.preprocess.resample)
 	pre_emphasis: float = 0.97
+	# Read files in blocks of this many seconds instead of whole (None = whole file; VAD needs whole files)
+	stream_block_seconds: Optional[float] = None
+
+	# Voice activity detection before segmentation (None = off, else aggressiveness 0-3)
+	vad_aggressiveness: Optional[int] = None
+	vad_mode: str = "drop"  # 'drop' or 'compress' (keep a short stub of every pause)
 
 	# Segmentation
 	segment_seconds: float = 1.0
 	hop_seconds: float = 1.0
 	drop_last: bool = True
 
+	# Storage: pad/trim to a fixed frame count, or keep true lengths (ragged)
+	variable_length: bool = False
+
 	# STFT / Windowing
 	n_fft: int = 1024
 	hop_length: Optional[int] = None  # defaults to n_fft // 4 if None
@@ -64,22 +78,9 @@ def find_audio_files(folder: str, extensions: Sequence[str]) -> List[str]:
 	return sorted(paths)
 
 
-def load_audio_file(path: str, target_sr: int) -> Tuple[np.ndarray, int]:
-	"""Load an audio file and resample to target sample rate if needed."""
-	try:
-		# First try soundfile for reliability
-		signal, sr = sf.read(path, always_2d=False)
-		if signal.ndim > 1:
-			# Convert to mono by averaging channels
-			signal = np.mean(signal, axis=1)
-	except Exception:
-		# Fallback to librosa
-		signal, sr = librosa.load(path, sr=None, mono=True)
-
-	if sr != target_sr:
-		signal = librosa.resample(signal, orig_sr=sr, target_sr=target_sr)
-		sr = target_sr
-	return signal.astype(np.float32), sr
+def load_audio_file(path: str, target_sr: int, quality: str = "hq") -> Tuple[np.ndarray, int]:
+	"""Load an audio file as mono float32 at the target sample rate (see `resample.QUALITIES`)."""
+	return load_resampled(path, target_sr, quality), target_sr
 
 
 def apply_pre_emphasis(signal: np.ndarray, coefficient: float = 0.97) -> np.ndarray:
@@ -107,6 +108,8 @@ def segment_signal(
 	hop_len = _samples_for_seconds(hop_seconds, sr)
 	indices: List[Tuple[int, int]] = []
 	for start in range(0, len(signal) - (0 if not drop_last else segment_len) + 1, hop_len):
+		if start >= len(signal):
+			break
 		end = start + segment_len
 		if end > len(signal):
 			if drop_last:
@@ -127,19 +130,19 @@ def extract_mfcc_from_segment(
 	fmin: float,
 	fmax: Optional[float],
 ) -> np.ndarray:
-	"""Compute MFCCs from a 1D audio segment. Returns shape (num_frames, num_mfcc)."""
-	if hop_length is None:
-		hop_length = n_fft // 4
-	# STFT magnitude power
-	stft = librosa.stft(segment, n_fft=n_fft, hop_length=hop_length, window=window, center=True)
-	power_spec = np.abs(stft) ** 2
-	# Mel scaling
-	mel_spec = librosa.feature.melspectrogram(S=power_spec, sr=sr, n_mels=n_mels, fmin=fmin, fmax=fmax)
-	log_mel = librosa.power_to_db(mel_spec, ref=np.max)
-	# MFCCs from log-mel
-	mfcc = librosa.feature.mfcc(S=log_mel, n_mfcc=n_mfcc)
-	# librosa returns (n_mfcc, frames) -> transpose to (frames, n_mfcc)
-	return mfcc.T.astype(np.float32)
+	"""Compute MFCCs from a 1D audio segment. Returns shape (num_frames, num_mfcc).
+
+	The window, mel basis and DCT matrix come from a cached `FeatureExtractor`, so repeated
+	calls with the same parameters do not rebuild them.
+	"""
+	extractor = _segment_extractor(sr, n_fft, hop_length, window, n_mels, n_mfcc, fmin, fmax)
+	return extractor.mfcc(segment)
+
+
+@lru_cache(maxsize=8)
+def _segment_extractor(sr, n_fft, hop_length, window, n_mels, n_mfcc, fmin, fmax) -> FeatureExtractor:
+	return FeatureExtractor(sample_rate=sr, n_fft=n_fft, hop_length=hop_length, window=window,
+							n_mels=n_mels, n_mfcc=n_mfcc, fmin=fmin, fmax=fmax, pre_emphasis=0.0)
 
 
 def _read_labels(metadata_csv: Optional[str]) -> Dict[str, str]:
@@ -153,38 +156,64 @@ def _read_labels(metadata_csv: Optional[str]) -> Dict[str, str]:
 	return {os.path.basename(str(p)): str(l) for p, l in zip(df["filepath"], df["label"])}
 
 
+def _file_segments(path: str, config: PreprocessConfig, vad: Optional[VADConfig]) -> Iterable[Tuple[int, int, np.ndarray]]:
+	"""(start, end, pre-emphasised samples) for every segment of one file, with positions in
+	original samples. Streams the file in blocks when `config.stream_block_seconds` is set."""
+	if vad is None and config.stream_block_seconds:
+		yield from stream_segments(
+			path,
+			config.sample_rate,
+			segment_samples=_samples_for_seconds(config.segment_seconds, config.sample_rate),
+			hop_samples=_samples_for_seconds(config.hop_seconds, config.sample_rate),
+			drop_last=config.drop_last,
+			pre_emphasis=config.pre_emphasis,
+			quality=config.resample_quality,
+			block_seconds=config.stream_block_seconds,
+		)
+		return
+	signal, sr = load_audio_file(path, target_sr=config.sample_rate, quality=config.resample_quality)
+	time_map = None
+	if vad is not None:
+		signal, time_map = apply_vad(signal, sr, vad)
+	signal = apply_pre_emphasis(signal, coefficient=config.pre_emphasis)
+	segments = segment_signal(
+		signal,
+		sr,
+		segment_seconds=config.segment_seconds,
+		hop_seconds=config.hop_seconds,
+		drop_last=config.drop_last,
+	)
+	for start, end in segments:
+		segment = signal[start:end]
+		if time_map is not None:
+			# original span covered by the segment (may include removed pauses)
+			start, end = time_map.to_original_samples(start), time_map.to_original_samples(end - 1) + 1
+		yield start, end, segment
+
+
 def compute_dataset_mfcc(
 	filepaths: Sequence[str],
 	config: PreprocessConfig,
 ) -> Tuple[List[np.ndarray], List[SegmentMeta]]:
-	"""Compute MFCCs and metadata for all files. Returns per-segment features and metadata."""
+	"""Compute MFCCs and metadata for all files. Returns per-segment features and metadata.
+
+	With `config.vad_aggressiveness` set, non-speech is removed before segmentation; segment
+	sample positions in the metadata still refer to the original recording. With
+	`config.stream_block_seconds` set (and VAD off), files are decoded, resampled and
+	segmented block by block (`src.preprocess.stream`), so segments reach the MFCC stage
+	while the rest of a long recording is still being read.
+	"""
 	labels = _read_labels(config.metadata_csv)
+	extractor = FeatureExtractor.from_config(config)  # filterbanks built once for the whole dataset
+	vad = None
+	if config.vad_aggressiveness is not None:
+		vad = VADConfig(aggressiveness=config.vad_aggressiveness, mode=config.vad_mode)
 	features: List[np.ndarray] = []
 	metas: List[SegmentMeta] = []
 	for path in tqdm(filepaths, desc="Processing audio"):
-		signal, sr = load_audio_file(path, target_sr=config.sample_rate)
-		signal = apply_pre_emphasis(signal, coefficient=config.pre_emphasis)
-		segments = segment_signal(
-			signal,
-			sr,
-			segment_seconds=config.segment_seconds,
-			hop_seconds=config.hop_seconds,
-			drop_last=config.drop_last,
-		)
-		for start, end in segments:
-			seg = signal[start:end]
-			mfcc = extract_mfcc_from_segment(
-				seg,
-				sr,
-				n_fft=config.n_fft,
-				hop_length=config.hop_length,
-				window=config.window,
-				n_mels=config.n_mels,
-				n_mfcc=config.n_mfcc,
-				fmin=config.fmin,
-				fmax=config.fmax,
-			)
-			features.append(mfcc)
+		for start, end, segment in _file_segments(path, config, vad):
+			# the segment is already pre-emphasised; mfcc() applies only the spectral stages
+			features.append(extractor.mfcc(segment))
 			metas.append(
 				SegmentMeta(
 					file_id=os.path.basename(path),
@@ -196,28 +225,61 @@ def compute_dataset_mfcc(
 	return features, metas
 
 
-def compute_feature_stats(feature_list: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
-	"""Compute dataset-wide mean and std per MFCC feature dimension.
-
-	All arrays in feature_list must be shaped (frames, n_mfcc). Returns (mean, std) each of shape (n_mfcc,).
-	"""
+@dataclass
+class FeatureStats:
+	"""Mergeable per-dimension sufficient statistics over feature frames: frame count, mean
+	and M2 (sum of squared deviations from the mean). `merge` combines two sets exactly
+	(Chan et al.), so shards computed independently give the same totals as one pass."""
+	count: int
+	mean: np.ndarray
+	m2: np.ndarray
+
+	@classmethod
+	def empty(cls, dim: int) -> "FeatureStats":
+		return cls(0, np.zeros((dim,), dtype=np.float64), np.zeros((dim,), dtype=np.float64))
+
+	@classmethod
+	def from_array(cls, arr: np.ndarray) -> "FeatureStats":
+		arr = np.asarray(arr, dtype=np.float64)
+		mean = arr.mean(axis=0) if len(arr) else np.zeros(arr.shape[1])
+		return cls(int(arr.shape[0]), mean, ((arr - mean) ** 2).sum(axis=0))
+
+	def merge(self, other: "FeatureStats") -> "FeatureStats":
+		if other.count == 0:
+			return self
+		if self.count == 0:
+			return other
+		count = self.count + other.count
+		delta = other.mean - self.mean
+		mean = self.mean + delta * (other.count / count)
+		m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / count)
+		return FeatureStats(count, mean, m2)
+
+	def mean_std(self) -> Tuple[np.ndarray, np.ndarray]:
+		"""(mean, std) as float32, population std floored like `compute_feature_stats`."""
+		var = self.m2 / max(self.count, 1)
+		return self.mean.astype(np.float32), np.sqrt(np.maximum(var, 1e-12)).astype(np.float32)
+
+
+def accumulate_feature_stats(feature_list: Sequence[np.ndarray]) -> FeatureStats:
+	"""`FeatureStats` over all frames of (frames, n_mfcc) arrays."""
 	if not feature_list:
 		raise ValueError("feature_list is empty")
-	# Accumulate sums over frames
 	n_mfcc = feature_list[0].shape[1]
-	sum_vec = np.zeros((n_mfcc,), dtype=np.float64)
-	sumsq_vec = np.zeros((n_mfcc,), dtype=np.float64)
-	count_frames = 0
+	stats = FeatureStats.empty(n_mfcc)
 	for arr in feature_list:
 		if arr.ndim != 2 or arr.shape[1] != n_mfcc:
 			raise ValueError("All feature arrays must have shape (frames, n_mfcc) and same n_mfcc")
-		sum_vec += arr.sum(axis=0)
-		sumsq_vec += (arr ** 2).sum(axis=0)
-		count_frames += arr.shape[0]
-	mean = sum_vec / max(count_frames, 1)
-	var = (sumsq_vec / max(count_frames, 1)) - (mean ** 2)
-	std = np.sqrt(np.maximum(var, 1e-12))
-	return mean.astype(np.float32), std.astype(np.float32)
+		stats = stats.merge(FeatureStats.from_array(arr))
+	return stats
+
+
+def compute_feature_stats(feature_list: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+	"""Compute dataset-wide mean and std per MFCC feature dimension.
+
+	All arrays in feature_list must be shaped (frames, n_mfcc). Returns (mean, std) each of shape (n_mfcc,).
+	"""
+	return accumulate_feature_stats(feature_list).mean_std()
 
 
 def normalize_feature_list(feature_list: Sequence[np.ndarray], mean: np.ndarray, std: np.ndarray) -> List[np.ndarray]:
@@ -240,6 +302,15 @@ def _pad_or_trim_to_length(arr: np.ndarray, target_frames: int) -> np.ndarray:
 	return np.vstack([arr, pad])
 
 
+def _expected_segment_frames(config: PreprocessConfig) -> int:
+	"""Frames per segment used for the fixed-length layout."""
+	hop_length = config.hop_length or (config.n_fft // 4)
+	segment_samples = _samples_for_seconds(config.segment_seconds, config.sample_rate)
+	if segment_samples >= config.n_fft:
+		return 1 + math.floor((segment_samples - config.n_fft) / hop_length)
+	return max(1, math.floor(segment_samples / hop_length))
+
+
 def save_hdf5(
 	output_file: str,
 	feature_list: Sequence[np.ndarray],
@@ -248,31 +319,40 @@ def save_hdf5(
 	std: np.ndarray,
 	config: PreprocessConfig,
 ) -> None:
-	"""Save normalized features and metadata to HDF5 with fixed-length sequences.
+	"""Save normalized features and metadata to HDF5.
+
+	Fixed layout (default): we compute the expected number of frames per segment to achieve
+	a consistent tensor shape, then pad/trim each segment accordingly into `features`.
 
-	We compute the expected number of frames per segment using librosa.time_to_frames to achieve
-	a consistent tensor shape, then pad/trim each segment accordingly.
+	Ragged layout (`config.variable_length`): segments keep their true frame counts. All frames
+	are concatenated into `frames` (total_frames, n_mfcc) and located via `offsets`/`lengths`,
+	so no zero padding is stored or trained on.
 	"""
 	import h5py  # local import to avoid import time if unused
 
 	if len(feature_list) != len(metas):
 		raise ValueError("feature_list and metas must have the same length")
 
-	# Expected frames per segment given hop_length and n_fft
-	hop_length = config.hop_length or (config.n_fft // 4)
-	segment_frames = 1 + math.floor(
-		(_samples_for_seconds(config.segment_seconds, config.sample_rate) - config.n_fft) / hop_length
-	) if _samples_for_seconds(config.segment_seconds, config.sample_rate) >= config.n_fft else max(1, math.floor(_samples_for_seconds(config.segment_seconds, config.sample_rate) / hop_length))
-
-	# Normalize features to fixed shape
-	fixed = [_pad_or_trim_to_length(arr, target_frames=segment_frames) for arr in feature_list]
-	features = np.stack(fixed, axis=0).astype(np.float32)  # (num_segments, frames, n_mfcc)
-
 	os.makedirs(os.path.dirname(output_file), exist_ok=True)
 	print(f"Saving features to {output_file} ...")
 	with h5py.File(output_file, "w") as h5:
 		# Datasets
-		h5.create_dataset("features", data=features, dtype="float32", compression="gzip")
+		if config.variable_length:
+			lengths = np.asarray([arr.shape[0] for arr in feature_list], dtype=np.int64)
+			offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+			frames = np.concatenate(feature_list, axis=0).astype(np.float32)  # (total_frames, n_mfcc)
+			h5.create_dataset("frames", data=frames, dtype="float32", compression="gzip",
+							  chunks=(min(len(frames), 4096), frames.shape[1]))
+			h5.create_dataset("lengths", data=lengths, dtype="int64")
+			h5.create_dataset("offsets", data=offsets, dtype="int64")
+			h5.attrs["layout"] = "ragged"
+		else:
+			segment_frames = _expected_segment_frames(config)
+			# Normalize features to fixed shape
+			fixed = [_pad_or_trim_to_length(arr, target_frames=segment_frames) for arr in feature_list]
+			features = np.stack(fixed, axis=0).astype(np.float32)  # (num_segments, frames, n_mfcc)
+			h5.create_dataset("features", data=features, dtype="float32", compression="gzip")
+			h5.attrs["layout"] = "fixed"
 		str_dt = h5py.string_dtype(encoding="utf-8")
 		h5.create_dataset("file_ids", data=[m.file_id for m in metas], dtype=str_dt)
 		h5.create_dataset("start_sample", data=[m.start_sample for m in metas], dtype="int64")
@@ -283,13 +363,14 @@ def save_hdf5(
 		# Attributes
 		h5.attrs["feature_mean"] = mean.astype(np.float32)
 		h5.attrs["feature_std"] = std.astype(np.float32)
-		# Store config as attributes
-		for key, value in asdict(config).items():
-			# Store simple types only
-			if isinstance(value, (int, float, str, bool)) or value is None:
-				h5.attrs[f"config.{key}"] = "" if value is None else value
-	
+		write_config_attrs(h5, config)
+
 
+def write_config_attrs(h5, config: PreprocessConfig) -> None:
+	"""Store the preprocessing config as `config.*` attributes (simple types only)."""
+	for key, value in asdict(config).items():
+		if isinstance(value, (int, float, str, bool)) or value is None:
+			h5.attrs[f"config.{key}"] = "" if value is None else value
 
 
 def run_preprocessing(config: PreprocessConfig) -> None:
@@ -0,0 +1,232 @@
+"""Sharded preprocessing: every process or node featurises a deterministic slice of the
+corpus into its own shard, and a merge step publishes one HDF5 over all shards.
+
+	# on node i of N (or locally: run_sharded_preprocessing)
+	python -m src.preprocess.sharded shard --input_folder audio/ --shard_dir data/shards --num_shards N --shard_index i
+	python -m src.preprocess.sharded merge --shard_dir data/shards --output_file data/processed/mfcc.h5
+
+Shards hold raw (un-normalised) features plus `FeatureStats` (frame count, mean, M2). The
+merge combines the stats exactly, then writes a file whose `features`/`frames` are HDF5
+virtual datasets mapping the shards in place; only the small per-segment arrays (ids,
+labels, positions, lengths) are copied. The merged file carries the global
+`feature_mean`/`feature_std` and `normalize_on_read`, so the readers in
+`src.training.dataset` normalise while loading.
+"""
+import argparse
+import glob
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from src.preprocess.pipeline import (
+	FeatureStats, PreprocessConfig, _expected_segment_frames, _pad_or_trim_to_length, accumulate_feature_stats,
+	compute_dataset_mfcc, find_audio_files, write_config_attrs,
+)
+
+_SHARD_PATTERN = "shard-{index:05d}-of-{count:05d}.h5"
+# config attributes that may differ between shards without changing the features
+_PER_RUN_KEYS = {"config.input_folder", "config.output_file", "config.metadata_csv"}
+
+
+def shard_files(filepaths: Sequence[str], num_shards: int, shard_index: int) -> List[str]:
+	"""Contiguous, deterministic slice `shard_index` of `num_shards` of a sorted file list, so
+	concatenating the shards in index order reproduces the single-process order."""
+	if not 0 <= shard_index < num_shards:
+		raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}")
+	paths = sorted(filepaths)
+	bounds = np.linspace(0, len(paths), num_shards + 1).round().astype(int)
+	return paths[bounds[shard_index]:bounds[shard_index + 1]]
+
+
+def shard_path(shard_dir: str, shard_index: int, num_shards: int) -> str:
+	return os.path.join(shard_dir, _SHARD_PATTERN.format(index=shard_index, count=num_shards))
+
+
+def run_shard(config: PreprocessConfig, shard_dir: str, num_shards: int, shard_index: int) -> str:
+	"""Featurise this shard's slice of `config.input_folder` and write its shard file."""
+	import h5py
+
+	filepaths = shard_files(find_audio_files(config.input_folder, config.allowed_extensions), num_shards, shard_index)
+	features, metas = compute_dataset_mfcc(filepaths, config) if filepaths else ([], [])
+	stats = accumulate_feature_stats(features) if features else FeatureStats.empty(config.n_mfcc)
+
+	path = shard_path(shard_dir, shard_index, num_shards)
+	os.makedirs(shard_dir, exist_ok=True)
+	tmp_path = path + ".tmp"
+	with h5py.File(tmp_path, "w") as h5:
+		if config.variable_length:
+			lengths = np.asarray([arr.shape[0] for arr in features], dtype=np.int64)
+			frames = np.concatenate(features).astype(np.float32) if features else np.zeros((0, config.n_mfcc), np.float32)
+			h5.create_dataset("frames", data=frames, dtype="float32")
+			h5.create_dataset("lengths", data=lengths, dtype="int64")
+			h5.attrs["layout"] = "ragged"
+		else:
+			target = _expected_segment_frames(config)
+			fixed = np.zeros((len(features), target, config.n_mfcc), dtype=np.float32)
+			for i, arr in enumerate(features):
+				fixed[i] = _pad_or_trim_to_length(arr, target_frames=target)
+			h5.create_dataset("features", data=fixed, dtype="float32")
+			h5.create_dataset("frame_counts", data=[min(arr.shape[0], target) for arr in features], dtype="int64")
+			h5.attrs["layout"] = "fixed"
+		str_dt = h5py.string_dtype(encoding="utf-8")
+		h5.create_dataset("file_ids", data=[m.file_id for m in metas], dtype=str_dt)
+		h5.create_dataset("start_sample", data=[m.start_sample for m in metas], dtype="int64")
+		h5.create_dataset("end_sample", data=[m.end_sample for m in metas], dtype="int64")
+		h5.create_dataset("labels", data=[m.label if m.label is not None else "" for m in metas], dtype=str_dt)
+		h5.attrs["stats_count"] = stats.count
+		h5.attrs["stats_mean"] = stats.mean
+		h5.attrs["stats_m2"] = stats.m2
+		h5.attrs["shard_index"] = shard_index
+		h5.attrs["num_shards"] = num_shards
+		write_config_attrs(h5, config)
+	os.replace(tmp_path, path)  # a shard is either complete or absent
+	return path
+
+
+def _load_shard_header(path: str):
+	import h5py
+
+	with h5py.File(path, "r") as h5:
+		attrs = dict(h5.attrs)
+		layout = attrs["layout"]
+		data = h5["frames"] if layout == "ragged" else h5["features"]
+		header = {
+			"path": path,
+			"attrs": attrs,
+			"layout": layout,
+			"shape": data.shape,
+			"segments": len(h5["labels"]),
+			"stats": FeatureStats(int(attrs["stats_count"]), np.asarray(attrs["stats_mean"], np.float64),
+								  np.asarray(attrs["stats_m2"], np.float64)),
+		}
+		for name in ("file_ids", "start_sample", "end_sample", "labels", "lengths", "frame_counts"):
+			if name in h5:
+				header[name] = h5[name][:]
+	return header
+
+
+def merge_shards(shard_paths: Sequence[str], output_file: str) -> FeatureStats:
+	"""Merge complete shards (in the given order) into `output_file` without copying features.
+
+	Checks that every shard was produced with the same preprocessing config and that the set
+	is complete (one shard per index). Returns the merged `FeatureStats`.
+	"""
+	import h5py
+
+	headers = [_load_shard_header(p) for p in shard_paths]
+	if not headers:
+		raise FileNotFoundError("no shards to merge")
+	num_shards = int(headers[0]["attrs"]["num_shards"])
+	indices = sorted(int(h["attrs"]["shard_index"]) for h in headers)
+	if indices != list(range(num_shards)):
+		raise ValueError(f"incomplete shard set: have indices {indices} of {num_shards}")
+	headers.sort(key=lambda h: int(h["attrs"]["shard_index"]))
+	reference = {k: v for k, v in headers[0]["attrs"].items() if k.startswith("config.") and k not in _PER_RUN_KEYS}
+	for h in headers[1:]:
+		config = {k: v for k, v in h["attrs"].items() if k.startswith("config.") and k not in _PER_RUN_KEYS}
+		if config.keys() != reference.keys() or any(np.any(config[k] != reference[k]) for k in reference):
+			raise ValueError(f"{h['path']} was preprocessed with a different config")
+
+	stats = FeatureStats.empty(headers[0]["stats"].mean.shape[0])
+	for h in headers:
+		stats = stats.merge(h["stats"])
+	mean, std = stats.mean_std()
+
+	layout = headers[0]["layout"]
+	name = "frames" if layout == "ragged" else "features"
+	tail = headers[0]["shape"][1:]
+	total = sum(h["shape"][0] for h in headers)
+	vlayout = h5py.VirtualLayout(shape=(total,) + tuple(tail), dtype="float32")
+	out_dir = os.path.dirname(os.path.abspath(output_file))
+	offset = 0
+	for h in headers:
+		n = h["shape"][0]
+		if n:
+			# relative source paths: HDF5 resolves them against the merged file's directory
+			source = h5py.VirtualSource(os.path.relpath(os.path.abspath(h["path"]), out_dir), name, shape=h["shape"])
+			vlayout[offset:offset + n] = source
+		offset += n
+
+	os.makedirs(out_dir, exist_ok=True)
+	tmp_path = output_file + ".tmp"
+	with h5py.File(tmp_path, "w") as h5:
+		h5.create_virtual_dataset(name, vlayout, fillvalue=0.0)
+		if layout == "ragged":
+			lengths = np.concatenate([h["lengths"] for h in headers]).astype(np.int64)
+			h5.create_dataset("lengths", data=lengths, dtype="int64")
+			h5.create_dataset("offsets", data=np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64),
+							  dtype="int64")
+		else:
+			h5.create_dataset("frame_counts", data=np.concatenate([h["frame_counts"] for h in headers]), dtype="int64")
+		str_dt = h5py.string_dtype(encoding="utf-8")
+		for key in ("file_ids", "labels"):
+			h5.create_dataset(key, data=[v.decode("utf-8") if isinstance(v, bytes) else str(v)
+										 for h in headers for v in h[key]], dtype=str_dt)
+		for key in ("start_sample", "end_sample"):
+			h5.create_dataset(key, data=np.concatenate([h[key] for h in headers]), dtype="int64")
+		h5.attrs["layout"] = layout
+		h5.attrs["feature_mean"] = mean
+		h5.attrs["feature_std"] = std
+		h5.attrs["normalize_on_read"] = True
+		h5.attrs["stats_count"] = stats.count
+		h5.attrs["num_shards"] = num_shards
+		for key, value in reference.items():
+			h5.attrs[key] = value
+	os.replace(tmp_path, output_file)
+	print(f"Merged {num_shards} shards ({sum(h['segments'] for h in headers)} segments) into {output_file}")
+	return stats
+
+
+def _shard_worker(args):
+	config, shard_dir, num_shards, shard_index = args
+	return run_shard(config, shard_dir, num_shards, shard_index)
+
+
+def run_sharded_preprocessing(config: PreprocessConfig, shard_dir: str, num_shards: int,
+							  processes: Optional[int] = None) -> FeatureStats:
+	"""Local multi-process equivalent of a multi-node run: `num_shards` shards on a pool of
+	`processes` (default: min(num_shards, cores)), then `merge_shards` into `config.output_file`."""
+	import multiprocessing as mp
+
+	if not find_audio_files(config.input_folder, config.allowed_extensions):
+		raise FileNotFoundError(f"No audio files found in: {config.input_folder}")
+	processes = processes or min(num_shards, os.cpu_count() or 1)
+	tasks = [(config, shard_dir, num_shards, i) for i in range(num_shards)]
+	with mp.get_context("spawn").Pool(processes) as pool:
+		paths = pool.map(_shard_worker, tasks, chunksize=1)
+	return merge_shards(paths, config.output_file)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	sub = parser.add_subparsers(dest="command", required=True)
+	shard = sub.add_parser("shard", help="featurise one shard")
+	shard.add_argument("--input_folder", required=True)
+	shard.add_argument("--shard_dir", required=True)
+	shard.add_argument("--num_shards", type=int, required=True)
+	shard.add_argument("--shard_index", type=int, required=True)
+	shard.add_argument("--metadata_csv", default=None)
+	shard.add_argument("--sample_rate", type=int, default=16000)
+	shard.add_argument("--segment_seconds", type=float, default=1.0)
+	shard.add_argument("--hop_seconds", type=float, default=1.0)
+	shard.add_argument("--variable_length", action="store_true")
+	shard.add_argument("--stream_block_seconds", type=float, default=None,
+					   help="read files in blocks of this many seconds (long recordings)")
+	merge = sub.add_parser("merge", help="merge all shards of --shard_dir")
+	merge.add_argument("--shard_dir", required=True)
+	merge.add_argument("--output_file", required=True)
+	args = parser.parse_args()
+
+	if args.command == "shard":
+		config = PreprocessConfig(input_folder=args.input_folder, output_file="", metadata_csv=args.metadata_csv,
+								  sample_rate=args.sample_rate, segment_seconds=args.segment_seconds,
+								  hop_seconds=args.hop_seconds, variable_length=args.variable_length,
+								  stream_block_seconds=args.stream_block_seconds)
+		print(run_shard(config, args.shard_dir, args.num_shards, args.shard_index))
+	else:
+		merge_shards(sorted(glob.glob(os.path.join(args.shard_dir, "shard-*-of-*.h5"))), args.output_file)
+
+
+if __name__ == "__main__":
+	main()
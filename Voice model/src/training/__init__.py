@@ -1,10 +1,27 @@
-from .dataset import H5MFCCDataset, create_dataloaders_from_h5
-from .train_eval import train_validate_test
+import importlib
 
-__all__ = [
-	"H5MFCCDataset",
-	"create_dataloaders_from_h5",
-	"train_validate_test",
-]
+_EXPORTS = {
+	"H5MFCCDataset": ".dataset",
+	"SequenceDataset": ".dataset",
+	"BucketBatchSampler": ".dataset",
+	"pad_collate": ".dataset",
+	"create_dataloaders_from_h5": ".dataset",
+	"train_validate_test": ".train_eval",
+	"train_distributed": ".distributed",
+	"cross_validate": ".cv",
+}
 
+__all__ = list(_EXPORTS)
 
+
+def __getattr__(name):
+	module = _EXPORTS.get(name)
+	if module is None:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	value = getattr(importlib.import_module(module, __name__), name)
+	globals()[name] = value
+	return value
+
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,195 @@
+import os
+import time
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader, Subset, TensorDataset
+
+from src.models.ernn import RNNClassifier
+from src.models.precision import check_precision
+from src.training.dataset import BucketBatchSampler, SequenceDataset, pad_collate
+from src.training.distributed import default_threads_per_process
+from src.training.train_eval import _build_config, _evaluate_loader, _train_one_epoch, load_h5_data
+
+# Set once per worker process by `_init_worker`: the shared dataset and the options.
+_WORKER = {}
+
+
+def stratified_folds(y, k, seed):
+    """Assign every sample to one of `k` folds, keeping the class ratio in each fold."""
+    rng = np.random.default_rng(seed)
+    fold_of = np.empty(len(y), dtype=np.int64)
+    for label in np.unique(y):
+        idx = rng.permutation(np.flatnonzero(y == label))
+        for fold, chunk in enumerate(np.array_split(idx, k)):
+            fold_of[chunk] = fold
+    return fold_of
+
+
+def _stratified_holdout(indices, y, fraction, seed):
+    """Split `indices` into (train, val) with `fraction` of each class in val."""
+    rng = np.random.default_rng(seed)
+    val = []
+    for label in np.unique(y[indices]):
+        idx = rng.permutation(indices[y[indices] == label])
+        val.append(idx[:int(round(fraction * len(idx)))])
+    val = np.sort(np.concatenate(val)) if val else np.zeros(0, dtype=np.int64)
+    return np.setdiff1d(indices, val), val
+
+
+def _share(X, y):
+    """Move the features into shared memory once; spawned workers map the same pages.
+
+    Fixed layouts become one (N, T, F) tensor. Ragged ones become one (total_frames, F)
+    tensor plus offsets/lengths, so segments are views, never copies.
+    """
+    labels = torch.from_numpy(np.ascontiguousarray(y, dtype=np.int64)).share_memory_()
+    if isinstance(X, list):
+        lengths = np.array([a.shape[0] for a in X], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        frames = torch.from_numpy(np.concatenate(X).astype(np.float32, copy=False)).share_memory_()
+        return {"frames": frames, "offsets": offsets, "lengths": lengths, "labels": labels}
+    features = torch.from_numpy(np.ascontiguousarray(X, dtype=np.float32)).share_memory_()
+    return {"features": features, "labels": labels}
+
+
+def _init_worker(shared, options):
+    torch.set_num_threads(options["threads_per_process"])
+    torch.set_num_interop_threads(1)
+    if "frames" in shared:
+        views = [shared["frames"][o:o + n] for o, n in zip(shared["offsets"], shared["lengths"])]
+        dataset = SequenceDataset(views, shared["labels"].numpy())
+    else:
+        dataset = TensorDataset(shared["features"], shared["labels"])
+    _WORKER.update(shared=shared, dataset=dataset, options=options)
+
+
+def _loader(indices, shuffle, seed):
+    shared, dataset, batch_size = _WORKER["shared"], _WORKER["dataset"], _WORKER["options"]["batch_size"]
+    subset = Subset(dataset, indices.tolist())
+    if "frames" in shared:
+        sampler = BucketBatchSampler(shared["lengths"][indices], batch_size, shuffle=shuffle, seed=seed)
+        return DataLoader(subset, batch_sampler=sampler, collate_fn=pad_collate)
+    return DataLoader(subset, batch_size=batch_size, shuffle=shuffle)
+
+
+def _run_fold(task):
+    """Train one fold in this worker; returns its metrics."""
+    fold, train_idx, val_idx, test_idx = task
+    options = _WORKER["options"]
+    seed = options["seed"] + fold
+    torch.manual_seed(seed)
+    t0 = time.perf_counter()
+    train_loader = _loader(train_idx, True, seed)
+    val_loader, test_loader = _loader(val_idx, False, seed), _loader(test_idx, False, seed)
+
+    cfg = _build_config(options["fuzzy_params"], options["model_type"], options["input_size"], options["num_classes"])
+    model = RNNClassifier(cfg)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=cfg.learning_rate)
+    precision, patience = options["precision"], options["patience"]
+
+    best_val_loss, best_state, epochs_no_improve, epochs_run = float("inf"), None, 0, 0
+    for epoch in range(options["epochs"]):
+        if isinstance(train_loader.batch_sampler, BucketBatchSampler):
+            train_loader.batch_sampler.set_epoch(epoch)
+        _train_one_epoch(model, train_loader, criterion, optimizer, "cpu", precision=precision,
+                         max_grad_norm=options["max_grad_norm"])
+        val_loss, _, _ = _evaluate_loader(model, val_loader, criterion, "cpu", precision)
+        epochs_run += 1
+        if val_loss < best_val_loss:
+            best_val_loss, epochs_no_improve = val_loss, 0
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+        else:
+            epochs_no_improve += 1
+        if patience is not None and epochs_no_improve >= patience:
+            break
+    if best_state is not None:
+        model.load_state_dict(best_state)
+
+    _, val_acc, val_f1 = _evaluate_loader(model, val_loader, criterion, "cpu", precision)
+    _, test_acc, test_f1 = _evaluate_loader(model, test_loader, criterion, "cpu", precision)
+    return {
+        "fold": fold,
+        "val_acc": val_acc,
+        "val_f1": val_f1,
+        "test_acc": test_acc,
+        "test_f1": test_f1,
+        "epochs_run": epochs_run,
+        "best_val_loss": best_val_loss,
+        "train_size": int(len(train_idx)),
+        "test_size": int(len(test_idx)),
+        "seconds": time.perf_counter() - t0,
+        "pid": os.getpid(),
+    }
+
+
+def cross_validate(h5_path, k=5, processes=None, fuzzy_params=None, model_type="lstm", epochs=20,
+                   batch_size=64, patience=5, seed=42, val_fraction=0.15, threads_per_process=None,
+                   precision="fp32", max_grad_norm=None):
+    """Stratified k-fold cross-validation with the folds trained concurrently.
+
+    The HDF5 is read once and its features are placed in shared memory; `processes` spawned
+    workers (default: min(k, cores)) train folds from that single copy, each limited to
+    `threads_per_process` intra-op threads (default: cores // processes). In fold i, fold i
+    is the test set and `val_fraction` of the remaining samples (per class) drives early
+    stopping, as the validation split does in `train_validate_test`. Returns the per-fold
+    metrics plus their mean and std.
+    """
+    precision = check_precision(precision)
+    if precision == "bf16" and max_grad_norm is None:
+        max_grad_norm = 5.0
+    if k < 2:
+        raise ValueError("k must be at least 2")
+    X, y = load_h5_data(h5_path)
+    if np.bincount(y).min() < k:
+        raise ValueError(f"every class needs at least k={k} samples for stratified folds")
+    processes = processes or min(k, os.cpu_count() or 1)
+    options = {
+        "fuzzy_params": fuzzy_params,
+        "model_type": model_type,
+        "epochs": epochs,
+        "batch_size": batch_size,
+        "patience": patience,
+        "seed": seed,
+        "precision": precision,
+        "max_grad_norm": max_grad_norm,
+        "threads_per_process": threads_per_process or default_threads_per_process(processes),
+        "input_size": X[0].shape[1] if isinstance(X, list) else X.shape[2],
+        "num_classes": len(np.unique(y)),
+    }
+
+    fold_of = stratified_folds(y, k, seed)
+    tasks = []
+    for fold in range(k):
+        test_idx = np.flatnonzero(fold_of == fold)
+        train_idx, val_idx = _stratified_holdout(np.flatnonzero(fold_of != fold), y, val_fraction, seed + fold)
+        tasks.append((fold, train_idx, val_idx, test_idx))
+
+    shared = _share(X, y)
+    del X  # the shared copy is the only one kept
+    t0 = time.perf_counter()
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(processes, initializer=_init_worker, initargs=(shared, options)) as pool:
+        folds = sorted(pool.imap_unordered(_run_fold, tasks), key=lambda m: m["fold"])
+    wall = time.perf_counter() - t0
+
+    keys = ("val_acc", "val_f1", "test_acc", "test_f1", "epochs_run", "best_val_loss")
+    values = {key: np.array([f[key] for f in folds], dtype=np.float64) for key in keys}
+    result = {
+        "k": k,
+        "processes": processes,
+        "threads_per_process": options["threads_per_process"],
+        "wall_seconds": wall,
+        "fold_seconds_sum": float(sum(f["seconds"] for f in folds)),
+        "mean": {key: float(np.nanmean(v)) for key, v in values.items()},
+        "std": {key: float(np.nanstd(v)) for key, v in values.items()},
+        "folds": folds,
+    }
+    print(f"[DEBUG] {k}-fold CV in {wall:.1f}s ({processes} processes): "
+          f"test_acc {result['mean']['test_acc']:.4f} ± {result['std']['test_acc']:.4f}, "
+          f"test_f1 {result['mean']['test_f1']:.4f} ± {result['std']['test_f1']:.4f}")
+    return result
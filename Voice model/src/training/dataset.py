@@ -1,11 +1,11 @@
 import os
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
 import h5py
 import numpy as np
-from sklearn.model_selection import train_test_split
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.nn.utils.rnn import pad_sequence
+from torch.utils.data import Dataset, DataLoader, Sampler
 
 # 🔒 Fixed, explicit label order for your dataset
 FIXED_LABEL_MAP: Dict[str, int] = {"lie": 0, "truth": 1}
@@ -33,6 +33,154 @@ def _encode_labels(str_labels: List[str]) -> np.ndarray:
     return encoded
 
 
+def is_ragged(h5: h5py.File) -> bool:
+    """True if the file uses the variable-length layout (frames + offsets/lengths)."""
+    return "lengths" in h5 and "frames" in h5
+
+
+def read_normalization(h5: h5py.File) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(mean, std) for files that store raw features and are normalised on read (merged
+    shards, `normalize_on_read` attribute); None for files written already normalised."""
+    if not h5.attrs.get("normalize_on_read", False):
+        return None
+    return np.asarray(h5.attrs["feature_mean"], dtype=np.float32), np.asarray(h5.attrs["feature_std"], dtype=np.float32)
+
+
+def apply_normalization(features: np.ndarray, norm: Optional[Tuple[np.ndarray, np.ndarray]],
+                        frame_counts=None) -> np.ndarray:
+    """Normalise raw features read from a `normalize_on_read` file. For the fixed layout pass
+    the segments' `frame_counts` so padding stays zero, as `save_hdf5` writes it."""
+    if norm is None:
+        return features
+    mean, std = norm
+    out = ((features - mean) / std).astype(np.float32)
+    if frame_counts is not None:
+        out[np.arange(out.shape[-2]) >= np.asarray(frame_counts)[..., None]] = 0.0
+    return out
+
+
+def read_fixed_features(h5: h5py.File, selection=slice(None)) -> np.ndarray:
+    """Read `features[selection]` of a fixed-layout file, normalised."""
+    features = h5["features"][selection]
+    norm = read_normalization(h5)
+    if norm is None:
+        return features
+    return apply_normalization(features, norm, h5["frame_counts"][selection])
+
+
+def read_ragged_features(h5: h5py.File) -> List[np.ndarray]:
+    """Read every segment of a ragged file as a list of (frames_i, mfcc) arrays."""
+    frames = apply_normalization(h5["frames"][:], read_normalization(h5))
+    offsets = h5["offsets"][:]
+    lengths = h5["lengths"][:]
+    return [frames[o:o + n] for o, n in zip(offsets, lengths)]
+
+
+def pad_batch(arrays: Sequence) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Zero-pad (T_i, F) arrays/tensors to (B, T_max, F) and return it with lengths (B,)."""
+    tensors = [a if isinstance(a, torch.Tensor) else torch.from_numpy(np.asarray(a, dtype=np.float32))
+               for a in arrays]
+    lengths = torch.tensor([t.shape[0] for t in tensors], dtype=torch.long)
+    return pad_sequence(tensors, batch_first=True), lengths
+
+
+def pad_collate(batch):
+    """Collate (x, y) pairs of different lengths into (x_padded, lengths, y)."""
+    xs, ys = zip(*batch)
+    x, lengths = pad_batch(xs)
+    return x, lengths, torch.stack(list(ys))
+
+
+def unpack_batch(batch):
+    """Return (x, lengths, y) for both fixed (x, y) and ragged (x, lengths, y) batches."""
+    if len(batch) == 3:
+        return batch
+    x, y = batch
+    return x, None, y
+
+
+class BucketBatchSampler(Sampler):
+    """Yield batches of indices with similar sequence lengths.
+
+    Indices are shuffled, cut into pools of `batch_size * pool_batches`, sorted by length
+    inside each pool and split into batches; the batch order is shuffled again. Batches are
+    padded only up to their own longest member, which keeps padding small while retaining
+    randomness across epochs. Call `set_epoch` to reshuffle deterministically.
+
+    With `num_replicas > 1` every rank builds the same batch list (same seed) and keeps every
+    `num_replicas`-th batch starting at `rank`. Like `DistributedSampler`, the list is first
+    padded by repeating batches from its start, so all ranks run the same number of steps (as
+    DistributedDataParallel requires) and none is left empty when there are fewer batches
+    than ranks.
+    """
+
+    def __init__(self, lengths: Sequence[int], batch_size: int, shuffle: bool = True,
+                 pool_batches: int = 50, drop_last: bool = False, seed: int = 42,
+                 num_replicas: int = 1, rank: int = 0):
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.pool_batches = pool_batches
+        self.drop_last = drop_last
+        self.seed = seed
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def _batches(self) -> List[np.ndarray]:
+        n = len(self.lengths)
+        if self.shuffle:
+            rng = np.random.default_rng(self.seed + self.epoch)
+            order = rng.permutation(n)
+        else:
+            rng = None
+            order = np.arange(n)
+        pool = self.batch_size * self.pool_batches
+        batches: List[np.ndarray] = []
+        for p in range(0, n, pool):
+            chunk = order[p:p + pool]
+            chunk = chunk[np.argsort(self.lengths[chunk], kind="stable")]
+            for b in range(0, len(chunk), self.batch_size):
+                batch = chunk[b:b + self.batch_size]
+                if self.drop_last and len(batch) < self.batch_size:
+                    continue
+                batches.append(batch)
+        if rng is not None:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        if self.num_replicas > 1 and batches:
+            total = -(-len(batches) // self.num_replicas) * self.num_replicas
+            batches = [batches[i % len(batches)] for i in range(total)]
+            batches = batches[self.rank::self.num_replicas]
+        return batches
+
+    def __iter__(self) -> Iterator[List[int]]:
+        for batch in self._batches():
+            yield batch.tolist()
+
+    def __len__(self) -> int:
+        return len(self._batches())
+
+
+class SequenceDataset(Dataset):
+    """In-memory dataset over a list of variable-length (T_i, F) feature arrays."""
+
+    def __init__(self, features: Sequence[np.ndarray], labels: np.ndarray):
+        super().__init__()
+        self.features = features
+        self.labels = labels
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def __getitem__(self, idx: int):
+        x = torch.from_numpy(np.asarray(self.features[idx], dtype=np.float32))
+        y = torch.tensor(int(self.labels[idx]), dtype=torch.long)
+        return x, y
+
+
 class H5MFCCDataset(Dataset):
     def __init__(self, h5_path: str, indices: np.ndarray):
         super().__init__()
@@ -46,11 +194,21 @@ class H5MFCCDataset(Dataset):
     def _ensure_open(self):
         if self._h5 is None:
             self._h5 = h5py.File(self.h5_path, 'r')
+            self._ragged = is_ragged(self._h5)
+            self._norm = read_normalization(self._h5)
+            if self._ragged:
+                self._offsets = self._h5['offsets'][:]
+                self._lengths = self._h5['lengths'][:]
 
     def __getitem__(self, idx: int):
         self._ensure_open()
         i = int(self.indices[idx])
-        features = self._h5['features'][i]  # (frames, mfcc)
+        if self._ragged:
+            start = int(self._offsets[i])
+            features = self._h5['frames'][start:start + int(self._lengths[i])]  # (frames_i, mfcc)
+            features = apply_normalization(features, self._norm)
+        else:
+            features = read_fixed_features(self._h5, i)  # (frames, mfcc)
 
         raw_label = self._h5['labels'][i]
         label_str = raw_label.decode('utf-8') if isinstance(raw_label, bytes) else str(raw_label)
@@ -78,16 +236,26 @@ def create_dataloaders_from_h5(
     test_size: float = 0.1,
     stratify: bool = True,
 ) -> Tuple[DataLoader, DataLoader, DataLoader, int, int]:
-    """Create train/val/test loaders and return mfcc_dim, num_classes."""
+    """Create train/val/test loaders and return mfcc_dim, num_classes.
+
+    Ragged files yield (x_padded, lengths, y) batches bucketed by length; fixed files yield (x, y).
+    """
+    from sklearn.model_selection import train_test_split
+
     with h5py.File(h5_path, 'r') as h5:
-        features = h5['features'][:]  # (N, T, F)
         labels = [s.decode('utf-8') if isinstance(s, bytes) else str(s) for s in h5['labels'][:]]
-        mfcc_dim = features.shape[2]
+        ragged = is_ragged(h5)
+        if ragged:
+            seq_lengths = h5['lengths'][:]
+            mfcc_dim = h5['frames'].shape[1]
+        else:
+            seq_lengths = None
+            mfcc_dim = h5['features'].shape[2]  # (N, T, F)
 
     encoded = _encode_labels(labels)  # will raise on unknowns
 
     num_classes = 2  # 🔒 fixed for lie/truth
-    indices = np.arange(features.shape[0])
+    indices = np.arange(len(labels))
 
     strat = encoded if stratify else None
     idx_train_val, idx_test = train_test_split(indices, test_size=test_size, random_state=42, stratify=strat)
@@ -98,9 +266,18 @@ def create_dataloaders_from_h5(
     val_ds   = H5MFCCDataset(h5_path, idx_val)
     test_ds  = H5MFCCDataset(h5_path, idx_test)
 
-    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True,  drop_last=False)
-    val_loader   = DataLoader(val_ds,   batch_size=batch_size, shuffle=False, drop_last=False)
-    test_loader  = DataLoader(test_ds,  batch_size=batch_size, shuffle=False, drop_last=False)
+    if ragged:
+        def _bucketed(ds, idx, shuffle):
+            sampler = BucketBatchSampler(seq_lengths[idx], batch_size, shuffle=shuffle)
+            return DataLoader(ds, batch_sampler=sampler, collate_fn=pad_collate)
+
+        train_loader = _bucketed(train_ds, idx_train, shuffle=True)
+        val_loader   = _bucketed(val_ds,   idx_val,   shuffle=False)
+        test_loader  = _bucketed(test_ds,  idx_test,  shuffle=False)
+    else:
+        train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True,  drop_last=False)
+        val_loader   = DataLoader(val_ds,   batch_size=batch_size, shuffle=False, drop_last=False)
+        test_loader  = DataLoader(test_ds,  batch_size=batch_size, shuffle=False, drop_last=False)
 
     print(f"[INFO] Dims -> mfcc_dim={mfcc_dim}, num_classes={num_classes}")
     return train_loader, val_loader, test_loader, mfcc_dim, num_classes
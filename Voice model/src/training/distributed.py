@@ -0,0 +1,177 @@
+import os
+import time
+
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, DistributedSampler
+
+from src.models.ernn import RNNClassifier
+from src.models.precision import check_precision
+from src.training.dataset import BucketBatchSampler, pad_collate
+from src.training.train_eval import (
+    _build_config, _evaluate_loader, _feature_extractor_state, _last_checkpoint_path, _sequence_lengths,
+    _split_dataset, _train_one_epoch, load_h5_data, save_checkpoint,
+)
+
+
+def default_threads_per_process(world_size: int) -> int:
+    """Split the machine's cores evenly so the processes do not oversubscribe them."""
+    return max(1, (os.cpu_count() or 1) // max(world_size, 1))
+
+
+def _make_loaders(X, y, batch_size, seed, rank, world_size):
+    """Sharded train loader for this rank plus full val/test loaders (used on rank 0 only)."""
+    train_ds, val_ds, test_ds = _split_dataset(X, y, seed)
+    if isinstance(X, list):
+        lengths = _sequence_lengths(X)
+        train_sampler = BucketBatchSampler(lengths[train_ds.indices], batch_size, shuffle=True, seed=seed,
+                                           num_replicas=world_size, rank=rank)
+        train_loader = DataLoader(train_ds, batch_sampler=train_sampler, collate_fn=pad_collate)
+
+        def _eval_loader(subset):
+            sampler = BucketBatchSampler(lengths[subset.indices], batch_size, shuffle=False)
+            return DataLoader(subset, batch_sampler=sampler, collate_fn=pad_collate)
+
+        return train_loader, train_sampler, _eval_loader(val_ds), _eval_loader(test_ds), len(train_ds)
+
+    train_sampler = DistributedSampler(train_ds, num_replicas=world_size, rank=rank, shuffle=True, seed=seed)
+    train_loader = DataLoader(train_ds, batch_size=batch_size, sampler=train_sampler)
+    return (
+        train_loader,
+        train_sampler,
+        DataLoader(val_ds, batch_size=batch_size),
+        DataLoader(test_ds, batch_size=batch_size),
+        len(train_ds),
+    )
+
+
+def _worker(rank, world_size, h5_path, options, result_queue):
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(options["master_port"])
+    # thread pools must be sized before the first parallel op in this process
+    torch.set_num_threads(options["threads_per_process"])
+    torch.set_num_interop_threads(1)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    try:
+        seed = options["seed"]
+        torch.manual_seed(seed)
+        X, y = load_h5_data(h5_path)
+        features = _feature_extractor_state(h5_path) if rank == 0 else None
+        train_loader, train_sampler, val_loader, test_loader, n_train = _make_loaders(
+            X, y, options["batch_size"], seed, rank, world_size)
+
+        input_size = X[0].shape[1] if isinstance(X, list) else X.shape[2]
+        cfg = _build_config(options["fuzzy_params"], options["model_type"], input_size, len(np.unique(y)))
+        model = RNNClassifier(cfg)
+        ddp_model = DistributedDataParallel(model)
+        criterion = nn.CrossEntropyLoss()
+        # scale the step size with the global batch (batch_size * world_size)
+        lr = cfg.learning_rate * (world_size if options["scale_lr"] else 1)
+        optimizer = optim.Adam(ddp_model.parameters(), lr=lr)
+
+        patience = options["patience"]
+        checkpoint_path = options["checkpoint_path"]
+        best_val_loss = float("inf")
+        best_state = None
+        epochs_no_improve = 0
+        history = []
+        stop = torch.zeros(1, dtype=torch.int64)
+        for epoch in range(options["epochs"]):
+            train_sampler.set_epoch(epoch)
+            t0 = time.perf_counter()
+            train_loss = _train_one_epoch(ddp_model, train_loader, criterion, optimizer, "cpu",
+                                          precision=options["precision"],
+                                          max_grad_norm=options["max_grad_norm"], distributed=True)
+            dist.barrier()
+            epoch_seconds = time.perf_counter() - t0
+
+            # rank 0 owns validation, checkpoints and metrics; the others wait on the broadcast
+            if rank == 0:
+                val_loss, val_acc, val_f1 = _evaluate_loader(model, val_loader, criterion, "cpu",
+                                                             options["precision"])
+                history.append({"epoch": epoch + 1, "train_loss": train_loss, "val_loss": val_loss,
+                                "val_acc": val_acc, "val_f1": val_f1, "epoch_seconds": epoch_seconds,
+                                "train_samples_per_sec": n_train / max(epoch_seconds, 1e-9)})
+                print(f"[DEBUG] Epoch {epoch+1}/{options['epochs']} | world={world_size} | "
+                      f"Loss: {train_loss:.4f} | Val loss: {val_loss:.4f} | {epoch_seconds:.2f}s")
+                if val_loss < best_val_loss:
+                    best_val_loss = val_loss
+                    epochs_no_improve = 0
+                    best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+                    if checkpoint_path:
+                        save_checkpoint(checkpoint_path, model, optimizer, cfg, epoch + 1,
+                                        best_val_loss=best_val_loss, seed=seed, val_metrics=history[-1],
+                                        feature_extractor=features, precision=options["precision"])
+                else:
+                    epochs_no_improve += 1
+                if checkpoint_path:
+                    save_checkpoint(_last_checkpoint_path(checkpoint_path), model, optimizer, cfg, epoch + 1,
+                                    best_val_loss=best_val_loss, epochs_no_improve=epochs_no_improve,
+                                    history=history, seed=seed, feature_extractor=features,
+                                    precision=options["precision"])
+                stop[0] = int(patience is not None and epochs_no_improve >= patience)
+            dist.broadcast(stop, src=0)
+            if stop.item():
+                break
+
+        if rank == 0:
+            if best_state is not None:
+                model.load_state_dict(best_state)
+            _, val_acc, val_f1 = _evaluate_loader(model, val_loader, criterion, "cpu", options["precision"])
+            _, test_acc, test_f1 = _evaluate_loader(model, test_loader, criterion, "cpu", options["precision"])
+            result_queue.put({
+                "val_acc": val_acc,
+                "val_f1": val_f1,
+                "test_acc": test_acc,
+                "test_f1": test_f1,
+                "epochs_run": len(history),
+                "best_val_loss": best_val_loss,
+                "world_size": world_size,
+                "threads_per_process": options["threads_per_process"],
+                "history": history,
+            })
+    finally:
+        dist.destroy_process_group()
+
+
+def train_distributed(h5_path, world_size=2, fuzzy_params=None, model_type="lstm", epochs=20,
+                      batch_size=64, patience=5, checkpoint_path=None, seed=42,
+                      threads_per_process=None, scale_lr=False, master_port=29512,
+                      precision="fp32", max_grad_norm=None):
+    """CPU data-parallel counterpart of `train_validate_test` (DDP over gloo).
+
+    Spawns `world_size` local processes, each pinned to `threads_per_process` intra-op threads
+    (default: cores // world_size). Every rank trains on its shard of the same seeded split;
+    `batch_size` is per process. Rank 0 validates, checkpoints (same format as
+    `train_validate_test`) and returns the metrics. `precision="bf16"` enables CPU autocast
+    with gradient clipping (default 5.0), as in `train_validate_test`.
+    """
+    precision = check_precision(precision)
+    if precision == "bf16" and max_grad_norm is None:
+        max_grad_norm = 5.0
+    options = {
+        "fuzzy_params": fuzzy_params,
+        "model_type": model_type,
+        "epochs": epochs,
+        "batch_size": batch_size,
+        "patience": patience,
+        "checkpoint_path": checkpoint_path,
+        "seed": seed,
+        "threads_per_process": threads_per_process or default_threads_per_process(world_size),
+        "scale_lr": scale_lr,
+        "master_port": master_port,
+        "precision": precision,
+        "max_grad_norm": max_grad_norm,
+    }
+    ctx = mp.get_context("spawn")
+    result_queue = ctx.SimpleQueue()
+    mp.spawn(_worker, args=(world_size, h5_path, options, result_queue), nprocs=world_size, join=True)
+    metrics = result_queue.get()
+    summary = {k: v for k, v in metrics.items() if k != "history"}
+    print(f"[DEBUG] Final Metrics (world={world_size}): {summary}")
+    return metrics
@@ -1,16 +1,25 @@
+import os
+from dataclasses import asdict
+
 import torch
+import torch.distributed as dist
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import DataLoader, TensorDataset, random_split
 import numpy as np
 import h5py
-from sklearn.metrics import accuracy_score, f1_score
 from src.models.ernn import RNNConfig, RNNClassifier
+from src.models.precision import autocast, check_precision
+from src.training.dataset import (
+    BucketBatchSampler, SequenceDataset, is_ragged, pad_collate, read_fixed_features, read_ragged_features,
+    unpack_batch,
+)
 
 
 def load_h5_data(h5_path):
+    """Return (X, y); X is an (N, T, F) array, or a list of (T_i, F) arrays for ragged files."""
     with h5py.File(h5_path, "r") as f:
-        X = np.array(f["features"])
+        X = read_ragged_features(f) if is_ragged(f) else read_fixed_features(f)
         raw_y = np.array(f["labels"])
 
     # Convert raw_y (which may be bytes) -> clean strings
@@ -47,81 +56,274 @@ def load_h5_data(h5_path):
 
 
 
-def train_validate_test(h5_path, fuzzy_params=None, model_type="lstm", device="cpu",
-                        epochs=20, batch_size=64, return_model=False):
-    X, y = load_h5_data(h5_path)
+def save_checkpoint(path, model, optimizer, cfg, epoch, **extra):
+    """Write a training checkpoint readable by `evaluate._load_model` and `xai._load_model`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    ckpt = {
+        "model_state_dict": model.state_dict(),
+        "optimizer_state_dict": optimizer.state_dict(),
+        "model_config": asdict(cfg),
+        "epoch": epoch,
+    }
+    ckpt.update(extra)
+    # write-then-rename so an interrupted save never corrupts the previous checkpoint
+    tmp_path = path + ".tmp"
+    torch.save(ckpt, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _feature_extractor_state(h5_path):
+    """`FeatureExtractor` description of the HDF5's features, stored in checkpoints so serving
+    computes exactly the inputs the model was trained on. None for files without a
+    preprocessing config (e.g. synthetic benchmark data)."""
+    from src.features.extractor import FeatureExtractor
+
+    try:
+        return FeatureExtractor.from_h5(h5_path).to_dict()
+    except KeyError:
+        return None
 
-    # convert to tensors
-    X_tensor = torch.tensor(X, dtype=torch.float32)
-    y_tensor = torch.tensor(y, dtype=torch.long)
 
-    dataset = TensorDataset(X_tensor, y_tensor)
+def _last_checkpoint_path(checkpoint_path):
+    root, ext = os.path.splitext(checkpoint_path)
+    return f"{root}_last{ext or '.pt'}"
+
+
+def _split_dataset(X, y, seed):
+    """Seeded 70/15/15 random split, identical in every process that uses the same seed."""
+    if isinstance(X, list):
+        dataset = SequenceDataset(X, y)
+    else:
+        dataset = TensorDataset(torch.tensor(X, dtype=torch.float32), torch.tensor(y, dtype=torch.long))
     train_size = int(0.7 * len(dataset))
     val_size = int(0.15 * len(dataset))
     test_size = len(dataset) - train_size - val_size
-    train_ds, val_ds, test_ds = random_split(dataset, [train_size, val_size, test_size])
+    return random_split(
+        dataset, [train_size, val_size, test_size],
+        generator=torch.Generator().manual_seed(seed),
+    )
+
+
+def _sequence_lengths(X):
+    return np.array([arr.shape[0] for arr in X], dtype=np.int64)
+
 
-    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True)
-    val_loader = DataLoader(val_ds, batch_size=batch_size)
-    test_loader = DataLoader(test_ds, batch_size=batch_size)
+def _build_loaders(X, y, batch_size, seed):
+    """Seeded 70/15/15 split; ragged inputs get length-bucketed, padded batches."""
+    train_ds, val_ds, test_ds = _split_dataset(X, y, seed)
 
-    # === Hyperparameters ===
+    if isinstance(X, list):
+        lengths = _sequence_lengths(X)
+
+        def _bucketed(subset, shuffle):
+            sampler = BucketBatchSampler(lengths[subset.indices], batch_size, shuffle=shuffle, seed=seed)
+            return DataLoader(subset, batch_sampler=sampler, collate_fn=pad_collate)
+
+        return _bucketed(train_ds, True), _bucketed(val_ds, False), _bucketed(test_ds, False)
+
+    return (
+        DataLoader(train_ds, batch_size=batch_size, shuffle=True),
+        DataLoader(val_ds, batch_size=batch_size),
+        DataLoader(test_ds, batch_size=batch_size),
+    )
+
+
+def _build_config(fuzzy_params, model_type, input_size, num_classes):
     learning_rate = fuzzy_params.get("learning_rate", 0.001) if fuzzy_params else 0.001
     hidden_size = int(fuzzy_params.get("hidden_size", 128)) if fuzzy_params else 128
     dropout = fuzzy_params.get("dropout", 0.3) if fuzzy_params else 0.3
-
-    # === Fix: get number of classes dynamically ===
-    num_classes = len(np.unique(y))
-    print(f"[DEBUG] Detected num_classes = {num_classes}")
-
-    cfg = RNNConfig(
-        input_size=X.shape[2],
+    return RNNConfig(
+        input_size=input_size,
         hidden_size=hidden_size,
         dropout=dropout,
         num_classes=num_classes,
         model_type=model_type,
         learning_rate=learning_rate
-        
     )
 
+
+def _train_one_epoch(model, loader, criterion, optimizer, device, precision="fp32",
+                     max_grad_norm=None, stats=None, distributed=False):
+    """One pass over `loader`; returns the mean loss of the steps that were applied.
+
+    The loss is computed in float32 from upcast logits and gradients can be clipped to
+    `max_grad_norm`. Under bf16 only, steps with a non-finite loss are skipped rather than
+    applied and counted in `stats["nonfinite_steps"]` when a dict is passed; in fp32 a
+    diverging run still surfaces as a NaN loss. With `distributed=True` the skip decision is
+    agreed across ranks so DDP never deadlocks.
+    """
+    model.train()
+    total_loss = 0.0
+    applied = 0
+    for batch in loader:
+        xb, lengths, yb = unpack_batch(batch)
+        xb, yb = xb.to(device), yb.to(device)
+        optimizer.zero_grad()
+        with autocast(precision, device):
+            preds = model(xb, lengths)
+        loss = criterion(preds.float(), yb)
+        finite = precision != "bf16" or bool(torch.isfinite(loss))
+        if distributed and precision == "bf16":
+            flag = torch.tensor([int(finite)], dtype=torch.int32)
+            dist.all_reduce(flag, op=dist.ReduceOp.MIN)
+            finite = bool(flag.item())
+        if not finite:
+            if stats is not None:
+                stats["nonfinite_steps"] = stats.get("nonfinite_steps", 0) + 1
+            continue
+        loss.backward()
+        if max_grad_norm is not None:
+            torch.nn.utils.clip_grad_norm_(model.parameters(), max_grad_norm)
+        optimizer.step()
+        total_loss += loss.item()
+        applied += 1
+    return total_loss / applied if applied else float("nan")
+
+
+def _evaluate_loader(model, loader, criterion, device, precision="fp32"):
+    """Return (mean loss, accuracy, f1) over a loader."""
+    from sklearn.metrics import accuracy_score, f1_score
+
+    model.eval()
+    all_preds, all_true = [], []
+    total_loss, n_batches = 0.0, 0
+    with torch.no_grad():
+        for batch in loader:
+            xb, lengths, yb = unpack_batch(batch)
+            xb, yb = xb.to(device), yb.to(device)
+            with autocast(precision, device):
+                logits = model(xb, lengths)
+            logits = logits.float()
+            total_loss += criterion(logits, yb).item()
+            n_batches += 1
+            all_preds.extend(logits.argmax(dim=1).cpu().numpy())
+            all_true.extend(yb.cpu().numpy())
+    if not all_true:
+        return float("nan"), float("nan"), float("nan")
+    return (
+        total_loss / n_batches,
+        accuracy_score(all_true, all_preds),
+        f1_score(all_true, all_preds, zero_division=0),
+    )
+
+
+def train_validate_test(h5_path, fuzzy_params=None, model_type="lstm", device="cpu",
+                        epochs=20, batch_size=64, return_model=False,
+                        patience=5, checkpoint_path=None, resume_from=None, seed=42,
+                        precision="fp32", max_grad_norm=None, max_nonfinite_steps=10):
+    """Train with per-epoch validation, early stopping and checkpointing.
+
+    Validation loss is checked after every epoch; training stops once it has not improved
+    for `patience` epochs (`patience=None` disables early stopping). When `checkpoint_path`
+    is given the best model is written there and the latest state next to it as
+    `<name>_last.pt`. Pass either file as `resume_from` to continue an interrupted run;
+    the split is seeded so a resumed run sees the same train/val/test partition.
+
+    `precision="bf16"` trains and evaluates under CPU autocast (float32 master weights).
+    Gradients are then clipped to `max_grad_norm` (default 5.0), and if an epoch skips more
+    than `max_nonfinite_steps` steps for NaN/inf losses training falls back to fp32. The
+    precision in use is stored in the checkpoints, so resuming after a fallback stays in fp32.
+    """
+    precision = check_precision(precision)
+    if precision == "bf16" and max_grad_norm is None:
+        max_grad_norm = 5.0
+    X, y = load_h5_data(h5_path)
+    features = _feature_extractor_state(h5_path)
+    train_loader, val_loader, test_loader = _build_loaders(X, y, batch_size, seed)
+    input_size = X[0].shape[1] if isinstance(X, list) else X.shape[2]
+
+    # === Fix: get number of classes dynamically ===
+    num_classes = len(np.unique(y))
+    print(f"[DEBUG] Detected num_classes = {num_classes}")
+
+    resume_ckpt = torch.load(resume_from, map_location=device) if resume_from else None
+    if resume_ckpt is not None:
+        # the checkpoint's config wins so the state_dict shapes always line up
+        cfg = RNNConfig(**resume_ckpt["model_config"])
+    else:
+        cfg = _build_config(fuzzy_params, model_type, input_size, num_classes)
+
     model = RNNClassifier(cfg).to(device)
     criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=learning_rate)
+    optimizer = optim.Adam(model.parameters(), lr=cfg.learning_rate)
+
+    start_epoch = 0
+    best_val_loss = float("inf")
+    best_state = None
+    epochs_no_improve = 0
+    history = []
+    if resume_ckpt is not None:
+        model.load_state_dict(resume_ckpt["model_state_dict"])
+        if "optimizer_state_dict" in resume_ckpt:
+            optimizer.load_state_dict(resume_ckpt["optimizer_state_dict"])
+        start_epoch = int(resume_ckpt.get("epoch", 0))
+        best_val_loss = float(resume_ckpt.get("best_val_loss", float("inf")))
+        epochs_no_improve = int(resume_ckpt.get("epochs_no_improve", 0))
+        history = list(resume_ckpt.get("history", []))
+        if precision == "bf16" and resume_ckpt.get("precision") == "fp32":
+            print("[WARN] the resumed run had fallen back to fp32; continuing in fp32")
+            precision = "fp32"
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            best_state = torch.load(checkpoint_path, map_location=device)["model_state_dict"]
+        print(f"[DEBUG] Resumed from {resume_from} at epoch {start_epoch}")
 
     # === Training Loop ===
-    for epoch in range(epochs):
-        model.train()
-        total_loss = 0
-        for xb, yb in train_loader:
-            xb, yb = xb.to(device), yb.to(device)
-            optimizer.zero_grad()
-            preds = model(xb)
-            loss = criterion(preds, yb)
-            loss.backward()
-            optimizer.step()
-            total_loss += loss.item()
-        print(f"[DEBUG] Epoch {epoch+1}/{epochs} | Loss: {total_loss/len(train_loader):.4f}")
+    for epoch in range(start_epoch, epochs):
+        if patience is not None and epochs_no_improve >= patience:
+            break
+        if isinstance(train_loader.batch_sampler, BucketBatchSampler):
+            train_loader.batch_sampler.set_epoch(epoch)
+        stats = {}
+        train_loss = _train_one_epoch(model, train_loader, criterion, optimizer, device,
+                                      precision=precision, max_grad_norm=max_grad_norm, stats=stats)
+        if precision == "bf16" and stats.get("nonfinite_steps", 0) > max_nonfinite_steps:
+            print(f"[WARN] {stats['nonfinite_steps']} non-finite bf16 steps in epoch {epoch+1}; "
+                  "falling back to fp32")
+            precision = "fp32"
+        val_loss, val_acc, val_f1 = _evaluate_loader(model, val_loader, criterion, device, precision)
+        history.append({"epoch": epoch + 1, "train_loss": train_loss, "val_loss": val_loss,
+                        "val_acc": val_acc, "val_f1": val_f1, "precision": precision,
+                        "nonfinite_steps": stats.get("nonfinite_steps", 0)})
+        print(f"[DEBUG] Epoch {epoch+1}/{epochs} | Loss: {train_loss:.4f} | "
+              f"Val loss: {val_loss:.4f} | Val acc: {val_acc:.4f}")
+
+        # NaN val_loss (empty val split) never counts as an improvement
+        if val_loss < best_val_loss:
+            best_val_loss = val_loss
+            epochs_no_improve = 0
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, model, optimizer, cfg, epoch + 1,
+                                best_val_loss=best_val_loss, seed=seed, val_metrics=history[-1],
+                                feature_extractor=features, precision=precision)
+        else:
+            epochs_no_improve += 1
+
+        if checkpoint_path:
+            save_checkpoint(_last_checkpoint_path(checkpoint_path), model, optimizer, cfg, epoch + 1,
+                            best_val_loss=best_val_loss, epochs_no_improve=epochs_no_improve,
+                            history=history, seed=seed, feature_extractor=features, precision=precision)
+
+        if patience is not None and epochs_no_improve >= patience:
+            print(f"[DEBUG] Early stopping: no val improvement for {patience} epochs")
+            break
+
+    # Evaluate the best weights, not whatever the last epoch left behind
+    if best_state is not None:
+        model.load_state_dict(best_state)
 
     # === Validation/Test Evaluation ===
-    def eval_model(loader):
-        model.eval()
-        all_preds, all_true = [], []
-        with torch.no_grad():
-            for xb, yb in loader:
-                xb, yb = xb.to(device), yb.to(device)
-                preds = model(xb).argmax(dim=1)
-                all_preds.extend(preds.cpu().numpy())
-                all_true.extend(yb.cpu().numpy())
-        return accuracy_score(all_true, all_preds), f1_score(all_true, all_preds)
-
-    val_acc, val_f1 = eval_model(val_loader)
-    test_acc, test_f1 = eval_model(test_loader)
+    _, val_acc, val_f1 = _evaluate_loader(model, val_loader, criterion, device, precision)
+    _, test_acc, test_f1 = _evaluate_loader(model, test_loader, criterion, device, precision)
 
     metrics = {
         "val_acc": val_acc,
         "val_f1": val_f1,
         "test_acc": test_acc,
-        "test_f1": test_f1
+        "test_f1": test_f1,
+        "epochs_run": len(history),
+        "best_val_loss": best_val_loss,
+        "precision": precision,
     }
 
     print(f"[DEBUG] Final Metrics: {metrics}")
@@ -1,5 +1,20 @@
-from .interpret import explain_samples
+import importlib
 
-__all__ = ["explain_samples"]
+_EXPORTS = {
+	"explain_samples": ".interpret",
+}
 
+__all__ = list(_EXPORTS)
 
+
+def __getattr__(name):
+	module = _EXPORTS.get(name)
+	if module is None:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	value = getattr(importlib.import_module(module, __name__), name)
+	globals()[name] = value
+	return value
+
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
@@ -1,16 +1,15 @@
+import hashlib
 import json
 import os
-from typing import Dict, List, Literal
+from typing import Dict, List, Literal, Optional, Tuple
 
 import h5py
 import numpy as np
 import torch
-import matplotlib.pyplot as plt
-from captum.attr import IntegratedGradients
-import shap
-from lime.lime_tabular import LimeTabularExplainer
 
 from src.models import RNNClassifier, RNNConfig
+from src.training.dataset import is_ragged, pad_batch, read_fixed_features, read_ragged_features
+from src.xai.render import _plot_bars, _plot_heatmap, heatmap_executor
 
 
 def _load_model(model_path: str, device: str) -> RNNClassifier:
@@ -22,22 +21,109 @@ def _load_model(model_path: str, device: str) -> RNNClassifier:
     return model
 
 
-def _load_subset(h5_path: str, count: int) -> np.ndarray:
+def _load_subset(h5_path: str, count: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Read the first `count` segments; ragged files are zero-padded and return their lengths."""
     with h5py.File(h5_path, "r") as h5:
-        X = h5["features"][:]
-    return X[:count]
+        if not is_ragged(h5):
+            return read_fixed_features(h5, slice(0, count)), None
+        segments = read_ragged_features(h5)[:count]
+    X, lengths = pad_batch(segments)
+    return X.numpy(), lengths.numpy()
 
 
-def _plot_heatmap(attr: np.ndarray, out_path: str, title: str) -> None:
-    plt.figure(figsize=(6, 3))
-    plt.imshow(attr, aspect="auto", origin="lower", cmap="RdBu_r")
-    plt.colorbar()
-    plt.title(title)
-    plt.xlabel("Frame")
-    plt.ylabel("MFCC")
-    plt.tight_layout()
-    plt.savefig(out_path)
-    plt.close()
+def _background_summary(h5_path: str, frames: int, k: int, cache_dir: Optional[str],
+                        pool_size: int = 1000) -> np.ndarray:
+    """`shap.kmeans` centroids (k, frames, F) of the dataset, cached on disk per file version."""
+    stat = os.stat(h5_path)
+    key = hashlib.sha1(
+        f"{os.path.abspath(h5_path)}|{stat.st_size}|{stat.st_mtime_ns}|{frames}|{k}|{pool_size}".encode()
+    ).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f"shap_background_{key}.npy")
+    if os.path.exists(cache_path):
+        return np.load(cache_path)
+
+    import shap
+
+    X, _ = _load_subset(h5_path, count=pool_size)
+    if X.shape[1] < frames:
+        X = np.pad(X, ((0, 0), (0, frames - X.shape[1]), (0, 0)))
+    X = X[:, :frames]
+    summary = shap.kmeans(X.reshape(X.shape[0], -1), k).data.reshape(-1, frames, X.shape[2]).astype(np.float32)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(cache_path, summary)
+    return summary
+
+
+def _first_output(values) -> np.ndarray:
+    """Values for the top-ranked output across shap versions (list of arrays or trailing axis)."""
+    if isinstance(values, list):
+        return np.asarray(values[0])
+    values = np.asarray(values)
+    return values[..., 0]
+
+
+def _feature_groups(frames: int, n_mfcc: int, group_by: str, time_block: int) -> List[np.ndarray]:
+    """Boolean (T, F) masks, one per group."""
+    groups = []
+    if group_by == "mfcc":
+        for c in range(n_mfcc):
+            mask = np.zeros((frames, n_mfcc), dtype=bool)
+            mask[:, c] = True
+            groups.append(mask)
+    elif group_by == "time":
+        for t in range(0, frames, time_block):
+            mask = np.zeros((frames, n_mfcc), dtype=bool)
+            mask[t:t + time_block] = True
+            groups.append(mask)
+    else:
+        raise ValueError(f"Unknown shap_group_by: {group_by}")
+    return groups
+
+
+def _group_values(values: np.ndarray, group_by: str, time_block: int) -> np.ndarray:
+    """Sum (T, F) attributions per MFCC coefficient or per time block."""
+    if group_by == "mfcc":
+        return values.sum(axis=0)
+    frames = values.shape[0]
+    return np.array([values[t:t + time_block].sum() for t in range(0, frames, time_block)], dtype=np.float32)
+
+
+class _WithLength(torch.nn.Module):
+    """`model(x, lengths)` with every row given `length` valid frames (None: all frames), for
+    explainers that call `model(x)` on perturbations of one ragged sample."""
+
+    def __init__(self, model: RNNClassifier):
+        super().__init__()
+        self.model = model
+        self.length: Optional[int] = None
+
+    def forward(self, x):
+        if self.length is None:
+            return self.model(x)
+        return self.model(x, torch.full((x.shape[0],), self.length, dtype=torch.long))
+
+
+def _grouped_predict_fn(model: RNNClassifier, x: np.ndarray, reference: np.ndarray,
+                        groups: List[np.ndarray], target: int, batch_size: int, device: str,
+                        length: Optional[int] = None):
+    """Map group on/off masks (M, G) to the target-class probability, batching the model calls.
+    `length` is the sample's valid frame count for zero-padded ragged data."""
+    group_masks = np.stack(groups).astype(np.float32)  # (G, T, F)
+    wrapped = _WithLength(model)
+    wrapped.length = length
+
+    def predict(z: np.ndarray) -> np.ndarray:
+        out = np.empty(len(z), dtype=np.float32)
+        for start in range(0, len(z), batch_size):
+            zb = z[start:start + batch_size].astype(np.float32)
+            keep = np.clip(np.tensordot(zb, group_masks, axes=1), 0.0, 1.0)  # (M, T, F)
+            batch = keep * x[None] + (1.0 - keep) * reference[None]
+            with torch.no_grad():
+                logits = wrapped(torch.from_numpy(batch).to(device))
+            out[start:start + len(zb)] = torch.softmax(logits, dim=1)[:, target].cpu().numpy()
+        return out
+
+    return predict
 
 
 def explain_samples(
@@ -47,59 +133,144 @@ def explain_samples(
     method: Literal["ig", "shap", "lime"] = "ig",
     max_samples: int = 10,
     device: str = "cpu",
+    batch_size: int = 32,
+    n_steps: int = 32,
+    internal_batch_size: Optional[int] = 512,
+    render_workers: Optional[int] = None,
+    shap_mode: Literal["gradient", "grouped"] = "gradient",
+    shap_group_by: Literal["mfcc", "time"] = "mfcc",
+    time_block: int = 10,
+    shap_nsamples: int = 200,
+    background_size: int = 10,
+    cache_dir: Optional[str] = None,
 ) -> List[Dict[str, str]]:
+    """Explain the first `max_samples` segments of `h5_eval` and write one plot per sample.
+
+    IG runs `batch_size` samples per `ig.attribute` call against a shared all-zero baseline
+    (the dataset mean, since features are z-normalized), with each sample's predicted class
+    as its target. `internal_batch_size` bounds how many of the batch_size * n_steps
+    interpolated inputs go through the model at once. Heatmaps are rendered by a pool of
+    `render_workers` processes (default min(4, cores); 0 renders inline).
+
+    SHAP never flattens a sample into T*F tabular features. `shap_mode="gradient"` runs
+    GradientExplainer (expected gradients) on whole batches and sums the values per group;
+    `shap_mode="grouped"` runs KernelSHAP over groups directly, replacing absent groups by the
+    background mean and batching the model calls. Groups are MFCC coefficients
+    (`shap_group_by="mfcc"`) or blocks of `time_block` frames (`"time"`). The `shap.kmeans`
+    background of `background_size` centroids is cached in `cache_dir` (default
+    `<out_dir>/.shap_cache`), keyed by the dataset file.
+    """
     os.makedirs(out_dir, exist_ok=True)
+    cache_dir = cache_dir or os.path.join(out_dir, ".shap_cache")
     model = _load_model(model_path, device)
-    X = _load_subset(h5_eval, count=max_samples)
+    X, lengths = _load_subset(h5_eval, count=max_samples)
 
     results: List[Dict[str, str]] = []
     inputs = torch.from_numpy(X).float().to(device)
+    input_lengths = torch.from_numpy(lengths) if lengths is not None else None
 
+    # captum, shap and lime are each imported only by the branch that uses them
     if method == "ig":
-        ig = IntegratedGradients(model)
-        for i in range(inputs.shape[0]):
-            x = inputs[i : i + 1]
-            x = x.clone().detach().requires_grad_(True)
+        from captum.attr import IntegratedGradients
 
-            with torch.no_grad():
-                logits = model(x)
-            pred_class = int(logits.argmax(dim=1).item())
+        ig = IntegratedGradients(model)
+        renders = []
+        with heatmap_executor(render_workers) as pool:
+            for start in range(0, inputs.shape[0], batch_size):
+                xb = inputs[start : start + batch_size]
+                lb = torch.from_numpy(lengths[start : start + batch_size]) if lengths is not None else None
 
-            # fix CuDNN backward issue
-            with torch.backends.cudnn.flags(enabled=False):
-                attributions = ig.attribute(x, target=pred_class, n_steps=32)
+                with torch.no_grad():
+                    pred_classes = model(xb, lb).argmax(dim=1)
 
-            attr_np = attributions.squeeze(0).detach().cpu().numpy()
-            attr_np = np.abs(attr_np).T  # (F, T)
+                # fix CuDNN backward issue
+                with torch.backends.cudnn.flags(enabled=False):
+                    attributions = ig.attribute(
+                        xb,
+                        baselines=0.0,
+                        target=pred_classes,
+                        additional_forward_args=(lb,),
+                        n_steps=n_steps,
+                        internal_batch_size=internal_batch_size,
+                    )
 
-            out_path = os.path.join(out_dir, f"ig_{i}.png")
-            _plot_heatmap(attr_np, out_path, f"Integrated Gradients | pred={pred_class}")
-            results.append({"index": str(i), "plot": out_path})
+                attr_batch = np.abs(attributions.detach().cpu().numpy())  # (B, T, F)
+                for j, pred_class in enumerate(pred_classes.tolist()):
+                    i = start + j
+                    steps = int(lb[j]) if lb is not None else attr_batch.shape[1]
+                    out_path = os.path.join(out_dir, f"ig_{i}.png")
+                    renders.append(pool.submit(_plot_heatmap, attr_batch[j, :steps].T, out_path,
+                                               f"Integrated Gradients | pred={pred_class}"))
+                    results.append({"index": str(i), "plot": out_path, "pred": str(pred_class)})
+            for future in renders:
+                future.result()  # surface rendering errors
 
     elif method == "shap":
-        X_flat = X.reshape(X.shape[0], -1)
-        f = lambda z: torch.softmax(
-            model(torch.from_numpy(z.reshape(-1, X.shape[1], X.shape[2])).float().to(device)), dim=1
-        ).detach().cpu().numpy()
-        background = shap.kmeans(X_flat, 10).data
-        explainer = shap.KernelExplainer(f, background)
-        shap_values = explainer.shap_values(X_flat[:max_samples], nsamples=100)
-        for i in range(min(max_samples, X_flat.shape[0])):
-            out_path = os.path.join(out_dir, f"shap_{i}.png")
-            plt.figure(figsize=(6, 3))
-            shap.summary_plot([sv[i] for sv in shap_values], X_flat[i : i + 1], show=False)
-            plt.tight_layout()
-            plt.savefig(out_path)
-            plt.close()
-            results.append({"index": str(i), "plot": out_path})
+        import shap
+
+        background = _background_summary(h5_eval, X.shape[1], background_size, cache_dir)
+        with torch.no_grad():
+            pred_classes = model(inputs, input_lengths).argmax(dim=1).cpu().numpy()
+
+        if shap_mode == "gradient":
+            # expected gradients on the (T, F) tensor, then summed per group (SHAP values are additive)
+            wrapped = _WithLength(model)
+            explainer = shap.GradientExplainer(wrapped, torch.from_numpy(background).float().to(device),
+                                               batch_size=batch_size)
+            values = np.zeros_like(X, dtype=np.float32)
+            if lengths is None:
+                for start in range(0, inputs.shape[0], batch_size):
+                    xb = inputs[start : start + batch_size]
+                    sv, _ = explainer.shap_values(xb, ranked_outputs=1, nsamples=shap_nsamples)
+                    values[start : start + len(xb)] = _first_output(sv)
+            else:
+                # ragged: one sample at a time, so every model call sees that sample's length
+                for i in range(inputs.shape[0]):
+                    wrapped.length = int(lengths[i])
+                    sv, _ = explainer.shap_values(inputs[i : i + 1], ranked_outputs=1, nsamples=shap_nsamples)
+                    values[i : i + 1] = _first_output(sv)
+            grouped = np.stack([_group_values(v, shap_group_by, time_block) for v in values])
+        elif shap_mode == "grouped":
+            # KernelSHAP over G feature groups instead of T*F individual cells
+            groups = _feature_groups(X.shape[1], X.shape[2], shap_group_by, time_block)
+            reference = background.mean(axis=0)
+            grouped = np.zeros((X.shape[0], len(groups)), dtype=np.float32)
+            for i in range(X.shape[0]):
+                predict_fn = _grouped_predict_fn(model, X[i], reference, groups, int(pred_classes[i]),
+                                                 batch_size=max(batch_size, 64), device=device,
+                                                 length=None if lengths is None else int(lengths[i]))
+                explainer = shap.KernelExplainer(predict_fn, np.zeros((1, len(groups))))
+                grouped[i] = np.asarray(explainer.shap_values(np.ones((1, len(groups))),
+                                                              nsamples=shap_nsamples, silent=True)).reshape(-1)
+        else:
+            raise ValueError(f"Unknown shap_mode: {shap_mode}")
+
+        label = "MFCC coefficient" if shap_group_by == "mfcc" else f"Time block ({time_block} frames)"
+        renders = []
+        with heatmap_executor(render_workers) as pool:
+            for i in range(grouped.shape[0]):
+                out_path = os.path.join(out_dir, f"shap_{i}.png")
+                renders.append(pool.submit(_plot_bars, grouped[i], out_path,
+                                           f"SHAP ({shap_mode}) | pred={int(pred_classes[i])}", label))
+                results.append({"index": str(i), "plot": out_path, "pred": str(int(pred_classes[i]))})
+            for future in renders:
+                future.result()
+        np.save(os.path.join(out_dir, f"shap_{shap_mode}_{shap_group_by}.npy"), grouped)
 
     else:  # lime
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from lime.lime_tabular import LimeTabularExplainer
+
         X_flat = X.reshape(X.shape[0], -1)
+        wrapped = _WithLength(model)
         predict_fn = lambda z: torch.softmax(
-            model(torch.from_numpy(z.reshape(-1, X.shape[1], X.shape[2])).float().to(device)), dim=1
+            wrapped(torch.from_numpy(z.reshape(-1, X.shape[1], X.shape[2])).float().to(device)), dim=1
         ).detach().cpu().numpy()
         explainer = LimeTabularExplainer(X_flat, mode="classification")
         for i in range(min(max_samples, X_flat.shape[0])):
+            wrapped.length = None if lengths is None else int(lengths[i])
             exp = explainer.explain_instance(X_flat[i], predict_fn, num_features=10)
             out_path = os.path.join(out_dir, f"lime_{i}.png")
             fig = exp.as_pyplot_figure()
@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+
+def _plot_heatmap(attr: np.ndarray, out_path: str, title: str) -> None:
+    import matplotlib
+    matplotlib.use("Agg")  # worker processes have no display
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(6, 3))
+    plt.imshow(attr, aspect="auto", origin="lower", cmap="RdBu_r")
+    plt.colorbar()
+    plt.title(title)
+    plt.xlabel("Frame")
+    plt.ylabel("MFCC")
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close()
+
+
+def _plot_bars(values: np.ndarray, out_path: str, title: str, xlabel: str) -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(6, 3))
+    plt.bar(np.arange(len(values)), values, color=np.where(values >= 0, "tab:red", "tab:blue"))
+    plt.axhline(0.0, color="black", linewidth=0.5)
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel("SHAP value")
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close()
+
+
+class _InlineExecutor(Executor):
+    """Executor that runs jobs immediately in the calling thread."""
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:  # surfaced on future.result(), like a real pool
+            future.set_exception(exc)
+        return future
+
+
+def heatmap_executor(workers: Optional[int]) -> Executor:
+    """Process pool that renders heatmaps off the attribution path (`workers=0` renders inline)."""
+    if workers == 0:
+        return _InlineExecutor()
+    import multiprocessing
+
+    # spawn, not fork: forking a process with live torch thread pools can deadlock
+    return ProcessPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1),
+                               mp_context=multiprocessing.get_context("spawn"))
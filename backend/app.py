@@ -1,12 +1,120 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-import tempfile, os
-from predictor import predict
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import tempfile, os, time, uuid
+from typing import Optional
+import numpy as np
+from feature_cache import FeatureCache, content_hash
+import jobs
+from results_store import ResultsStore
+from fusion import FaceScorer, FusionPipeline, TextScorer, VoiceScorer, parse_weights
+from utils_media import MediaDecodeError
+import metrics
+from serving import configure_worker_threads, preload_model, threads_configured
+from predictor import (
+    extract_features, get_feature_extractor, get_model, predict_features,
+    attention_timeline, integrated_gradients,
+)
+
+MODEL_PATH = os.environ.get(
+    "MODEL_PATH",
+    r"C:\Users\91829\OneDrive\Desktop\project truth git\model\src\models\model_final2.pth",  # adjust path if needed
+)
+PRECISION = os.environ.get("PREDICT_PRECISION", "fp32")  # "bf16" on CPUs with native bf16 support
+# Voice-activity detection before feature extraction: unset = off, 0 (gentle) to 3 (aggressive).
+# Use the same setting the training data was preprocessed with.
+VAD_AGGRESSIVENESS = int(os.environ["VAD_AGGRESSIVENESS"]) if os.environ.get("VAD_AGGRESSIVENESS") else None
+VAD_MODE = os.environ.get("VAD_MODE", "drop")  # or "compress"
+FEATURE_CACHE = FeatureCache(max_entries=int(os.environ.get("FEATURE_CACHE_SIZE", "64")))
+metrics.REGISTRY.gauge("feature_cache_entries", "Feature matrices held in the upload cache.",
+                       fn=lambda: len(FEATURE_CACHE))
+# concurrent model calls per worker; the rest wait (predict_queue_depth). torch already uses
+# several intra-op threads per call, so 1 keeps the cores busy without oversubscribing.
+INFERENCE_SLOTS = asyncio.Semaphore(int(os.environ.get("INFERENCE_SLOTS", "1")))
+
+# Asynchronous jobs (POST /jobs): uploads are spooled to JOB_DIR and processed by JOB_WORKERS
+# threads per server process from a SQLite queue that survives restarts.
+JOB_DIR = os.environ.get("JOB_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs_data"))
+JOB_UPLOADS = os.path.join(JOB_DIR, "uploads")
+JOB_STAGE_WEIGHTS = {"decode": 0.2, "vad": 0.05, "features": 0.45, "inference": 0.3}
+
+# POST /fusion: modality weights (renormalised over modalities that produced a real score)
+# and the size of the thread pool the scorers share.
+FUSION_WEIGHTS = parse_weights(os.environ.get("FUSION_WEIGHTS", "voice=0.6,face=0.25,text=0.15"))
+FUSION_WORKERS = int(os.environ.get("FUSION_WORKERS", "3"))
 
-MODEL_PATH = r"C:\Users\91829\OneDrive\Desktop\project truth git\model\src\models\model_final2.pth"  # adjust path if needed
+# Every prediction is recorded for the Reports page (GET /reports/*), keyed by the caller's
+# X-User-Id header; writes are batched by a background thread.
+RESULTS_DB = os.environ.get("RESULTS_DB", os.path.join(JOB_DIR, "results.sqlite3"))
+# Reports are scoped to the caller's X-User-Id (no header = the anonymous user ''). Callers
+# presenting this token in X-Admin-Token may read another user (`user_id`) or all users.
+REPORTS_ADMIN_TOKEN = os.environ.get("REPORTS_ADMIN_TOKEN")
+
+logger = logging.getLogger("backend")
+if os.environ.get("REQUEST_ID_LOGGING") == "1":
+    metrics.install_request_id_logging()
+
+if os.environ.get("PRELOAD_MODEL") == "1":
+    # load once here; under gunicorn --preload this runs in the master before workers fork
+    preload_model(MODEL_PATH)
 
 app = FastAPI()
 
+
+@app.on_event("startup")
+def _configure_threads():
+    # gunicorn workers are configured in post_fork; plain uvicorn (--workers N) lands here
+    if threads_configured() is None:
+        configure_worker_threads(int(os.environ.get("WEB_CONCURRENCY", "1")))
+
+
+JOBS: Optional[jobs.JobQueue] = None
+_LOOP: Optional[asyncio.AbstractEventLoop] = None  # the server loop that owns INFERENCE_SLOTS
+metrics.REGISTRY.gauge("jobs_queued", "Jobs waiting for a job worker (all server processes).",
+                       fn=lambda: JOBS.queue_depth() if JOBS else 0)
+
+
+@app.on_event("startup")
+async def _start_jobs():
+    # started per worker process (threads do not survive fork); requeues jobs a crash left behind
+    global JOBS, _LOOP
+    _LOOP = asyncio.get_running_loop()
+    os.makedirs(JOB_UPLOADS, exist_ok=True)
+    JOBS = jobs.JobQueue(jobs.JobStore(os.path.join(JOB_DIR, "jobs.sqlite3")), _run_job,
+                         workers=int(os.environ.get("JOB_WORKERS", "1")), stage_weights=JOB_STAGE_WEIGHTS)
+    JOBS.start()
+
+
+@app.on_event("shutdown")
+def _stop_jobs():
+    if JOBS is not None:
+        JOBS.stop()
+    FUSION.shutdown()
+    RESULTS.stop()
+
+
+RESULTS = ResultsStore(RESULTS_DB)
+metrics.REGISTRY.gauge("results_pending", "Prediction results waiting for the batch writer.", fn=RESULTS.pending)
+
+
+@app.on_event("startup")
+def _start_results_writer():
+    RESULTS.start()
+
+
+FUSION = FusionPipeline(
+    [VoiceScorer(lambda: get_model(MODEL_PATH), lambda: get_feature_extractor(MODEL_PATH), precision=PRECISION,
+                 vad_aggressiveness=VAD_AGGRESSIVENESS, vad_mode=VAD_MODE),
+     FaceScorer(), TextScorer()],
+    weights=FUSION_WEIGHTS, workers=FUSION_WORKERS)
+
 # Allow frontend requests
 app.add_middleware(
     CORSMiddleware,
@@ -14,18 +122,319 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Attribution-Shape", "X-Attention-Length", "X-Feature-Key", "X-Request-ID"],
 )
 
-@app.post("/predict")
-async def predict_endpoint(file: UploadFile = File(...)):
+
+def _route_label(request: Request) -> str:
+    """Metric label for a request: the route template (`/jobs/{job_id}`), never the raw URL, so
+    ids and 404 probes cannot create new series."""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match != Match.NONE:
+            return route.path
+    return "unmatched"
+
+
+@app.middleware("http")
+async def _instrument(request: Request, call_next):
+    """Request latency/in-flight metrics and a per-request trace ID (X-Request-ID, echoed back)."""
+    rid = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    token = metrics.request_id.set(rid)
+    path = _route_label(request)
+    status = "500"
+    t0 = time.perf_counter()
+    try:
+        with metrics.IN_FLIGHT.track(path=path):
+            response = await call_next(request)
+        status = str(response.status_code)
+        response.headers["X-Request-ID"] = rid
+        return response
+    finally:
+        elapsed = time.perf_counter() - t0
+        if path != "/metrics":
+            metrics.REQUEST_SECONDS.observe(elapsed, path=path)
+            logger.info("%s %s %s %.3fs", request.method, request.url.path, status, elapsed)
+        metrics.REQUESTS.inc(path=path, status=status)
+        metrics.request_id.reset(token)
+
+
+async def _run_inference(fn, *args, **kwargs):
+    """Run blocking decode/model work off the event loop, at most INFERENCE_SLOTS at a time."""
+    with metrics.QUEUE_DEPTH.track():
+        await INFERENCE_SLOTS.acquire()
+    try:
+        return await run_in_threadpool(fn, *args, **kwargs)
+    finally:
+        INFERENCE_SLOTS.release()
+
+
+def _in_inference_slot(fn, *args, **kwargs):
+    """`_run_inference` from a job worker thread: job work shares INFERENCE_SLOTS (and
+    predict_queue_depth) with the request handlers."""
+    return asyncio.run_coroutine_threadsafe(_run_inference(fn, *args, **kwargs), _LOOP).result()
+
+
+def _observe_realtime(time_map, started: float) -> None:
+    audio_seconds = time_map.original_seconds
+    metrics.INPUT_SECONDS.observe(audio_seconds)
+    if audio_seconds > 0:
+        metrics.REALTIME_FACTOR.observe((time.perf_counter() - started) / audio_seconds)
+
+
+def _features_for_upload(data: bytes, filename: str):
+    """Return (content hash, features, VAD time map); decoding and MFCC extraction run once per
+    distinct upload."""
+    key = content_hash(data)
+    entry = FEATURE_CACHE.get(key)
+    if entry is not None:
+        metrics.CACHE_EVENTS.inc(cache="features", result="hit")
+        return (key,) + entry
+    metrics.CACHE_EVENTS.inc(cache="features", result="miss")
+
     # save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
-        tmp.write(await file.read())
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as tmp:
+        tmp.write(data)
         tmp_path = tmp.name
+    try:
+        # videos/compressed audio are demuxed straight to PCM; no intermediate wav
+        feats, time_map = extract_features(tmp_path, get_feature_extractor(MODEL_PATH),
+                                           vad_aggressiveness=VAD_AGGRESSIVENESS, vad_mode=VAD_MODE,
+                                           return_time_map=True)
+    finally:
+        os.remove(tmp_path)
+    FEATURE_CACHE.put(key, feats, time_map)
+    return key, feats, time_map
+
+
+def _b64_float16(arr: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(arr, dtype="<f2").tobytes()).decode("ascii")
+
+
+@app.post("/predict")
+async def predict_endpoint(request: Request, file: UploadFile = File(...), attention: bool = False,
+                           timeline_points: int = 100, timeline_seconds: Optional[float] = None):
+    """Classify an upload. With `attention=true` the response also carries an attention
+    timeline (at most `timeline_points` bins, optionally `timeline_seconds` wide) taken from
+    the same forward pass; it is left out for a model without attention pooling."""
+    data = await file.read()
+
+    def work():
+        started = time.perf_counter()
+        key, feats, time_map = _features_for_upload(data, file.filename)
+        # run prediction
+        label, confidence, _, weights = predict_features(get_model(MODEL_PATH), feats, precision=PRECISION,
+                                                         return_attention=attention)
+        _observe_realtime(time_map, started)
+        return key, label, confidence, weights, time_map
+
+    key, label, confidence, weights, time_map = await _run_inference(work)
+    RESULTS.record("predict", label, confidence, user_id=request.headers.get("X-User-Id"), file_hash=key,
+                   filename=file.filename, media_seconds=time_map.original_seconds)
+    return _prediction_response(key, label, confidence, weights, time_map, attention,
+                                timeline_points, timeline_seconds)
+
+
+def _prediction_response(key, label, confidence, weights, time_map, attention, timeline_points,
+                         timeline_seconds):
+    response = {"prediction": label, "confidence": confidence, "feature_key": key}
+    if attention and weights is not None:  # models without attention pooling have no weights
+        response["attention_timeline"] = attention_timeline(
+            weights, get_feature_extractor(MODEL_PATH).frame_rate, max_points=min(max(timeline_points, 1), 1000),
+            bin_seconds=timeline_seconds, time_map=time_map)
+    if VAD_AGGRESSIVENESS is not None:
+        response["speech_fraction"] = round(time_map.kept_fraction, 4)
+    return response
+
+
+def _run_job(job, ctx):
+    """Job runner for POST /jobs: the /predict pipeline with per-stage and per-block progress."""
+    params = job["params"]
+    key = params["feature_key"]
+    started = time.perf_counter()
+    entry = FEATURE_CACHE.get(key)
+    if entry is None:
+        # features and inference take a slot each, so /predict requests can run in between
+        feats, time_map = _in_inference_slot(
+            extract_features, job["input_path"], get_feature_extractor(MODEL_PATH),
+            vad_aggressiveness=VAD_AGGRESSIVENESS, vad_mode=VAD_MODE, return_time_map=True, progress=ctx.report)
+        FEATURE_CACHE.put(key, feats, time_map)
+    else:
+        feats, time_map = entry
+    ctx.report("inference", 0, 1)
+    label, confidence, _, weights = _in_inference_slot(predict_features, get_model(MODEL_PATH), feats,
+                                                       precision=PRECISION, return_attention=params["attention"])
+    ctx.report("inference", 1, 1)
+    _observe_realtime(time_map, started)
+    RESULTS.record("job", label, confidence, user_id=params.get("user_id"), file_hash=key,
+                   filename=params.get("filename"), media_seconds=time_map.original_seconds,
+                   detail={"job_id": job["id"]})
+    return _prediction_response(key, label, confidence, weights, time_map, params["attention"],
+                                params["timeline_points"], params["timeline_seconds"])
+
+
+@app.post("/fusion")
+async def fusion_endpoint(request: Request, file: UploadFile = File(...), text: Optional[str] = Form(None)):
+    """Score a video (or audio) upload with every modality and fuse the results.
+
+    The upload is decoded once (audio and sampled frames in one ffmpeg pass) and the voice,
+    face and text scorers run in parallel on a shared pool; `text` is an optional transcript.
+    The response carries the fused prediction plus each modality's own score."""
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename or "")[1].lower()) as tmp:
+        while True:
+            chunk = await file.read(1 << 20)
+            if not chunk:
+                break
+            digest.update(chunk)
+            tmp.write(chunk)
+        tmp_path = tmp.name
+    try:
+        result = await _run_inference(FUSION.run, tmp_path, transcript=text,
+                                      sample_rate=get_feature_extractor(MODEL_PATH).sample_rate)
+    except (ValueError, MediaDecodeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        os.remove(tmp_path)
+    RESULTS.record("fusion", result["prediction"], result["confidence"], user_id=request.headers.get("X-User-Id"),
+                   file_hash=digest.hexdigest(), filename=file.filename, media_seconds=result["media_seconds"],
+                   detail={"weights": result["weights"]})
+    return result
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: Request, file: UploadFile = File(...), attention: bool = False,
+                     timeline_points: int = 100, timeline_seconds: Optional[float] = None):
+    """Queue an upload for asynchronous prediction; poll GET /jobs/{job_id} for progress and
+    the result (same shape as /predict). Use for long recordings instead of holding /predict open."""
+    job_id = uuid.uuid4().hex
+    path = os.path.join(JOB_UPLOADS, job_id + os.path.splitext(file.filename or "")[1].lower())
+    digest = hashlib.sha256()  # same key as content_hash(), so the feature cache is shared
+    with open(path, "wb") as out:
+        while True:
+            chunk = await file.read(1 << 20)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    JOBS.submit("predict", path, job_id=job_id, params={
+        "feature_key": digest.hexdigest(), "filename": file.filename, "attention": attention,
+        "timeline_points": timeline_points, "timeline_seconds": timeline_seconds,
+        "user_id": request.headers.get("X-User-Id"),
+    })
+    return JSONResponse(status_code=202, headers={"Location": f"/jobs/{job_id}"},
+                        content={"job_id": job_id, "status": jobs.QUEUED, "status_url": f"/jobs/{job_id}"})
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status, current stage, progress (0-1 overall and within the stage) and, once done, the result."""
+    job = JOBS.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return jobs.public_view(job)
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Cancel a job: queued jobs stop at once, running ones at their next progress report."""
+    status = JOBS.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return {"job_id": job_id, "status": status}
+
+
+def _report_user(request: Request, user_id: Optional[str], all_users: bool) -> Optional[str]:
+    """The user a report is filtered to; None (every user) only for admin callers."""
+    if user_id is None and not all_users:
+        return request.headers.get("X-User-Id") or ""  # anonymous results are stored under ''
+    token = request.headers.get("X-Admin-Token") or ""
+    if not REPORTS_ADMIN_TOKEN or not hmac.compare_digest(token, REPORTS_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="user_id and all_users need X-Admin-Token")
+    return None if all_users else user_id
+
+
+@app.get("/reports/results")
+def report_results(request: Request, label: Optional[str] = None, since: Optional[float] = None,
+                   until: Optional[float] = None, file_hash: Optional[str] = None, limit: int = 50,
+                   cursor: Optional[str] = None, user_id: Optional[str] = None, all_users: bool = False):
+    """Newest-first stored predictions for the caller (X-User-Id), filterable by label, time
+    range (unix seconds) and file hash; pass `next_cursor` back as `cursor` for the next page.
+    Admins (X-Admin-Token) may pass `user_id` or `all_users=true`."""
+    user = _report_user(request, user_id, all_users)
+    try:
+        return RESULTS.query(user_id=user, label=label, since=since, until=until,
+                             file_hash=file_hash, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/reports/summary")
+def report_summary(request: Request, since: Optional[float] = None, until: Optional[float] = None,
+                   bucket_seconds: int = 86400, user_id: Optional[str] = None, all_users: bool = False):
+    """Counts per label, mean confidence, confidence histogram and a timeline in
+    `bucket_seconds` buckets, read from hourly rollups (range edges widen to whole hours).
+    Scoped like /reports/results."""
+    return RESULTS.summary(user_id=_report_user(request, user_id, all_users), since=since, until=until,
+                           bucket_seconds=bucket_seconds)
+
+
+@app.post("/explain")
+async def explain_endpoint(file: UploadFile = File(...), encoding: str = "base64", n_steps: int = 32):
+    """Frame-by-feature attribution matrix (Integrated Gradients) plus attention weights.
+
+    `encoding=base64` (default) returns JSON with little-endian float16 arrays encoded in base64:
+    `attributions` is row-major (frames, features) with the shape in `shape`, `attention`
+    has one weight per frame. `encoding=binary` returns the attribution bytes followed by the
+    attention bytes as application/octet-stream, described by the X-Attribution-Shape and
+    X-Attention-Length headers. A model without attention pooling returns no attention: the
+    JSON omits `attention` and the binary body carries none (X-Attention-Length: 0). Features come from the same cache as /predict. When VAD is
+    enabled, frames index the speech-only audio and `time_map` (JSON only) maps it back to the
+    upload's timeline. `n_steps` (IG interpolation steps) is clamped to 1-128.
+    """
+    if encoding not in ("base64", "binary"):
+        raise HTTPException(status_code=422, detail="encoding must be 'base64' or 'binary'")
+    n_steps = min(max(n_steps, 1), 128)  # each step is a forward and backward pass
+    data = await file.read()
+
+    def work():
+        key, feats, time_map = _features_for_upload(data, file.filename)
+        model = get_model(MODEL_PATH)
+        label, confidence, _, attention = predict_features(model, feats, precision=PRECISION,
+                                                           return_attention=True)
+        target = 1 if label == "Lie" else 0
+        with metrics.stage("integrated_gradients"):
+            attributions = integrated_gradients(model, feats, target=target, n_steps=n_steps)
+        return key, label, confidence, attention, attributions, time_map
+
+    key, label, confidence, attention, attributions, time_map = await _run_inference(work)
+
+    if encoding == "binary":
+        body = np.ascontiguousarray(attributions, dtype="<f2").tobytes()
+        if attention is not None:
+            body += np.ascontiguousarray(attention, dtype="<f2").tobytes()
+        return Response(content=body, media_type="application/octet-stream", headers={
+            "X-Attribution-Shape": f"{attributions.shape[0]},{attributions.shape[1]}",
+            "X-Attention-Length": str(0 if attention is None else attention.shape[0]),
+            "X-Feature-Key": key,
+        })
 
-    # run prediction
-    label, confidence = predict(tmp_path, MODEL_PATH)
+    response = {
+        "prediction": label,
+        "confidence": confidence,
+        "feature_key": key,
+        "shape": list(attributions.shape),
+        "dtype": "float16",
+        "attributions": _b64_float16(attributions),
+    }
+    if attention is not None:
+        response["attention"] = _b64_float16(attention)
+    if VAD_AGGRESSIVENESS is not None:
+        response["time_map"] = time_map.to_dict()
+    return response
 
-    os.remove(tmp_path)
 
-    return {"prediction": label, "confidence": confidence}
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition of this worker's metrics."""
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
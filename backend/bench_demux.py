@@ -0,0 +1,115 @@
+# backend/bench_demux.py
+"""Audio extraction from video: moviepy (VideoFileClip -> wav -> librosa) vs ffmpeg audio-only pipe.
+
+    python bench_demux.py --file interview.mp4 --repeats 3
+    python bench_demux.py --seconds 600 --size 1280x720      # generates a test video with ffmpeg
+
+Each method runs in a fresh interpreter, so the reported peak RSS (this process plus its
+ffmpeg children) belongs to that method alone. Also reports how closely the two signals
+agree (correlation over the common length).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+METHODS = ("moviepy", "ffmpeg_pipe")
+
+
+def make_test_video(path: str, seconds: float, size: str) -> str:
+    from utils_media import FFMPEG_BINARY
+
+    subprocess.run([FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+                    "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30",
+                    "-f", "lavfi", "-i", "sine=frequency=220:sample_rate=44100",
+                    "-t", str(seconds), "-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac", "-ac", "2", path],
+                   check=True)
+    return path
+
+
+def _run_one(method: str, path: str, sample_rate: int, out_npy: str) -> None:
+    import resource
+
+    import numpy as np
+
+    t0 = time.perf_counter()
+    if method == "moviepy":
+        import librosa
+        from moviepy.editor import VideoFileClip
+
+        wav = path + ".bench.wav"
+        clip = VideoFileClip(path)
+        clip.audio.write_audiofile(wav, verbose=False, logger=None)
+        clip.close()
+        signal, _ = librosa.load(wav, sr=sample_rate)
+        os.remove(wav)
+    else:
+        from utils_media import decode_audio_ffmpeg
+
+        signal = decode_audio_ffmpeg(path, sample_rate)
+    elapsed = time.perf_counter() - t0
+    np.save(out_npy, signal)
+    # ru_maxrss is KiB on Linux
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_kib = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_kib / 1024, "child_peak_rss_mb": child_kib / 1024,
+                      "samples": int(len(signal))}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="video to demux; generated if omitted")
+    parser.add_argument("--seconds", type=float, default=300.0, help="length of the generated video")
+    parser.add_argument("--size", default="1280x720", help="frame size of the generated video")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--_run", nargs=3, metavar=("METHOD", "PATH", "NPY"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._run:
+        _run_one(args._run[0], args._run[1], args.sample_rate, args._run[2])
+        return
+
+    import numpy as np
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = args.file or make_test_video(os.path.join(workdir, "bench.mp4"), args.seconds, args.size)
+        results, signals = {}, {}
+        for method in args.methods:
+            runs = []
+            npy = os.path.join(workdir, f"{method}.npy")
+            for _ in range(args.repeats):
+                proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--sample-rate", str(args.sample_rate),
+                                       "--_run", method, path, npy],
+                                      cwd=os.path.dirname(os.path.abspath(__file__)),
+                                      capture_output=True, text=True, check=True)
+                runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            signals[method] = np.load(npy)
+            results[method] = {
+                "median_s": float(np.median([r["seconds"] for r in runs])),
+                "min_s": float(min(r["seconds"] for r in runs)),
+                "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+                "child_peak_rss_mb": max(r["child_peak_rss_mb"] for r in runs),
+                "samples": runs[-1]["samples"],
+            }
+        if len(signals) == 2:
+            a, b = signals["moviepy"], signals["ffmpeg_pipe"]
+            n = min(len(a), len(b))
+            results["signal_correlation"] = float(np.corrcoef(a[:n], b[:n])[0, 1]) if n > 1 else None
+            results["speedup"] = results["moviepy"]["median_s"] / results["ffmpeg_pipe"]["median_s"]
+        report = {"benchmark": "demux", "file": os.path.basename(path),
+                  "file_mb": os.path.getsize(path) / 2 ** 20, "results": results}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# backend/feature_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+
+def content_hash(data: bytes) -> str:
+    """Cache key for an upload: identical bytes always map to the same features."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class FeatureCache:
+    """Thread-safe LRU of extracted feature matrices keyed by upload content hash.
+
+    Lets /explain (and repeated /predict calls) reuse the MFCCs computed for an earlier
+    request on the same file instead of decoding and extracting again. Entries are
+    (features, time map) pairs; the time map is None unless VAD shortened the audio.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, Tuple[np.ndarray, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Any]]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, feats: np.ndarray, time_map: Any = None) -> None:
+        feats.setflags(write=False)  # shared between requests; never mutate in place
+        with self._lock:
+            self._items[key] = (feats, time_map)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
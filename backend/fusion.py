@@ -0,0 +1,236 @@
+# backend/fusion.py
+"""Multimodal fusion: decode an upload once, score it with every modality in parallel, combine.
+
+A `ModalityScorer` declares what it needs from the upload (`audio`, `frames`, `transcript`)
+and turns a `DecodedMedia` into a `ModalityScore`. `FusionPipeline.run` decodes exactly what
+the enabled scorers need in a single ffmpeg pass, fans the scorers out on one shared thread
+pool and combines their lie probabilities with configurable weights. Only the voice model
+is real today; `FaceScorer` and `TextScorer` are local stubs that report a neutral score and
+are left out of the fused result until a real model replaces them.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from metrics import stage
+from predictor import SAMPLE_RATE, features_from_signal, load_audio, predict_features
+from utils_media import decode_media_ffmpeg, ffmpeg_available, is_video
+
+FRAME_FPS = float(os.environ.get("FUSION_FRAME_FPS", "5"))
+FRAME_SIZE = (160, 120)
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """'voice=0.6,face=0.25,text=0.15' -> {'voice': 0.6, 'face': 0.25, 'text': 0.15}."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, value = item.partition("=")
+        weights[name.strip()] = float(value)
+    return weights
+
+
+@dataclass
+class ModalityScore:
+    modality: str
+    label: str
+    confidence: float  # % confidence in `label`, as /predict reports it
+    lie_probability: float
+    stub: bool = False
+    seconds: float = 0.0
+    detail: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {"prediction": self.label, "confidence": round(self.confidence, 2),
+               "lie_probability": round(self.lie_probability, 4), "seconds": round(self.seconds, 4)}
+        if self.stub:
+            out["stub"] = True
+        out.update(self.detail)
+        return out
+
+
+class DecodedMedia:
+    """The decoded parts of one upload, shared read-only by every scorer."""
+
+    def __init__(self, path: str, sample_rate: int = SAMPLE_RATE, transcript: Optional[str] = None):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.transcript = transcript
+        self.audio: Optional[np.ndarray] = None
+        self.frames: Optional[np.ndarray] = None
+
+    @property
+    def duration(self) -> float:
+        return 0.0 if self.audio is None else len(self.audio) / self.sample_rate
+
+    def decode(self, needs: Iterable[str]) -> "DecodedMedia":
+        needs = set(needs)
+        want_frames = "frames" in needs and is_video(self.path)
+        with stage("decode_media"):
+            if want_frames and ffmpeg_available():
+                self.audio, self.frames = decode_media_ffmpeg(self.path, self.sample_rate, FRAME_FPS, FRAME_SIZE)
+            elif "audio" in needs:
+                self.audio = load_audio(self.path, self.sample_rate)
+        return self
+
+
+class ModalityScorer:
+    """Interface for one modality. Subclasses set `name` and `needs` and implement `score`,
+    which must be thread-safe and treat the media as read-only."""
+
+    name = "modality"
+    needs: frozenset = frozenset()
+    stub = False
+
+    def available(self, media: DecodedMedia) -> bool:
+        """False when the upload lacks this modality (no frames in an audio file, no transcript)."""
+        return True
+
+    def score(self, media: DecodedMedia) -> ModalityScore:
+        raise NotImplementedError
+
+
+def _label(lie_probability: float, threshold: float):
+    if lie_probability >= threshold:
+        return "Lie", lie_probability * 100
+    return "Truth", (1 - lie_probability) * 100
+
+
+class VoiceScorer(ModalityScorer):
+    """The BiLSTM voice model on the decoded audio, with the serving feature front end."""
+
+    name = "voice"
+    needs = frozenset({"audio"})
+
+    def __init__(self, get_model: Callable[[], Any], get_extractor: Callable[[], Any], precision: str = "fp32",
+                 vad_aggressiveness: Optional[int] = None, vad_mode: str = "drop"):
+        self.get_model = get_model
+        self.get_extractor = get_extractor
+        self.precision = precision
+        self.vad_aggressiveness = vad_aggressiveness
+        self.vad_mode = vad_mode
+
+    def available(self, media: DecodedMedia) -> bool:
+        return media.audio is not None and len(media.audio) > 0
+
+    def score(self, media: DecodedMedia) -> ModalityScore:
+        extractor = self.get_extractor()
+        if extractor.sample_rate != media.sample_rate:
+            raise ValueError(f"audio decoded at {media.sample_rate} Hz, extractor expects {extractor.sample_rate} Hz")
+        feats, time_map = features_from_signal(media.audio, extractor, self.vad_aggressiveness, self.vad_mode)
+        label, confidence, lie_prob, _ = predict_features(self.get_model(), feats, precision=self.precision)
+        detail = {}
+        if self.vad_aggressiveness is not None:
+            detail["speech_fraction"] = round(time_map.kept_fraction, 4)
+        return ModalityScore(self.name, label, confidence, lie_prob, detail=detail)
+
+
+class FaceScorer(ModalityScorer):
+    """Stub face model: consumes the shared frames and reports a neutral score."""
+
+    name = "face"
+    needs = frozenset({"frames"})
+    stub = True
+
+    def available(self, media: DecodedMedia) -> bool:
+        return media.frames is not None and len(media.frames) > 0
+
+    def score(self, media: DecodedMedia) -> ModalityScore:
+        # mean absolute frame difference: a cheap stand-in that proves frames reach the scorer
+        motion = float(np.abs(np.diff(media.frames.astype(np.int16), axis=0)).mean()) if len(media.frames) > 1 else 0.0
+        return ModalityScore(self.name, "Truth", 50.0, 0.5, stub=True,
+                             detail={"frames": int(len(media.frames)), "motion": round(motion, 3)})
+
+
+class TextScorer(ModalityScorer):
+    """Stub transcript model: reports a neutral score for a supplied transcript."""
+
+    name = "text"
+    needs = frozenset({"transcript"})
+    stub = True
+
+    def available(self, media: DecodedMedia) -> bool:
+        return bool(media.transcript and media.transcript.strip())
+
+    def score(self, media: DecodedMedia) -> ModalityScore:
+        return ModalityScore(self.name, "Truth", 50.0, 0.5, stub=True,
+                             detail={"words": len(media.transcript.split())})
+
+
+class FusionPipeline:
+    """Fan-out of `scorers` over one decode, combined by `weights` (renormalised over the
+    modalities that produced a real score)."""
+
+    def __init__(self, scorers: List[ModalityScorer], weights: Dict[str, float], workers: Optional[int] = None,
+                 timeout: float = 300.0, threshold: float = 0.5):
+        unknown = set(weights) - {s.name for s in scorers}
+        if unknown:
+            raise ValueError(f"weights given for unknown modalities: {sorted(unknown)}")
+        self.scorers = scorers
+        self.weights = weights
+        self.timeout = timeout
+        self.threshold = threshold
+        self._workers = workers or len(scorers)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def needs(self) -> frozenset:
+        return frozenset().union(*(s.needs for s in self.scorers))
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # created on first use, so it belongs to the (forked) worker process that runs it
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="fusion")
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+    def _timed(self, scorer: ModalityScorer, media: DecodedMedia) -> ModalityScore:
+        t0 = time.perf_counter()
+        with stage(f"score_{scorer.name}"):
+            result = scorer.score(media)
+        result.seconds = time.perf_counter() - t0
+        return result
+
+    def run(self, path: str, transcript: Optional[str] = None, sample_rate: int = SAMPLE_RATE) -> Dict[str, Any]:
+        media = DecodedMedia(path, sample_rate, transcript).decode(self.needs)
+        pool = self._executor()
+        futures = {s.name: pool.submit(self._timed, s, media) for s in self.scorers if s.available(media)}
+        modalities: Dict[str, Dict[str, Any]] = {}
+        scores: Dict[str, ModalityScore] = {}
+        for scorer in self.scorers:
+            future = futures.get(scorer.name)
+            if future is None:
+                modalities[scorer.name] = {"skipped": "not present in this upload"}
+                continue
+            try:
+                scores[scorer.name] = future.result(timeout=self.timeout)
+                modalities[scorer.name] = scores[scorer.name].to_dict()
+            except Exception as e:  # one failing modality must not sink the others
+                modalities[scorer.name] = {"error": f"{type(e).__name__}: {e}"}
+
+        used = {name: self.weights.get(name, 0.0) for name, s in scores.items() if not s.stub}
+        used = {name: w for name, w in used.items() if w > 0}
+        total = sum(used.values())
+        if not total:
+            raise ValueError("no modality produced a usable score for this upload")
+        lie_score = sum(scores[name].lie_probability * w for name, w in used.items()) / total
+        label, confidence = _label(lie_score, self.threshold)
+        return {
+            "prediction": label,
+            "confidence": confidence,
+            "lie_score": round(lie_score, 4),
+            "weights": {name: round(w / total, 4) for name, w in used.items()},
+            "modalities": modalities,
+            "media_seconds": round(media.duration, 3),
+        }
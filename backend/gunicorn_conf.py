@@ -0,0 +1,24 @@
+# backend/gunicorn_conf.py
+# Prefork serving: gunicorn -c gunicorn_conf.py app:app
+#
+# preload_app imports app.py (and with it the model) once in the master; workers are then
+# forked and share the weights copy-on-write from shared memory. Each worker sizes its torch
+# thread pool to cores // workers so the pools do not oversubscribe the machine.
+import os
+
+from serving import configure_worker_threads, worker_threads
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "0")) or max(1, worker_threads(1) // 2)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.environ.get("WORKER_TIMEOUT", "300"))  # long recordings
+
+# read by app.py at import time (in the master, because of preload_app)
+os.environ.setdefault("PRELOAD_MODEL", "1")
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+
+def post_fork(server, worker):
+    threads = configure_worker_threads(server.cfg.workers)
+    server.log.info("worker %s: torch threads=%d", worker.pid, threads)
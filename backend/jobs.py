@@ -0,0 +1,327 @@
+# backend/jobs.py
+# Persistent job queue for long recordings: SQLite (WAL) holds the jobs, a small pool of worker
+# threads in each process claims them. No broker; several server processes can share one
+# database because claiming is a single write transaction.
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    input_path TEXT,
+    stage TEXT,
+    stage_progress REAL NOT NULL DEFAULT 0,
+    progress REAL NOT NULL DEFAULT 0,
+    detail TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobStore:
+    """SQLite persistence for jobs; one connection per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # a connection must never be used across fork (gunicorn --preload): reopen in the child
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("params", "detail", "result"):
+            if job.get(key):
+                job[key] = json.loads(job[key])
+        return job
+
+    def create(self, kind: str, input_path: Optional[str], params: Optional[Dict[str, Any]] = None,
+               job_id: Optional[str] = None) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, status, params, input_path, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(params or {}), input_path, time.time()))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._row(self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and return it."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                               (QUEUED,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, attempts = attempts + 1, started_at = ?, "
+                "heartbeat_at = ?, stage = NULL, stage_progress = 0, progress = 0 WHERE id = ?",
+                (RUNNING, owner, now, now, row["id"]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def update_progress(self, job_id: str, stage: str, stage_progress: float, progress: float,
+                        detail: Optional[Dict[str, Any]] = None) -> bool:
+        """Record progress; returns True if cancellation has been requested meanwhile."""
+        conn = self._conn()
+        conn.execute(
+            "UPDATE jobs SET stage = ?, stage_progress = ?, progress = ?, detail = ?, heartbeat_at = ? "
+            "WHERE id = ? AND status = ?",
+            (stage, stage_progress, progress, json.dumps(detail) if detail else None, time.time(), job_id, RUNNING))
+        row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def heartbeat(self, job_ids: Sequence[str]) -> None:
+        if job_ids:
+            now = time.time()
+            self._conn().executemany("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                                     [(now, job_id, RUNNING) for job_id in job_ids])
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, "
+            "progress = CASE WHEN ? = 'done' THEN 1.0 ELSE progress END WHERE id = ?",
+            (status, None if result is None else json.dumps(result), error, time.time(), status, job_id))
+
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a queued job at once, flag a running one; returns the resulting status."""
+        conn = self._conn()
+        conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                     (CANCELLED, time.time(), job_id, QUEUED))
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row else None
+
+    def requeue_stale(self, stale_seconds: float, max_attempts: int) -> int:
+        """Recover jobs whose worker died (no heartbeat for `stale_seconds`): requeue them, or
+        fail them once they have used `max_attempts`."""
+        conn = self._conn()
+        cutoff = time.time() - stale_seconds
+        conn.execute("UPDATE jobs SET status = ?, finished_at = ?, error = 'worker lost; retries exhausted' "
+                     "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                     (FAILED, time.time(), RUNNING, cutoff, max_attempts))
+        cur = conn.execute("UPDATE jobs SET status = ?, owner = NULL WHERE status = ? AND heartbeat_at < ?",
+                           (QUEUED, RUNNING, cutoff))
+        return cur.rowcount
+
+    def count(self, status: str) -> int:
+        row = self._conn().execute("SELECT COUNT(*) AS n FROM jobs WHERE status = ?", (status,)).fetchone()
+        return int(row["n"])
+
+    def purge(self, older_than_seconds: float) -> List[str]:
+        """Delete finished jobs older than the cutoff; returns their leftover input paths."""
+        conn = self._conn()
+        cutoff = time.time() - older_than_seconds
+        marks = ",".join("?" * len(FINISHED))
+        rows = conn.execute(f"SELECT input_path FROM jobs WHERE status IN ({marks}) AND finished_at < ?",
+                            (*FINISHED, cutoff)).fetchall()
+        conn.execute(f"DELETE FROM jobs WHERE status IN ({marks}) AND finished_at < ?", (*FINISHED, cutoff))
+        return [r["input_path"] for r in rows if r["input_path"]]
+
+
+class JobContext:
+    """Handed to the runner: reports stage/segment progress and raises `JobCancelled` when the
+    job has been cancelled. Database writes are throttled to one per `min_interval` seconds
+    (stage changes are always written)."""
+
+    def __init__(self, store: JobStore, job: Dict[str, Any], stage_weights: Dict[str, float],
+                 min_interval: float = 0.5):
+        self.store = store
+        self.job = job
+        self.stage_weights = stage_weights
+        self.min_interval = min_interval
+        self._stage = None
+        self._last_write = 0.0
+        self._done_weight = 0.0
+
+    def report(self, stage: str, done: int, total: int) -> None:
+        if stage != self._stage:
+            if self._stage is not None:
+                self._done_weight += self.stage_weights.get(self._stage, 0.0)
+            self._stage = stage
+            force = True
+        else:
+            force = done >= total
+        now = time.monotonic()
+        if not force and now - self._last_write < self.min_interval:
+            return
+        self._last_write = now
+        fraction = done / total if total else 1.0
+        weight_total = sum(self.stage_weights.values()) or 1.0
+        progress = min(1.0, (self._done_weight + fraction * self.stage_weights.get(stage, 0.0)) / weight_total)
+        if self.store.update_progress(self.job["id"], stage, fraction, progress, {"done": done, "total": total}):
+            raise JobCancelled(self.job["id"])
+
+
+class JobQueue:
+    """Worker threads that claim jobs from a `JobStore` and run `runner(job, ctx)`.
+
+    `runner` returns the JSON-serialisable result. On start, and every `stale_seconds / 2`,
+    running jobs whose heartbeat stopped (server crash or restart) are requeued, so nothing
+    submitted is lost; a job is failed after `max_attempts` claims.
+    """
+
+    def __init__(self, store: JobStore, runner: Callable[[Dict[str, Any], JobContext], Any],
+                 workers: int = 1, stage_weights: Optional[Dict[str, float]] = None,
+                 poll_seconds: float = 1.0, stale_seconds: float = 60.0, max_attempts: int = 3,
+                 retention_seconds: float = 7 * 24 * 3600):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.stage_weights = stage_weights or {}
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: Dict[str, float] = {}
+        self._running_lock = threading.Lock()
+
+    def start(self) -> None:
+        for path in self.store.purge(self.retention_seconds):
+            _remove_quietly(path)
+        self.store.requeue_stale(self.stale_seconds, self.max_attempts)
+        targets = [self._heartbeat_loop] + [self._worker_loop] * self.workers
+        for i, target in enumerate(targets):
+            thread = threading.Thread(target=target, name=f"jobs-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def submit(self, kind: str, input_path: Optional[str], params: Optional[Dict[str, Any]] = None,
+               job_id: Optional[str] = None) -> str:
+        job_id = self.store.create(kind, input_path, params, job_id=job_id)
+        self._wake.set()
+        return job_id
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        job = self.store.get(job_id)
+        status = self.store.request_cancel(job_id)
+        if job and job["status"] == QUEUED and status == CANCELLED:
+            _remove_quietly(job["input_path"])
+        return status
+
+    def queue_depth(self) -> int:
+        return self.store.count(QUEUED)
+
+    def _heartbeat_loop(self) -> None:
+        interval = max(self.stale_seconds / 4.0, 0.5)
+        last_recovery = time.monotonic()
+        while not self._stop.wait(interval):
+            with self._running_lock:
+                running = list(self._running)
+            self.store.heartbeat(running)
+            if time.monotonic() - last_recovery >= self.stale_seconds / 2.0:
+                if self.store.requeue_stale(self.stale_seconds, self.max_attempts):
+                    self._wake.set()
+                last_recovery = time.monotonic()
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            job = self.store.claim(self.owner)
+            if job is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        with self._running_lock:
+            self._running[job["id"]] = time.time()
+        ctx = JobContext(self.store, job, self.stage_weights)
+        try:
+            if job.get("cancel_requested"):
+                raise JobCancelled(job["id"])
+            result = self.runner(job, ctx)
+            self.store.finish(job["id"], DONE, result=result)
+        except JobCancelled:
+            self.store.finish(job["id"], CANCELLED)
+        except Exception as e:  # the job fails, the worker keeps going
+            self.store.finish(job["id"], FAILED, error=f"{type(e).__name__}: {e}")
+        finally:
+            with self._running_lock:
+                self._running.pop(job["id"], None)
+            _remove_quietly(job["input_path"])
+
+
+def _remove_quietly(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Client-facing subset of a job row."""
+    view = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "stage_progress": round(job["stage_progress"] or 0.0, 4),
+        "progress": round(job["progress"] or 0.0, 4),
+        "detail": job["detail"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == DONE:
+        view["result"] = job["result"]
+    if job["status"] == FAILED:
+        view["error"] = job["error"]
+    return view
@@ -0,0 +1,146 @@
+# backend/load_test.py
+"""Closed-loop load test for /predict.
+
+    python load_test.py --url http://127.0.0.1:8000/predict --concurrency 8 --requests 200 \
+        --workers 4 --out load_test.json
+
+Each of `--concurrency` client threads posts the same clip back to back; the report gives
+throughput, latency percentiles and throughput per core, so a gunicorn --preload deployment
+can be compared against a single process or uvicorn --workers at the same core count.
+Uploads differ by a trailing comment byte per request unless `--same-body` is given, so the
+feature cache does not turn the run into a cache benchmark. Standard library only.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import threading
+import time
+import urllib.request
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+
+def synthetic_wav(seconds: float = 3.0, sr: int = 16000) -> bytes:
+    """Voiced-like test clip: a 140 Hz tone with a few harmonics, 16-bit mono PCM."""
+    n = int(seconds * sr)
+    frames = bytearray()
+    for i in range(n):
+        t = i / sr
+        v = sum(math.sin(2 * math.pi * 140 * k * t) / k for k in range(1, 5))
+        frames += int(max(-1.0, min(1.0, 0.3 * v)) * 32767).to_bytes(2, "little", signed=True)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(bytes(frames))
+    return buf.getvalue()
+
+
+def _multipart(payload: bytes, filename: str):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _post(url: str, payload: bytes, filename: str, timeout: float) -> float:
+    body, content_type = _multipart(payload, filename)
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        resp.read()
+    return time.perf_counter() - t0
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return None
+    idx = min(len(sorted_vals) - 1, max(0, int(math.ceil(q / 100.0 * len(sorted_vals))) - 1))
+    return sorted_vals[idx]
+
+
+def run(url, payload, filename, concurrency, total, timeout=120.0, same_body=False, warmup=2):
+    for _ in range(warmup):
+        _post(url, payload, filename, timeout)
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            # RIFF readers ignore trailing bytes; this only changes the upload's content hash
+            body = payload if same_body else payload + i.to_bytes(4, "little")
+            try:
+                dt = _post(url, body, filename, timeout)
+                with lock:
+                    latencies.append(dt)
+            except Exception as e:  # keep going, report the count
+                with lock:
+                    errors.append(repr(e))
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "concurrency": concurrency,
+        "wall_s": wall,
+        "throughput_rps": len(latencies) / wall if wall > 0 else 0.0,
+        "latency_p50_s": _percentile(latencies, 50),
+        "latency_p95_s": _percentile(latencies, 95),
+        "latency_p99_s": _percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000/predict")
+    parser.add_argument("--file", help="audio/video file to upload (default: synthetic 3 s wav)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--cores", type=int, default=os.cpu_count(), help="cores available to the server")
+    parser.add_argument("--workers", type=int, default=None, help="server worker count, recorded in the report")
+    parser.add_argument("--same-body", action="store_true", help="send identical uploads (exercises the cache)")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            payload = f.read()
+        filename = os.path.basename(args.file)
+    else:
+        payload, filename = synthetic_wav(), "synthetic.wav"
+
+    results = run(args.url, payload, filename, args.concurrency, args.requests,
+                  timeout=args.timeout, same_body=args.same_body)
+    results["cores"] = args.cores
+    results["server_workers"] = args.workers
+    results["throughput_rps_per_core"] = results["throughput_rps"] / max(args.cores or 1, 1)
+    report = {"benchmark": "load_test", "url": args.url, "host": platform.platform(), "results": results}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
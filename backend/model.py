@@ -0,0 +1,28 @@
+# backend/model.py
+import torch
+import torch.nn as nn
+
+
+# -----------------------------
+# Model Definition (BiLSTM + Attention)
+# -----------------------------
+class BiLSTM_Attention(nn.Module):
+    def __init__(self, input_size=39, hidden_size=256, num_classes=2):
+        super(BiLSTM_Attention, self).__init__()
+        self.lstm = nn.LSTM(input_size, hidden_size, bidirectional=True, batch_first=True)
+        self.attention = nn.Linear(hidden_size * 2, 1)
+        self.classifier = nn.Sequential(
+            nn.Linear(hidden_size * 2, 256),
+            nn.ReLU(),
+            nn.Linear(256, num_classes)
+        )
+
+    def forward(self, x, return_attention=False):
+        lstm_out, _ = self.lstm(x)  # (batch, seq_len, hidden*2)
+        attn_weights = torch.softmax(self.attention(lstm_out), dim=1)  # (batch, seq_len, 1)
+        context = torch.sum(attn_weights * lstm_out, dim=1)  # Weighted sum
+        out = self.classifier(context)
+        if return_attention:
+            # the weights are already computed for pooling; returning them is free
+            return out, attn_weights.squeeze(-1)  # (batch, seq_len)
+        return out
@@ -1,56 +1,146 @@
 # backend/predictor.py
-import torch
-import torch.nn as nn
+# torch, librosa, moviepy and pydub are imported inside the functions that need them:
+# importing this module (uvicorn worker boot, tests) stays cheap.
+from __future__ import annotations
+
 import numpy as np
-import librosa
 import os
-from moviepy.editor import VideoFileClip
-from pydub import AudioSegment
+import sys
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+from metrics import CACHE_EVENTS, stage
+from utils_media import decode_audio_ffmpeg, ffmpeg_available
+
+if TYPE_CHECKING:
+    import torch.nn as nn
+
+# The feature extractor is shared with training; it lives in the Voice model package.
+VOICE_MODEL_ROOT = os.environ.get(
+    "VOICE_MODEL_ROOT",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Voice model"),
+)
+
+
+def _voice_model():
+    """Make the Voice model package (`src.*`) importable."""
+    if VOICE_MODEL_ROOT not in sys.path:
+        sys.path.append(VOICE_MODEL_ROOT)
+
+
+def _feature_extractor_cls():
+    _voice_model()
+    from src.features.extractor import FeatureExtractor
+    return FeatureExtractor
 
 # -----------------------------
-# 1. Model Definition (BiLSTM + Attention)
+# 1. Model Definition (BiLSTM + Attention) lives in model.py so that importing
+#    this module does not import torch; it is loaded on first use.
 # -----------------------------
-class BiLSTM_Attention(nn.Module):
-    def __init__(self, input_size=39, hidden_size=256, num_classes=2):
-        super(BiLSTM_Attention, self).__init__()
-        self.lstm = nn.LSTM(input_size, hidden_size, bidirectional=True, batch_first=True)
-        self.attention = nn.Linear(hidden_size * 2, 1)
-        self.classifier = nn.Sequential(
-            nn.Linear(hidden_size * 2, 256),
-            nn.ReLU(),
-            nn.Linear(256, num_classes)
-        )
-
-    def forward(self, x):
-        lstm_out, _ = self.lstm(x)  # (batch, seq_len, hidden*2)
-        attn_weights = torch.softmax(self.attention(lstm_out), dim=1)  # (batch, seq_len, 1)
-        context = torch.sum(attn_weights * lstm_out, dim=1)  # Weighted sum
-        out = self.classifier(context)
-        return out
+def __getattr__(name: str):
+    if name == "BiLSTM_Attention":
+        from model import BiLSTM_Attention
+        return BiLSTM_Attention
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # -----------------------------
 # 2. Load Model
 # -----------------------------
-def load_model(model_path: str) -> nn.Module:
-    model = BiLSTM_Attention()
+def _load_bundle(model_path: str):
+    """(model, feature extractor) for a checkpoint.
+
+    Training checkpoints (`model_state_dict` + `model_config`) rebuild the `RNNClassifier`
+    they were trained as, load strictly and carry the extractor of their HDF5 under
+    `feature_extractor`. Plain state dicts, like the original model_final2.pth, are the legacy
+    `BiLSTM_Attention` served with the legacy backend features.
+    """
+    import torch
+
+    FeatureExtractor = _feature_extractor_cls()
     state = torch.load(model_path, map_location="cpu")
-    model.load_state_dict(state, strict=False)
+    if isinstance(state, dict) and "model_config" in state:
+        from src.models.ernn import RNNClassifier, RNNConfig
+
+        model = RNNClassifier(RNNConfig(**state["model_config"]))
+        model.load_state_dict(state["model_state_dict"], strict=True)
+        extractor_state = state.get("feature_extractor")
+    else:
+        from model import BiLSTM_Attention
+
+        if isinstance(state, dict) and "model_state_dict" in state:
+            state = state["model_state_dict"]
+        model = BiLSTM_Attention()
+        model.load_state_dict(state, strict=False)
+        extractor_state = None
     model.eval()
-    return model
+    if extractor_state:
+        extractor = FeatureExtractor.from_dict(extractor_state)
+    else:
+        extractor = FeatureExtractor.legacy_backend()
+    return model, extractor
+
+
+def load_model(model_path: str) -> nn.Module:
+    return _load_bundle(model_path)[0]
+
+
+_MODELS: Dict[str, tuple] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def _get_bundle(model_path: str):
+    bundle = _MODELS.get(model_path)
+    if bundle is None:
+        with _MODELS_LOCK:
+            bundle = _MODELS.get(model_path)
+            if bundle is None:
+                CACHE_EVENTS.inc(cache="model", result="miss")
+                with stage("model_load"):
+                    bundle = _load_bundle(model_path)
+                _MODELS[model_path] = bundle
+                return bundle
+    CACHE_EVENTS.inc(cache="model", result="hit")
+    return bundle
+
+
+def get_model(model_path: str) -> nn.Module:
+    """Load a model once per process and reuse it for every request."""
+    return _get_bundle(model_path)[0]
+
+
+def get_feature_extractor(model_path: str):
+    """The `FeatureExtractor` that matches the model at `model_path` (built once per process,
+    with its window, mel basis and DCT matrix precomputed)."""
+    return _get_bundle(model_path)[1]
 
 # -----------------------------
 # 3. Handle Any File Type → WAV
 # -----------------------------
 def convert_to_wav(input_path: str) -> str:
+    with stage("convert_to_wav"):
+        return _convert_to_wav(input_path)
+
+
+def _temp_wav_path() -> str:
+    fd, path = tempfile.mkstemp(suffix=".wav")  # unique per call; requests run concurrently
+    os.close(fd)
+    return path
+
+
+def _convert_to_wav(input_path: str) -> str:
     ext = os.path.splitext(input_path)[1].lower()
-    temp_wav = "temp_audio.wav"
 
     if ext in [".mp4", ".avi", ".mov", ".mkv"]:
+        from moviepy.editor import VideoFileClip
+        temp_wav = _temp_wav_path()
         clip = VideoFileClip(input_path)
         clip.audio.write_audiofile(temp_wav, verbose=False, logger=None)
         return temp_wav
 
     if ext in [".mp3", ".ogg", ".flac"]:
+        from pydub import AudioSegment
+        temp_wav = _temp_wav_path()
         audio = AudioSegment.from_file(input_path)
         audio.export(temp_wav, format="wav")
         return temp_wav
@@ -63,42 +153,126 @@ def convert_to_wav(input_path: str) -> str:
 # -----------------------------
 # 4. Audio → Feature Extraction (MFCC + Δ + ΔΔ = 39 features)
 # -----------------------------
-def extract_features(file_path: str, n_mfcc: int = 13) -> np.ndarray:
-    y, sr = librosa.load(file_path, sr=16000)
+# legacy front end; checkpoints with their own extractor expose `extractor.frame_rate`
+SAMPLE_RATE = 16000
+# 'hq' (soxr, as librosa.load always used), 'polyphase' (cached FIR) or 'fast'; see src.preprocess.resample
+RESAMPLE_QUALITY = os.environ.get("RESAMPLE_QUALITY", "hq")
+HOP_LENGTH = 512
+FRAME_RATE = SAMPLE_RATE / HOP_LENGTH  # feature frames per second
+
+
+def extract_features(file_path: str, extractor=None, vad_aggressiveness: Optional[int] = None,
+                     vad_mode: str = "drop", return_time_map: bool = False,
+                     progress: Optional[Callable[[str, int, int], None]] = None):
+    """(time_steps, features) model input for an audio file.
+
+    `extractor` should come from `get_feature_extractor(model_path)`; the default is the
+    legacy backend front end (13 MFCC + Δ + ΔΔ = 39 features). With `vad_aggressiveness`
+    (0-3) silence and room noise are removed before the MFCCs; `return_time_map=True` also
+    returns the `TimeMap` from processed audio back to the upload's timeline.
+    `progress(stage, done, total)` is called for the decode, vad and features stages; the
+    features stage reports every block of STFT frames.
+    """
+    if extractor is None:
+        extractor = _legacy_extractor()
+    if progress is not None:
+        progress("decode", 0, 1)
+    y = load_audio(file_path, extractor.sample_rate)
+    if progress is not None:
+        progress("decode", 1, 1)
+    feats, time_map = features_from_signal(y, extractor, vad_aggressiveness, vad_mode, progress)
+    return (feats, time_map) if return_time_map else feats
+
+
+def features_from_signal(y: np.ndarray, extractor=None, vad_aggressiveness: Optional[int] = None,
+                         vad_mode: str = "drop", progress: Optional[Callable[[str, int, int], None]] = None):
+    """(features, time_map) for an already decoded mono signal at `extractor.sample_rate`;
+    the VAD and MFCC half of `extract_features`."""
+    def report(stage_name, done, total):
+        if progress is not None:
+            progress(stage_name, done, total)
+
+    if extractor is None:
+        extractor = _legacy_extractor()
+    _voice_model()
+    from src.features.vad import TimeMap, VADConfig, apply_vad
+
+    if vad_aggressiveness is None:
+        time_map = TimeMap.identity(len(y), extractor.sample_rate)
+    else:
+        report("vad", 0, 1)
+        with stage("vad"):
+            y, time_map = apply_vad(y, extractor.sample_rate,
+                                    VADConfig(aggressiveness=vad_aggressiveness, mode=vad_mode))
+        report("vad", 1, 1)
+
+    with stage("extract_features"):
+        feats = extractor.transform(y, progress=lambda done, total: report("features", done, total))
+    return feats, time_map
+
+
+def load_audio(file_path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Mono float32 signal at `sample_rate` for any supported upload.
+
+    Videos and compressed audio are demuxed by ffmpeg straight to PCM in memory (audio stream
+    only, no video decoding, no intermediate wav). WAV files are read and resampled by
+    the training pipeline's loader at `RESAMPLE_QUALITY`; hosts without ffmpeg run
+    `convert_to_wav` first.
+    """
+    _voice_model()
+    from src.preprocess.resample import load_resampled
 
-    # Base MFCCs
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext != ".wav" and ffmpeg_available():
+        with stage("load_audio"):
+            return decode_audio_ffmpeg(file_path, sample_rate)
+    wav_path = convert_to_wav(file_path)
+    try:
+        with stage("load_audio"):
+            y = load_resampled(wav_path, sample_rate, RESAMPLE_QUALITY)
+    finally:
+        if wav_path != file_path:
+            os.remove(wav_path)
+    return y
 
-    # Delta (1st derivative)
-    delta = librosa.feature.delta(mfcc)
 
-    # Delta-Delta (2nd derivative)
-    delta2 = librosa.feature.delta(mfcc, order=2)
+_LEGACY_EXTRACTOR = None
 
-    # Stack them: [mfcc; delta; delta2] → (39, time_steps)
-    combined = np.vstack([mfcc, delta, delta2])
 
-    # Transpose to shape (time_steps, 39) to match training data
-    return combined.T
+def _legacy_extractor():
+    global _LEGACY_EXTRACTOR
+    if _LEGACY_EXTRACTOR is None:
+        _LEGACY_EXTRACTOR = _feature_extractor_cls().legacy_backend()
+    return _LEGACY_EXTRACTOR
 
 # -----------------------------
 # 5. Prediction Function
 # -----------------------------
-def predict(file_path: str, model_path: str, threshold: float = 0.5):
-    # Convert to wav if needed
-    wav_path = convert_to_wav(file_path)
+def predict_features(model: nn.Module, feats: np.ndarray, threshold: float = 0.5,
+                     precision: str = "fp32", return_attention: bool = False
+                     ) -> Tuple[str, float, float, Optional[np.ndarray]]:
+    """Classify a (time_steps, 39) feature matrix.
 
-    # Load model
-    model = load_model(model_path)
+    Returns (label, confidence %, lie probability, attention); attention is the per-frame
+    weight vector (time_steps,) from the same forward pass when `return_attention`, else None.
+    It is also None for a model without attention pooling (`with_attention=False`).
+    """
+    import torch
 
-    # Extract features
-    feats = extract_features(wav_path)   # shape: (time_steps, 39)
     x = torch.tensor(feats, dtype=torch.float32).unsqueeze(0)  # (1, seq_len, 39)
 
-    # Forward pass
+    # Forward pass ("bf16" runs the LSTM/Linear layers under CPU autocast)
+    if precision not in ("fp32", "bf16"):
+        raise ValueError(f"Unknown precision: {precision}")
+    attention = None
+    with stage("forward"), torch.no_grad(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=precision == "bf16"):
+        if return_attention:
+            output, weights = model(x, return_attention=True)
+            attention = None if weights is None else weights[0].float().numpy()
+        else:
+            output = model(x)
     with torch.no_grad():
-        output = model(x)
-        probs = torch.softmax(output, dim=1)[0]
+        probs = torch.softmax(output.float(), dim=1)[0]
         lie_prob = probs[1].item()
 
     # Decision
@@ -109,4 +283,68 @@ def predict(file_path: str, model_path: str, threshold: float = 0.5):
         label = "Truth"
         confidence = (1 - lie_prob) * 100
 
+    return label, confidence, lie_prob, attention
+
+
+def predict(file_path: str, model_path: str, threshold: float = 0.5, precision: str = "fp32"):
+    # Load model and its feature extractor
+    model = get_model(model_path)
+
+    # Decode (any format) and extract features
+    feats = extract_features(file_path, get_feature_extractor(model_path))   # shape: (time_steps, 39)
+
+    label, confidence, _, _ = predict_features(model, feats, threshold, precision)
     return label, confidence
+
+# -----------------------------
+# 6. Explanations
+# -----------------------------
+def attention_timeline(weights: np.ndarray, frame_rate: float, max_points: int = 100,
+                       bin_seconds: Optional[float] = None, time_map=None) -> Dict[str, object]:
+    """Downsample per-frame attention to at most `max_points` bins for a response.
+
+    Each bin holds the attention mass (sum of weights) of its frames, so bins stay comparable
+    and the series still sums to 1. `bin_seconds` requests a coarser fixed resolution
+    (e.g. 1.0 for a per-second timeline); the `max_points` bound always wins. With a VAD
+    `time_map`, bin start times refer to the original recording rather than the processed audio.
+    """
+    n = len(weights)
+    frames_per_bin = max(1, -(-n // max(max_points, 1)))
+    if bin_seconds:
+        frames_per_bin = max(frames_per_bin, int(round(bin_seconds * frame_rate)))
+    n_bins = -(-n // frames_per_bin)
+    padded = np.zeros(n_bins * frames_per_bin, dtype=np.float32)
+    padded[:n] = weights
+    mass = padded.reshape(n_bins, frames_per_bin).sum(axis=1)
+    starts = np.arange(n_bins) * frames_per_bin / frame_rate
+    if time_map is not None:
+        starts = time_map.to_original_seconds(starts)
+    return {
+        "bin_seconds": frames_per_bin / frame_rate,
+        "start_seconds": np.round(starts, 3).tolist(),
+        "weights": mass.round(5).tolist(),
+    }
+
+
+def integrated_gradients(model: nn.Module, feats: np.ndarray, target: Optional[int] = None,
+                         n_steps: int = 32, internal_batch_size: int = 8) -> np.ndarray:
+    """Integrated Gradients of the target logit w.r.t. every (frame, feature) cell.
+
+    Uses an all-zero baseline and a midpoint Riemann sum; `internal_batch_size` interpolation
+    steps are pushed through the model per backward pass. Returns (time_steps, 39) float32.
+    """
+    import torch
+
+    x = torch.tensor(feats, dtype=torch.float32).unsqueeze(0)  # (1, T, F)
+    if target is None:
+        with torch.no_grad():
+            target = int(model(x).argmax(dim=1).item())
+    baseline = torch.zeros_like(x)
+    alphas = (torch.arange(n_steps, dtype=torch.float32) + 0.5) / n_steps
+    grad_sum = torch.zeros_like(x)
+    for chunk in alphas.split(internal_batch_size):
+        scaled = (baseline + chunk.view(-1, 1, 1) * (x - baseline)).requires_grad_(True)
+        score = model(scaled)[:, target].sum()
+        (grads,) = torch.autograd.grad(score, scaled)
+        grad_sum += grads.sum(dim=0, keepdim=True)
+    return ((x - baseline) * grad_sum / n_steps)[0].detach().numpy().astype(np.float32)
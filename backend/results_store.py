@@ -0,0 +1,267 @@
+# backend/results_store.py
+# Persistent prediction results for the Reports page: SQLite (WAL) with a background writer
+# that inserts in batches, so request handlers only enqueue. Hourly rollups (count and
+# confidence sum per hour, user, label and 10%-confidence bin) are maintained in the same
+# transaction as the raw rows; summaries and histograms read the rollups, never the raw table.
+import base64
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    user_id TEXT NOT NULL DEFAULT '',
+    file_hash TEXT,
+    filename TEXT,
+    source TEXT NOT NULL,
+    label TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    media_seconds REAL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS results_created ON results (created_at, id);
+CREATE INDEX IF NOT EXISTS results_user_created ON results (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS results_label_created ON results (label, created_at, id);
+CREATE INDEX IF NOT EXISTS results_file_hash ON results (file_hash);
+CREATE TABLE IF NOT EXISTS results_hourly (
+    hour INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    label TEXT NOT NULL,
+    confidence_bin INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    PRIMARY KEY (hour, user_id, label, confidence_bin)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_hourly_user ON results_hourly (user_id, hour);
+"""
+
+_INSERT = ("INSERT INTO results (created_at, user_id, file_hash, filename, source, label, confidence, "
+           "media_seconds, detail) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_ROLLUP = ("INSERT INTO results_hourly (hour, user_id, label, confidence_bin, n, confidence_sum) "
+           "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (hour, user_id, label, confidence_bin) "
+           "DO UPDATE SET n = n + excluded.n, confidence_sum = confidence_sum + excluded.confidence_sum")
+
+HOUR = 3600
+BINS = 10  # confidence histogram: [0,10), [10,20), ... [90,100]
+
+
+def _bin(confidence: float) -> int:
+    return min(max(int(confidence // (100 / BINS)), 0), BINS - 1)
+
+
+def _encode_cursor(created_at: float, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, row_id]).encode()).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(created_at), int(row_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+class ResultsStore:
+    """Batched, indexed storage of prediction results with hourly rollups.
+
+    `record` only enqueues; a writer thread commits up to `batch_size` rows per transaction,
+    at most `flush_seconds` after they arrive. When `max_pending` rows are waiting, new ones
+    are dropped (and counted in `dropped`) rather than slowing requests down.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_seconds: float = 0.5, max_pending: int = 100_000):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self._local = threading.local()
+        self._pending: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending)
+        self._writer: Optional[threading.Thread] = None
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # a connection must never be used across fork (gunicorn --preload): reopen in the child
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ----------------------------- writing -----------------------------
+
+    def start(self) -> None:
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, name="results-writer", daemon=True)
+            self._writer.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush what is queued and stop the writer."""
+        if self._writer is not None and self._writer.is_alive():
+            self._pending.put(None)
+            self._writer.join(timeout)
+        self._writer = None
+
+    def pending(self) -> int:
+        return self._pending.qsize()
+
+    def record(self, source: str, label: str, confidence: float, user_id: Optional[str] = None,
+               file_hash: Optional[str] = None, filename: Optional[str] = None,
+               media_seconds: Optional[float] = None, detail: Optional[Dict[str, Any]] = None,
+               created_at: Optional[float] = None) -> bool:
+        """Queue one result; returns False if it was dropped because the queue is full."""
+        row = (created_at or time.time(), user_id or "", file_hash, filename, source, label, float(confidence),
+               media_seconds, json.dumps(detail) if detail else None)
+        try:
+            self._pending.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _write_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            row = self._pending.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    row = self._pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            try:
+                self.insert_many(batch)
+            except sqlite3.Error:
+                self.dropped += len(batch)
+
+    def insert_many(self, rows: List[tuple]) -> None:
+        """Insert raw rows (in `record` order) and update the rollups in one transaction."""
+        rollup: Dict[Tuple[int, str, str, int], List[float]] = {}
+        for created_at, user_id, _, _, _, label, confidence, _, _ in rows:
+            key = (int(created_at // HOUR) * HOUR, user_id, label, _bin(confidence))
+            acc = rollup.setdefault(key, [0, 0.0])
+            acc[0] += 1
+            acc[1] += confidence
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(_INSERT, rows)
+            conn.executemany(_ROLLUP, [key + (n, total) for key, (n, total) in rollup.items()])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def rebuild_rollups(self) -> None:
+        """Recompute `results_hourly` from the raw rows (after bulk imports or manual edits)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM results_hourly")
+            conn.execute(
+                f"INSERT INTO results_hourly (hour, user_id, label, confidence_bin, n, confidence_sum) "
+                f"SELECT CAST(created_at / {HOUR} AS INTEGER) * {HOUR}, user_id, label, "
+                f"MIN(MAX(CAST(confidence / {100 / BINS} AS INTEGER), 0), {BINS - 1}), COUNT(*), SUM(confidence) "
+                f"FROM results GROUP BY 1, 2, 3, 4")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ----------------------------- reading -----------------------------
+
+    def query(self, user_id: Optional[str] = None, label: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, file_hash: Optional[str] = None, limit: int = 50,
+              cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Newest-first page of raw results. Pagination is keyset-based (`next_cursor`), so
+        deep pages cost the same as the first one. `user_id=None` reads every user ('' is the
+        anonymous user); callers exposing this to clients must always pass a user."""
+        where, args = [], []
+        for column, value in (("user_id", user_id), ("label", label), ("file_hash", file_hash)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            where.append("created_at >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            args.append(until)
+        if cursor:
+            created_at, row_id = _decode_cursor(cursor)
+            where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            args += [created_at, created_at, row_id]
+        limit = min(max(int(limit), 1), 500)
+        sql = ("SELECT id, created_at, user_id, file_hash, filename, source, label, confidence, media_seconds, detail "
+               f"FROM results {'WHERE ' + ' AND '.join(where) if where else ''} "
+               "ORDER BY created_at DESC, id DESC LIMIT ?")
+        rows = [dict(r) for r in self._conn().execute(sql, args + [limit + 1])]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        for row in rows:
+            row["detail"] = json.loads(row["detail"]) if row["detail"] else None
+            row["user_id"] = row["user_id"] or None
+        return {"results": rows, "next_cursor": next_cursor}
+
+    def summary(self, user_id: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+                bucket_seconds: int = 24 * HOUR) -> Dict[str, Any]:
+        """Counts per label, mean confidence, a confidence histogram and a per-bucket timeline,
+        all from the hourly rollups. `since`/`until` are widened to whole hours and
+        `bucket_seconds` is rounded to a multiple of one hour."""
+        bucket = max(int(bucket_seconds) // HOUR, 1) * HOUR
+        where, args = [], []
+        if user_id is not None:
+            where.append("user_id = ?")
+            args.append(user_id)
+        if since is not None:
+            where.append("hour >= ?")
+            args.append(int(since // HOUR) * HOUR)
+        if until is not None:
+            where.append("hour < ?")
+            args.append(-(-int(until) // HOUR) * HOUR)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        rows = self._conn().execute(
+            f"SELECT (hour / {bucket}) * {bucket} AS bucket, label, confidence_bin, SUM(n) AS n, "
+            f"SUM(confidence_sum) AS confidence_sum FROM results_hourly {clause} "
+            "GROUP BY 1, 2, 3 ORDER BY 1", args).fetchall()
+
+        labels: Dict[str, Dict[str, float]] = {}
+        histogram = [0] * BINS
+        timeline: Dict[int, Dict[str, int]] = {}
+        for row in rows:
+            acc = labels.setdefault(row["label"], {"count": 0, "confidence_sum": 0.0})
+            acc["count"] += row["n"]
+            acc["confidence_sum"] += row["confidence_sum"]
+            histogram[row["confidence_bin"]] += row["n"]
+            point = timeline.setdefault(row["bucket"], {})
+            point[row["label"]] = point.get(row["label"], 0) + row["n"]
+        total = sum(acc["count"] for acc in labels.values())
+        return {
+            "total": total,
+            "labels": {name: {"count": acc["count"], "share": round(acc["count"] / total, 4),
+                              "mean_confidence": round(acc["confidence_sum"] / acc["count"], 2)}
+                       for name, acc in labels.items()},
+            "confidence_histogram": [{"from": i * 100 // BINS, "to": (i + 1) * 100 // BINS, "count": c}
+                                     for i, c in enumerate(histogram)],
+            "bucket_seconds": bucket,
+            "timeline": [{"start": start, "counts": counts} for start, counts in sorted(timeline.items())],
+        }
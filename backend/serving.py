@@ -0,0 +1,49 @@
+# backend/serving.py
+import os
+from typing import Optional
+
+_configured_threads: Optional[int] = None
+
+
+def worker_threads(workers: int, cores: Optional[int] = None) -> int:
+    """Intra-op threads per worker so that workers * threads does not exceed the cores."""
+    if cores is None:
+        # respect CPU affinity / container cpusets where the platform exposes it
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    return max(1, cores // max(workers, 1))
+
+
+def configure_worker_threads(workers: int, threads: Optional[int] = None) -> int:
+    """Size this process's torch thread pools for `workers` processes sharing the machine.
+
+    Called once per worker (gunicorn post_fork hook or app startup). Explicit `threads`,
+    or the TORCH_THREADS environment variable, override the computed value.
+    """
+    global _configured_threads
+    import torch
+
+    threads = threads or int(os.environ.get("TORCH_THREADS", "0")) or worker_threads(workers)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already fixed once any inter-op work has run in this process
+    _configured_threads = threads
+    return threads
+
+
+def threads_configured() -> Optional[int]:
+    return _configured_threads
+
+
+def preload_model(model_path: str):
+    """Load the model in the current (master) process before workers are forked.
+
+    Weights are moved to shared memory, so every forked worker maps the same pages instead
+    of holding a private copy; nothing writes to them at inference, so they stay shared.
+    """
+    from predictor import get_model
+
+    model = get_model(model_path)
+    model.share_memory()
+    return model
@@ -1,10 +1,21 @@
 # backend/utils_media.py
 import os
+import shutil
+import subprocess
 import tempfile
-from typing import Tuple
-from moviepy.editor import VideoFileClip
+import threading
+from typing import Optional, Set, Tuple
+
+import numpy as np
 
 AUDIO_EXT = ".wav"
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+MAX_AUDIO_SECONDS = float(os.environ.get("MAX_AUDIO_SECONDS", "7200"))  # caps decoded memory
+DECODE_TIMEOUT = float(os.environ.get("DECODE_TIMEOUT", "300"))
+
+
+class MediaDecodeError(RuntimeError):
+    pass
 
 def is_video(filename: str) -> bool:
     lower = filename.lower()
@@ -20,17 +31,224 @@ def write_upload_to_tmp(data: bytes, suffix: str) -> str:
     f.close()
     return f.name
 
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_BINARY) is not None
+
+
+def _audio_only_args(input_path: str, sample_rate: int, max_seconds: Optional[float]):
+    # -map 0:a:0 selects the first audio stream only: video packets are demuxed and dropped,
+    # never decoded. -t bounds the decoded duration (and so the output size).
+    args = [FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error", "-i", input_path,
+            "-map", "0:a:0", "-vn", "-sn", "-dn", "-ac", "1", "-ar", str(sample_rate)]
+    if max_seconds:
+        args += ["-t", str(max_seconds)]
+    return args
+
+
+def decode_audio_ffmpeg(input_path: str, sample_rate: int = 16000, max_seconds: Optional[float] = MAX_AUDIO_SECONDS,
+                        timeout: float = DECODE_TIMEOUT, chunk_bytes: int = 1 << 20) -> np.ndarray:
+    """Decode the first audio stream of any container to mono float32 at `sample_rate`.
+
+    ffmpeg resamples and downmixes and writes raw f32le PCM to a pipe, which is read in
+    `chunk_bytes` chunks into one growing buffer; nothing is written to disk. At most
+    `max_seconds` of audio are kept, and the process is killed after `timeout` seconds.
+    """
+    cmd = _audio_only_args(input_path, sample_rate, max_seconds) + ["-f", "f32le", "-acodec", "pcm_f32le", "pipe:1"]
+    max_bytes = int(max_seconds * sample_rate * 4) if max_seconds else None
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, stdin=subprocess.DEVNULL)
+        timed_out = threading.Event()
+
+        def _kill():
+            timed_out.set()
+            proc.kill()
+
+        watchdog = threading.Timer(timeout, _kill)
+        watchdog.start()
+        buf = bytearray()
+        try:
+            while True:
+                chunk = proc.stdout.read(chunk_bytes)
+                if not chunk:
+                    break
+                buf += chunk
+                if max_bytes is not None and len(buf) >= max_bytes:
+                    del buf[max_bytes:]
+                    proc.kill()
+                    break
+            returncode = proc.wait()
+        finally:
+            watchdog.cancel()
+            proc.stdout.close()
+        if timed_out.is_set():
+            raise MediaDecodeError(f"ffmpeg timed out after {timeout:.0f}s on {os.path.basename(input_path)}")
+        if returncode != 0 and not (max_bytes is not None and len(buf) >= max_bytes):
+            err.seek(0)
+            message = err.read(4096).decode("utf-8", "replace").strip()
+            raise MediaDecodeError(f"ffmpeg failed ({returncode}): {message or 'no audio stream?'}")
+    usable = len(buf) - len(buf) % 4
+    return np.frombuffer(buf, dtype="<f4", count=usable // 4)
+
+
+def extract_wav_ffmpeg(input_path: str, out_path: str, sample_rate: int = 16000,
+                       max_seconds: Optional[float] = MAX_AUDIO_SECONDS, timeout: float = DECODE_TIMEOUT) -> str:
+    """Audio-only demux of `input_path` to a 16-bit mono wav at `sample_rate`."""
+    cmd = _audio_only_args(input_path, sample_rate, max_seconds) + ["-c:a", "pcm_s16le", "-y", out_path]
+    try:
+        proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise MediaDecodeError(f"ffmpeg timed out after {timeout:.0f}s on {os.path.basename(input_path)}")
+    if proc.returncode != 0:
+        message = proc.stderr[-4096:].decode("utf-8", "replace").strip()
+        raise MediaDecodeError(f"ffmpeg failed ({proc.returncode}): {message or 'no audio stream?'}")
+    return out_path
+
+
+def _read_all(stream, max_bytes: Optional[int], chunk_bytes: int) -> bytearray:
+    buf = bytearray()
+    while True:
+        chunk = stream.read(chunk_bytes)
+        if not chunk:
+            return buf
+        if max_bytes is None or len(buf) < max_bytes:
+            buf += chunk
+        # past the cap keep draining so ffmpeg never blocks on the other output
+
+
+def probe_streams(input_path: str, timeout: float = 30.0) -> Set[str]:
+    """Kinds of streams ('audio', 'video') in a container, from ffmpeg's input listing."""
+    try:
+        proc = subprocess.run([FFMPEG_BINARY, "-nostdin", "-hide_banner", "-i", input_path],
+                              stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                              timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise MediaDecodeError(f"ffmpeg timed out probing {os.path.basename(input_path)}")
+    kinds = set()
+    for line in proc.stderr.decode("utf-8", "replace").splitlines():
+        line = line.strip()
+        if line.startswith("Stream #"):
+            if ": Audio:" in line:
+                kinds.add("audio")
+            elif ": Video:" in line:
+                kinds.add("video")
+    return kinds
+
+
+def decode_media_ffmpeg(input_path: str, sample_rate: int = 16000, frame_fps: float = 5.0,
+                        frame_size: Tuple[int, int] = (160, 120), max_seconds: Optional[float] = MAX_AUDIO_SECONDS,
+                        timeout: float = DECODE_TIMEOUT, chunk_bytes: int = 1 << 20) -> Tuple[np.ndarray, np.ndarray]:
+    """One ffmpeg pass over an upload producing both the audio and sampled video frames.
+
+    Returns (mono float32 audio at `sample_rate`, uint8 grayscale frames (n, height, width)
+    at `frame_fps`). The streams present are probed first, and a missing one comes back
+    empty; a file with neither raises `MediaDecodeError`. With both, audio goes to stdout and
+    frames to a second pipe, each read by its own thread, so the container is demuxed and
+    decoded once for every modality. Where extra pipes cannot be inherited (Windows), the
+    frames go to a temporary file in the same pass instead.
+    """
+    width, height = frame_size
+    streams = probe_streams(input_path)
+    if not streams:
+        raise MediaDecodeError(f"no audio or video stream in {os.path.basename(input_path)}")
+    if "video" not in streams:
+        audio = decode_audio_ffmpeg(input_path, sample_rate, max_seconds=max_seconds, timeout=timeout,
+                                    chunk_bytes=chunk_bytes)
+        return audio, np.zeros((0, height, width), dtype=np.uint8)
+
+    limit = ["-t", str(max_seconds)] if max_seconds else []
+    audio_out = ["-map", "0:a:0", "-vn", "-ac", "1", "-ar", str(sample_rate), *limit,
+                 "-f", "f32le", "-acodec", "pcm_f32le", "pipe:1"]
+    video_out = ["-map", "0:v:0", "-an", "-vf", f"fps={frame_fps},scale={width}:{height}", "-pix_fmt", "gray",
+                 *limit, "-f", "rawvideo"]
+    cmd = [FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error", "-i", input_path]
+    max_audio = int(max_seconds * sample_rate * 4) if max_seconds else None
+    max_video = int(max_seconds * frame_fps + 1) * width * height if max_seconds else None
+    frame_r = frame_w = frames_path = None
+    if "audio" not in streams:
+        cmd += video_out + ["pipe:1"]
+    elif os.name == "posix":
+        frame_r, frame_w = os.pipe()
+        cmd += audio_out + video_out + [f"pipe:{frame_w}"]
+    else:
+        fd, frames_path = tempfile.mkstemp(suffix=".gray")
+        os.close(fd)
+        cmd += audio_out + video_out + ["-y", frames_path]
+
+    try:
+        with tempfile.TemporaryFile() as err:
+            try:
+                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, stdin=subprocess.DEVNULL,
+                                        pass_fds=(frame_w,) if frame_w is not None else ())
+            finally:
+                if frame_w is not None:
+                    os.close(frame_w)
+            timed_out = threading.Event()
+
+            def _kill():
+                timed_out.set()
+                proc.kill()
+
+            watchdog = threading.Timer(timeout, _kill)
+            watchdog.start()
+            frames_buf = bytearray()
+            reader = None
+            if frame_r is not None:
+                frame_pipe = os.fdopen(frame_r, "rb")
+                reader = threading.Thread(
+                    target=lambda: frames_buf.extend(_read_all(frame_pipe, max_video, chunk_bytes)), daemon=True)
+                reader.start()
+            try:
+                stdout_buf = _read_all(proc.stdout, max_audio if "audio" in streams else max_video, chunk_bytes)
+                returncode = proc.wait()
+                if reader is not None:
+                    reader.join()
+            finally:
+                watchdog.cancel()
+                proc.stdout.close()
+                if frame_r is not None:
+                    frame_pipe.close()
+            if timed_out.is_set():
+                raise MediaDecodeError(f"ffmpeg timed out after {timeout:.0f}s on {os.path.basename(input_path)}")
+            if returncode != 0:
+                err.seek(0)
+                message = err.read(4096).decode("utf-8", "replace").strip()
+                raise MediaDecodeError(f"ffmpeg failed ({returncode}): {message or 'undecodable media'}")
+        if "audio" in streams:
+            audio_buf = stdout_buf
+            if frames_path is not None:
+                with open(frames_path, "rb") as f:
+                    frames_buf = bytearray(f.read(max_video) if max_video else f.read())
+        else:
+            audio_buf, frames_buf = bytearray(), stdout_buf
+    finally:
+        if frames_path is not None:
+            os.remove(frames_path)
+    del audio_buf[(max_audio or len(audio_buf)):]
+    audio = np.frombuffer(audio_buf, dtype="<f4", count=len(audio_buf) // 4)
+    frame_bytes = width * height
+    count = min(len(frames_buf), max_video or len(frames_buf)) // frame_bytes
+    frames = np.frombuffer(frames_buf, dtype=np.uint8, count=count * frame_bytes).reshape(count, height, width)
+    return audio, frames
+
+
 def ensure_wav_from_any(input_path: str) -> Tuple[str, bool]:
     """
     Returns (wav_path, cleanup_input)
     If input is video -> extract audio to wav.
     If input is audio and not wav -> convert to wav via moviepy.
     If already wav -> returns same path.
+    With ffmpeg on PATH only the audio stream is demuxed; moviepy is the fallback.
     """
     lower = input_path.lower()
     if lower.endswith(".wav"):
         return input_path, False
 
+    if ffmpeg_available():
+        return extract_wav_ffmpeg(input_path, input_path + AUDIO_EXT), True
+
+    from moviepy.editor import VideoFileClip  # heavy; only when a conversion is needed
+
     if is_video(lower):
         clip = VideoFileClip(input_path)
         out_path = input_path + AUDIO_EXT